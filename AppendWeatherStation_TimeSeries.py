@@ -22,11 +22,35 @@
 #
 # v5 Update: Added logic to check if no numeric values don't import these rows.  Logic was already in place but more robust has been added using Coerce function
 #
+# Update 2026/10/19 - Command line options (run with -h) to override the parameters below and '--shard i/N' to split the harvested files by Location across concurrent workers
+#                     (AquariusShard.py - same directory as this script).
+#
+# Update 2026/10/19 - Vectorized validation of each series before upload ('validateUpload') with a per file report - bad series are blocked without calls to Aquarius.
+#
+# Update 2026/10/19 - 'appendMode' - 'OverwriteAppend'/'Reflected' replace the points in the file time range (or 'overwriteStart'/'overwriteEnd' window) in one request.
+#
+# Update 2026/10/19 - Files read once per file with the 'DateTime' and mapped value fields via a pluggable reader ('readerBackend' - multi-threaded pyarrow or pandas).
+#
+# Update 2026/10/19 - Optional read back verification of each append ('verifyUpload') on background threads with a per series verification report.
+#
+# Update 2026/10/19 - Request counts, errors, latency histograms, points and bytes posted by endpoint and time series exported at the end of the run ('exportMetrics').
+#
+# Update 2026/10/19 - '--profile' run - time by pipeline stage, flame graph stacks (collapsed/speedscope) or cProfile stats and tracemalloc top allocations ('profileMode').
+#
+# Update 2026/10/19 - Series (time series, file field, dtype, unit, valid range) and the file name to Location rule defined in the declarative logger
+#                     registry ('loggerType', 'registryFile') - all series in a file are prepared in one pass by the shared ingest engine (AquariusIngest.py).
+#
+# Update 2026/10/19 - Time stamps uploaded as ISO-8601 with the site UTC offset (registry 'UtcOffset'/'SiteUtcOffsets') via offset arithmetic - replaces the 'Asia/Bangkok' conversion.
+#
+# Update 2026/10/19 - '--watch' mode - new/modified files under the root directory ingested in micro-batches by Location (file system notifications
+#                     with a polling fallback, debounced) with one Aquarius session and time series id cache for the life of the process.
+#
 # Python Version 3.7 or greater
 # Dependices: Requests, pyrfc3339, pytz
 # The Aquarius 'Timeseries_client.py' wrapper class (see: Z:\MONITORING\Loggers\Documents\Aquarius\Python\NextGeneration\AquariusTimeSeries)
 # Scripts: timeseries_client.py and setup.py files must be in the Python Environment - 'Lib\site-packages' directory before the
 # timeseries client can be used to hit the Aquarius REST endpoints
+# AquariusIngest.py, AquariusShard.py, AquariusAppendFunctions.py, AquariusMetrics.py, AquariusProfile.py and AquariusTimestamps.py must be in the same directory as this script
 # Script uses the 'pyrfc3339' package which must be install in your Lib\site-packages directory
 #######################################
 # Start of Parameters requiring set up.
@@ -35,212 +59,78 @@
 rootDiretory = r'C:\ROMN\Monitoring\Loggers\DataGathering\WaterQuality\GRKO\AquaTroll600\Aquarius_Climate'       #Root Directory - all child directories and .csv files will be processed.
 timeSeriesLoop = ["Precip Total.Precipitation (cm)","Snow Depth.Snow Depth (cm)","Air Temp.Average Daily Temperature (C)", "Air Temp.Maximum Daily Temperature (C)" , "Air Temp.Minimum Daily Temperature (C)"]  #List defining the time series to be processed
 
+loggerType = "WeatherStation"   #Logger type in the logger registry (AquariusIngest.py - 'loggerRegistry') defining the file type, file name to Location rule and the time series - field, dtype, unit and valid range
+registryFile = None   #Optional JSON registry file with additional logger types (same structure as 'loggerRegistry') - None uses the registry in AquariusIngest.py
 fileType = ".csv"    #(".csv"|".txt") parameter defines if .csv or .txt files are being processed
+
+#Append Parameters
+appendMode = "Append"   #('Append'|'OverwriteAppend'|'Reflected') 'Append' - points are appended, 'OverwriteAppend' - points in the time range of the file are replaced (revised data), 'Reflected' - as 'OverwriteAppend' for reflected time series
+overwriteStart = None   #Optional start of the window to be replaced (i.e. '2021-07-01 00:00') - only file points in the window are uploaded. None - first time stamp in the file
+overwriteEnd = None   #Optional end of the window to be replaced (i.e. '2021-07-15 00:00'). None - last time stamp in the file
+
+#Reader Parameters
+readerBackend = "pyarrow"   #('pyarrow'|'pandas') File reader - 'pyarrow' multi-threaded reader with explicit field types (falls back to pandas when not installed or on non-numeric values)
+
+#Validation Parameters
+validateUpload = True   #(True|False) Validate each series before upload - series with unparseable, duplicate or non-monotonic time stamps or values out of the registry 'ValidRange' are not uploaded
+validateOnly = False   #(True|False) Only validate the harvested files (report in the workspace) - no connection to Aquarius
+expectedInterval = None   #Expected interval between values (pandas time delta i.e. '15min', '1h', '1D') - None uses the modal interval of each file
+#Verification Parameters
+verifyUpload = False   #(True|False) Read back each appended window (getTimeSeriesData) on background threads once the append is completed and compare the time stamps and values to the uploaded points - report in the workspace
+verifyThreads = 4   #Number of concurrent read back verifications - uploads are not blocked by the verifications
+
+#Profiling Parameters
+profileMode = "Sample"   #('Sample'|'Deterministic') Profiling of a '--profile' run. 'Sample' - stack sampling with flame graph files (collapsed stack and speedscope), 'Deterministic' - cProfile stats. Both export the time by pipeline stage - files '{outLogFileName}_Profile*' in the workspace
+profileMemory = True   #(True|False) Trace the memory allocations on a '--profile' run (tracemalloc top allocations report) - tracing slows the run
+
+#Metrics Parameters
+exportMetrics = True   #(True|False) Export the request counts, errors, latency histograms, points and bytes posted by endpoint and time series at the end of the run - Prometheus textfile ('metricsFile') and JSON summary ('.json')
+
+#Watch Parameters ('--watch')
+watchMethod = "Auto"   #('Auto'|'Poll') Detection of new/modified files in watch mode - 'Auto' file system notifications (watchdog package) with polling when watchdog is not installed, 'Poll' - scan the file sizes/modified times every 'watchPollSeconds' (i.e. network shares without notifications)
+watchDebounceSeconds = 30   #A new/modified file is ingested once its size and modified time are unchanged for this many seconds (file copy completed)
+watchBatchSeconds = 60   #Max seconds settled files wait for the files still being copied before the micro-batch is ingested
+watchPollSeconds = 30   #Seconds between scans when polling
+watchDuration = None   #Seconds the watch runs before exiting (i.e. 86400 for a daily restart) - None runs until interrupted (Ctrl+C)
+
 #Workspace Output Parameters
 workspace = r'C:\ROMN\Monitoring\Loggers\DataGathering\WaterQuality\GRKO\AquaTroll600\Aquarius_Climate\workspace'      ## Workspace for Processing
 outLogFileName = "AAA_Aquarius_AppendWeatherStation_GRKO"
 logFileName = workspace + "\\" + outLogFileName + ".LogFile.txt"
+validationReportFile = workspace + "\\" + outLogFileName + "_ValidationReport.csv"   #Validation report by file and time series
+verificationReportFile = workspace + "\\" + outLogFileName + "_VerificationReport.csv"   #Append verification report by file and time series
+metricsFile = workspace + "\\" + outLogFileName + "_Metrics.prom"   #Prometheus textfile with the run metrics (i.e. in the node_exporter textfile collector directory) - JSON summary exported with a '.json' suffix
+
+shardIndex = 1   #Shard (i.e. worker) of 'shardCount' being processed - set via the '--shard i/N' command line option
+shardCount = 1   #Number of shards the harvested files are split across - 1 processes all files
 ###############################
 
-import sys, string, os, glob, traceback, shutil, csv, pytz, ast
-import pandas as pd
-import requests,  pyrfc3339
-from datetime import datetime
-from pytz import timezone
-
-
-def main():
-
-    try:
-
-        #################################################################
-        #Define the .csv files to be processed - via the shutil
-        #################################################################
-
-
-        csvFiles = glob.glob(rootDiretory + "\\**\\*" + fileType, recursive= True)  #Sytnax Works for Python 3.x
-
-        # AQUARIUS Server to connect to
-        server = 'https://aquarius.nps.gov'  # NPS Aquarius Server Name
-        loginName = 'AQ_User'  # Aquarius Login Name
-        loginPass = 'xxxxx'  # Aquarius Login Password
-
-        # This is the Aquarius API Wrapper Class - used to hit the Next Generation Aquarius Springboard (20.1.68.0)
-        # Downlad the files from: https://github.com/AquaticInformatics/examples/tree/master/TimeSeries/PublicApis/Python
-        from timeseries_client import timeseries_client
-        #Hit the Aquarius Service
-        timeseries = timeseries_client(server, loginName, loginPass)
-
-        #Loop Thru all harvested csv weather station files
-        for file in csvFiles:
-
-            baseName = os.path.basename(file)
-            baseNameSplit = baseName.split("_")
-            locationName = (str.upper(str(baseNameSplit[0])) + "_" +  baseNameSplit[1])     #Define SiteName
-
-            #Loop Thru the Time Series to be Append to'
-            for timeSeries in timeSeriesLoop:
-
-                #Define the Time Series name at the defined Location
-                timeSeriesNameFull = timeSeries + "@" + locationName
-
-                #Use the API getTimeSeiresUniqueId wrapper
-                try:
-                    timeSeriesId = timeseries.getTimeSeriesUniqueId(timeSeriesNameFull)
-                    print("Time Series ID: " + timeSeriesId)
-                except:
-                    messageTime = timeFun()
-                    scriptMsg = "WARNING Time Series - " + timeSeriesNameFull + " was not found at Site:" + locationName + " - " + messageTime
-                    print(scriptMsg)
-                    logFile = open(logFileName, "a")
-                    logFile.write(scriptMsg + "\n")
-                    logFile.close()
-                    continue
-
-                #Import CSV file to Pandas Dataframe
-                df = pd.read_csv(file, ',')
-
-                selected_columns = ["DateTime"]   #List to define the columns/fields being processed
-
-                #fieldName = funcFieldName(timeSeries) - Create Function to Define the field Name - Expand for all time series 20200626
-                #Define the Times Series Field Name
-                if timeSeries == "Precip Total.Precipitation (cm)":
-                    fieldName = 'PRCP_CM'
-                elif timeSeries == "Snow Depth.Snow Depth (cm)":
-                    fieldName = 'SNWD'
-                elif timeSeries == "Air Temp.Average Daily Temperature (C)":
-                    fieldName = 'TAVG_C'
-                elif timeSeries == "Air Temp.Maximum Daily Temperature (C)":
-                    fieldName = 'TMAX_C'
-                elif timeSeries == "Air Temp.Minimum Daily Temperature (C)":
-                    fieldName = 'TMIN_C'
-                else:
-                    print("No Time Series - Field Name Match Found")
-                    print ("No Time Series - Field Name Match Found")
-                    messageTime = timeFun()
-                    scriptMsg = "WARNING Failed To Process - " + str(timeSeries) + " - " + messageTime
-                    print(scriptMsg)
-                    logFile = open(logFileName, "a")
-                    logFile.write(scriptMsg + "\n")
-                    logFile.close()
-                #Add the time series field to be processed
-                selected_columns.append(fieldName)
-
-
-                #Function to take the defined Columns and Export the Columns to a new Pandas Data Frame
-                df2 = select_columns(df, selected_columns)  #Creating new data frome with only the date and time series field being processed
-
-                #Renmame the 'datetime' and "fieldName' to 'Time' and 'Value
-                df2.rename(columns={"DateTime": "Time", fieldName: "Value"}, inplace=True)
-                del df
-
-
-                #Use to Numeric to force the value field to be numeric - using coerce to set as NAN if not.
-                df2['Value'] = pd.to_numeric(df2.Value, errors='coerce')
-
-
-                #Check if data in the 'Value' field - if no data go to next parameter
-                x = df2['Value'].sum()
-                if x == 0:
-                    messageTime = timeFun()
-                    scriptMsg = "WARNING Time Series - " + timeSeriesNameFull + " is Null/NAN:" + locationName + " - " + messageTime
-                    print(scriptMsg)
-                    logFile = open(logFileName, "a")
-                    logFile.write(scriptMsg + "\n")
-                    logFile.close()
-                    continue
-
-                # Drop rows where value is NaN  due to Aquarius Call not handling
-                df2 = df2[df2['Value'].notna()]
-
-                #Convert the Time field to
-                utc = pytz.UTC
-               # MountainStandard = timezone('America/Denver')
-                # Convert the 'Time' to dateTime field - with the UCT DataTimeIndex value - setting to 0 offset
-                df2['Time'] = pd.to_datetime(df2['Time'], utc=utc)
-
-                #Setting the Time zone to plus 7 hours - data will be shifted forward seven hours
-                # On upload Aquarius Time Series will shift negative seven hours
-                # All time series should have a -7 America/Denver offset
-                OffSetTimeZone = timezone('Asia/Bangkok')
-                df2['TimeOffSet'] = df2['Time'].dt.tz_convert(OffSetTimeZone)
-
-                # Parse out the Time Values to create an Iso8601 formated string - Crude but works
-                # df2['TimeZone'] = df2['Time'].dt.strftime('%SZ')
-                df2['TimeZone'] = ".000000Z"  # Manually setting to UTC no time shift
-                df2['IsoDateTime'] = df2['TimeOffSet'].dt.strftime('%Y-%m-%dT%H:%M:%S')
-                df2['IsoTimeString'] = df2['IsoDateTime'] + df2['TimeZone']
-
-                # Create a dataframewith one record
-                DfOneValue = df2.iloc[0]
-
-                #Hit Function defining the logic to be used in the apply below
-                TooDictionary(DfOneValue)
-
-                # Apply the logic defined in 'TwoDictionary' to all the rows in df2.
-                df2['Merged2'] = df2.apply(TooDictionary, axis=1)
-
-                print(type(df2.iloc[0].Merged2))  #Verify is a Dictionary
-
-                # Export the Dictionary Like structure in a Pandas Dataframe to a list for upload to Aquarius
-                listToPush = df2['Merged2'].tolist()
-                print (type(listToPush))
-
-                try:
-                    response = timeseries.acquisition.post('/timeseries/'+timeSeriesId+'/append', json={'Points': listToPush}).json()
-                    print(response)
-                    messageTime = timeFun()
-                    scriptMsg = "Successfully Appended Time Series - " + timeSeriesNameFull + " - AT -" + locationName + " - Append ID is:" + str(response) + " - " + messageTime
-                    print(scriptMsg)
-                    logFile = open(logFileName, "a")
-                    logFile.write(scriptMsg + "\n")
-                    logFile.close()
-                    pass
-                except:
-                    messageTime = timeFun()
-                    scriptMsg = "WARNING - Failed To Process - " + timeSeriesNameFull + " - AT -" + locationName + " - " + messageTime
-                    print(scriptMsg)
-                    logFile = open(logFileName, "a")
-                    logFile.write(scriptMsg + "\n")
-                    logFile.close()
-
-
-        #Next Generation Disconnect
-        timeseries.disconnect()
-
-        messageTime = timeFun()
-        scriptMsg = "Successfully processed - AquariusNG_Append_DTW_TimeSeriesV3.py - " + messageTime
-        print (scriptMsg)
-        logFile = open(logFileName, "a")
-        logFile.write(scriptMsg + "\n")
-        logFile.close()
-
-
-    except:
-        messageTime = timeFun()
-        scriptMsg = "Exiting Error - AquariusNG_Append_DTW_TimeSeriesV3.py - " + messageTime
-        print("Exiting Error - AquariusNG_Append_DTW_TimeSeriesV3.py Error\nSee log file " + logFileName + " for more details - " + messageTime)
-        logFile = open(logFileName, "a")
-        logFile.write(scriptMsg + "\n")
-
-        traceback.print_exc(file=sys.stdout)
-        logFile.close()
-
-#Function Creates a new DataFrame from the defined Columns/Series in a pre-existing dataframe
-def select_columns(data_frame, column_names):
-    new_frame = data_frame.loc[:, column_names]
-    return new_frame
-
-# Function Defines the logic used to define the 'Merge' field - will use the apply function to push to all rows
-def TooDictionary(DfOneValue):
-    return {'Time': DfOneValue['IsoTimeString'], 'Value': DfOneValue['Value']}
-
-def timeFun():          #Function to Grab Time
-    from datetime import datetime
-    b=datetime.now()
-    messageTime = b.isoformat()
-    return messageTime
+import sys
+from AquariusIngest import parseIngestArguments, runIngestCommand
+
+# Define the ingest settings from the parameters above
+def ingestSettings():
+
+    # AQUARIUS Server to connect to
+    server = 'https://aquarius.nps.gov'  # NPS Aquarius Server Name
+    loginName = 'AQ_User'  # Aquarius Login Name
+    loginPass = 'xxxxx'  # Aquarius Login Password
+
+    return {'scriptName': "AppendWeatherStation_TimeSeries", 'loggerType': loggerType, 'registryFile': registryFile, 'rootDirectory': rootDiretory, 'timeSeriesLoop': timeSeriesLoop,
+            'fileType': fileType, 'appendMode': appendMode, 'overwriteStart': overwriteStart, 'overwriteEnd': overwriteEnd, 'readerBackend': readerBackend,
+            'validateUpload': validateUpload, 'validateOnly': validateOnly, 'expectedInterval': expectedInterval, 'verifyUpload': verifyUpload, 'verifyThreads': verifyThreads,
+            'profileMode': profileMode, 'profileMemory': profileMemory, 'exportMetrics': exportMetrics, 'workspace': workspace, 'outLogFileName': outLogFileName,
+            'logFileName': logFileName, 'validationReportFile': validationReportFile, 'verificationReportFile': verificationReportFile, 'metricsFile': metricsFile,
+            'shardIndex': shardIndex, 'shardCount': shardCount, 'watchMethod': watchMethod, 'watchDebounceSeconds': watchDebounceSeconds,
+            'watchBatchSeconds': watchBatchSeconds, 'watchPollSeconds': watchPollSeconds, 'watchDuration': watchDuration, 'server': server, 'loginName': loginName, 'loginPass': loginPass}
+
+
+# Parse the command line options (run with -h - options not defined default to the parameters above) and run - reader benchmark, profiled or ingest run
+def main(argumentList=None):
 
+    settings = ingestSettings()
+    args = parseIngestArguments(settings, "Append weather station data to Aquarius Time Series.", argumentList)
+    return runIngestCommand(settings, args)
 
 
 if __name__ == '__main__':
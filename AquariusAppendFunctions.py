@@ -0,0 +1,310 @@
+# ---------------------------------------------------------------------------
+# AquariusAppendFunctions.py
+# Functions shared by the Aquarius append scripts (Append_DTW_TimeSeries.py and AppendWeatherStation_TimeSeries.py).
+# Script must be in the same directory as the append scripts.
+#
+# Created on: 20261019
+# Python Version 3.7 or greater
+# Dependices: pandas, AquariusMetrics.py (same directory)
+# ---------------------------------------------------------------------------
+
+import sys, os, traceback
+import pandas as pd
+from AquariusMetrics import timedCall, countPoints
+
+
+# Validate a prepared series before upload - columnar checks with no calls to Aquarius
+# Input: dataframe with the 'Time' and 'Value' fields as read from the file (i.e. before numeric coercion), timeValues - optional UTC time stamps
+# already parsed from the 'Time' field (i.e. parsed once for all series in the file)
+# Checks: parseable time stamps, duplicate and non-monotonic time stamps, interval regularity (vs. 'expectedInterval' or the modal interval),
+# value range (valueRange - (min, max) or None), non-numeric and all Null/NaN values.
+# Status: 'Blocked' - unparseable, duplicate or non-monotonic time stamps or values out of range (upload is blocked), 'Empty' - no numeric values,
+# 'Skipped' - values summing to zero with 'skipZeroSum' (registry 'SkipZeroSum' - not uploaded), 'Warning' - irregular intervals or non-numeric
+# values (set to NaN and dropped), 'Pass'
+# Output: dictionary with the validation report fields for the file and time series
+def validateSeries(dfSeries, timeSeries, baseName, locationName, valueRange, expectedInterval=None, timeValues=None, skipZeroSum=False):
+    try:
+
+        if timeValues is None:
+            timeValues = pd.to_datetime(dfSeries['Time'], utc=True, errors='coerce')
+        numericValues = pd.to_numeric(dfSeries['Value'], errors='coerce')
+
+        rawValues = dfSeries['Value'].astype(str).str.strip()
+        nonNumeric = numericValues.isna() & dfSeries['Value'].notna() & (rawValues != '') & (rawValues.str.lower() != 'nan')
+
+        # Time stamps of the points being uploaded (numeric values), in file order
+        uploadTimes = timeValues[numericValues.notna() & timeValues.notna()]
+        timeDifference = uploadTimes.diff().iloc[1:]
+
+        duplicates = int(uploadTimes.duplicated().sum())
+        nonMonotonic = int((timeDifference < pd.Timedelta(0)).sum())
+
+        # Interval regularity - intervals between the sorted unique time stamps
+        intervals = uploadTimes.drop_duplicates().sort_values().diff().iloc[1:]
+        if expectedInterval is not None:
+            interval = pd.Timedelta(expectedInterval)
+        elif intervals.shape[0] > 0:
+            interval = intervals.mode().iloc[0]
+        else:
+            interval = pd.NaT
+        irregular = int((intervals != interval).sum()) if intervals.shape[0] > 0 else 0
+        maxGap = intervals.max() if intervals.shape[0] > 0 else pd.NaT
+
+        outOfRange = 0
+        if valueRange is not None:
+            outOfRange = int(((numericValues < valueRange[0]) | (numericValues > valueRange[1])).sum())
+
+        reportRow = {'FileName': baseName,
+                     'Location': locationName,
+                     'TimeSeries': timeSeries,
+                     'Points': int(dfSeries.shape[0]),
+                     'UploadPoints': int(uploadTimes.shape[0]),
+                     'UnparsedTimes': int(timeValues.isna().sum()),
+                     'NonNumericValues': int(nonNumeric.sum()),
+                     'NullValues': int(numericValues.isna().sum()),
+                     'Duplicates': duplicates,
+                     'NonMonotonic': nonMonotonic,
+                     'Interval': str(interval),
+                     'IrregularIntervals': irregular,
+                     'MaxGap': str(maxGap),
+                     'ValueRange': str(valueRange),
+                     'OutOfRange': outOfRange,
+                     'FirstTime': str(uploadTimes.min()) if uploadTimes.shape[0] > 0 else '',
+                     'LastTime': str(uploadTimes.max()) if uploadTimes.shape[0] > 0 else ''}
+
+        # Define the Status and message
+        blockedList = [field for field in ['UnparsedTimes', 'Duplicates', 'NonMonotonic', 'OutOfRange'] if reportRow[field] > 0]
+        warningList = [field for field in ['IrregularIntervals', 'NonNumericValues'] if reportRow[field] > 0]
+        if reportRow['UploadPoints'] == 0:
+            reportRow['Status'] = 'Empty'
+        elif len(blockedList) > 0:
+            reportRow['Status'] = 'Blocked'
+        elif skipZeroSum and numericValues.sum() == 0:
+            reportRow['Status'] = 'Skipped'
+        elif len(warningList) > 0:
+            reportRow['Status'] = 'Warning'
+        else:
+            reportRow['Status'] = 'Pass'
+        reportRow['Message'] = ", ".join(field + ": " + str(reportRow[field]) for field in blockedList + warningList)
+        if reportRow['Status'] == 'Skipped':
+            reportRow['Message'] = ", ".join(["Values sum to zero (SkipZeroSum)"] + ([reportRow['Message']] if reportRow['Message'] != '' else []))
+
+        return "success function", reportRow
+
+    except:
+
+        print("Error on validateSeries Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'validateSeries'"
+
+
+# Append the report rows (validation or verification report) to the report .csv file (header written when the file is new)
+def writeValidationReport(reportRows, reportFile):
+    try:
+
+        if len(reportRows) == 0:
+            return "success function"
+
+        dfReport = pd.DataFrame(reportRows)
+        dfReport.to_csv(reportFile, mode='a', index=False, header=not os.path.exists(reportFile))
+
+        return "success function"
+
+    except:
+
+        print("Error on writeValidationReport Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'writeValidationReport'"
+
+
+# Append the points to the time series via the Acquisition API as defined in 'appendMode':
+# 'Append' - points are appended ('/append'), 'OverwriteAppend' - points in the time range are replaced by the appended points ('/overwriteappend'),
+# 'Reflected' - as 'OverwriteAppend' for reflected time series ('/reflected'). The time range is the first to last time stamp of the points
+# (range end is exclusive so it is set 1 millisecond after the last time stamp) - one request replaces only the window of the file.
+# Input: timeValues - UTC time stamps of the points (time zone aware - i.e. the 'UtcTimes' of prepareFileSeries)
+# Output: Acquisition API response (i.e. AppendRequestIdentifier), time range
+def appendPoints(timeseries, timeSeriesId, listToPush, timeValues, appendMode):
+    try:
+
+        appendEndpoints = {'append': '/append', 'overwriteappend': '/overwriteappend', 'reflected': '/reflected'}
+        if appendMode.lower() not in appendEndpoints:
+            print("WARNING - appendMode " + str(appendMode) + " - Not Defined")
+            return "Failed function - 'appendPoints'"
+
+        appendJson = {'Points': listToPush}
+        timeRange = None
+        if appendMode.lower() != 'append':
+            timeRange = {'Start': timeValues.min().strftime('%Y-%m-%dT%H:%M:%S.%f') + "Z",
+                         'End': (timeValues.max() + pd.Timedelta(milliseconds=1)).strftime('%Y-%m-%dT%H:%M:%S.%f') + "Z"}
+            appendJson['TimeRange'] = timeRange
+
+        response = timeseries.acquisition.post('/timeseries/' + timeSeriesId + appendEndpoints[appendMode.lower()], json=appendJson).json()
+
+        return "success function", response, timeRange
+
+    except:
+
+        print("Error on appendPoints Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'appendPoints'"
+
+
+# Verify an append - waits for the append request to complete ('/timeseries/appendstatus') then reads back the appended window
+# (first to last uploaded time stamp - 'queryFrom'/'queryTo') with getTimeSeriesData and compares it to the uploaded points (vectorized join on the UTC time stamp).
+# Input: uploadTimes - time stamps of the uploaded points (i.e. the ISO-8601 upload time strings with the UTC offset), uploadValues - uploaded values,
+# fileTimes - file (local) time stamps of the uploaded points - compared to the local time stamps read back (series UTC offset) to find time shifts
+# Checks: MissingPoints - uploaded points not read back, ValueMismatches - values differing by more than 'valueTolerance',
+# TimeShifted - local time read back differs from the file time, ExtraPoints - points read back in the window that were not uploaded (i.e. existing points)
+# Status: 'Verified', 'Mismatch' (missing, value or time shift mismatches), 'AppendFailed', 'Timeout' (append request not completed in 'statusTimeout' seconds)
+# timeseries - Aquarius client of the calling thread (a client is not shared across threads - see AquariusIngest threadVerifyAppend)
+# Output: dictionary with the verification report fields
+def verifyAppend(timeseries, timeSeriesId, timeSeriesName, baseName, locationName, response, uploadTimes, uploadValues, fileTimes, valueTolerance=1e-6, statusTimeout=600):
+    try:
+
+        import time
+        metricSeries = str(timeSeriesName).split("@")[0]
+        uploadTimes = pd.to_datetime(pd.Series(uploadTimes).reset_index(drop=True), utc=True)
+        reportRow = {'FileName': baseName,
+                     'Location': locationName,
+                     'TimeSeries': timeSeriesName,
+                     'AppendRequestIdentifier': str(response.get('AppendRequestIdentifier', '')),
+                     'QueryFrom': uploadTimes.min().strftime('%Y-%m-%dT%H:%M:%S.%f') + "Z",
+                     'QueryTo': uploadTimes.max().strftime('%Y-%m-%dT%H:%M:%S.%f') + "Z",
+                     'UploadPoints': int(uploadTimes.shape[0]),
+                     'ReadPoints': 0,
+                     'MissingPoints': 0,
+                     'ValueMismatches': 0,
+                     'TimeShifted': 0,
+                     'ExtraPoints': 0,
+                     'MaxValueDifference': 0.0}
+
+        # Wait for the append request to be processed - appends are queued by Aquarius
+        startTime = time.time()
+        while True:
+            appendStatus = timedCall('appendstatus', metricSeries, timeseries.acquisition.get, '/timeseries/appendstatus/' + reportRow['AppendRequestIdentifier']).json()
+            if appendStatus['AppendStatus'] != 'Pending':
+                break
+            if time.time() - startTime > statusTimeout:
+                reportRow['Status'] = 'Timeout'
+                reportRow['Message'] = "Append request pending after " + str(statusTimeout) + " seconds"
+                return "success function", reportRow
+            time.sleep(2)
+
+        if appendStatus['AppendStatus'] != 'Completed':
+            reportRow['Status'] = 'AppendFailed'
+            reportRow['Message'] = "AppendStatus: " + str(appendStatus['AppendStatus'])
+            return "success function", reportRow
+
+        # Read back the appended window
+        dataRead = timedCall('getTimeSeriesData', metricSeries, timeseries.getTimeSeriesData, timeSeriesIds=[timeSeriesId], queryFrom=reportRow['QueryFrom'], queryTo=reportRow['QueryTo'])
+        countPoints('getTimeSeriesData', metricSeries, len(dataRead['Points']))
+        dfRead = pd.DataFrame(dataRead['Points'], columns=['Timestamp', 'NumericValue1'])
+        dfRead = dfRead[dfRead['NumericValue1'].notna()]
+        reportRow['ReadPoints'] = int(dfRead.shape[0])
+
+        dfUpload = pd.DataFrame({'UtcTime': uploadTimes,
+                                 'UploadValue': pd.to_numeric(pd.Series(uploadValues).reset_index(drop=True)),
+                                 'FileTime': pd.to_datetime(pd.Series(fileTimes).reset_index(drop=True)).dt.tz_localize(None)})
+        dfRead = pd.DataFrame({'UtcTime': pd.to_datetime(dfRead['Timestamp'], utc=True),
+                               'ReadValue': pd.to_numeric(dfRead['NumericValue1']),
+                               'LocalTime': pd.to_datetime(dfRead['Timestamp'].str[:19])})
+
+        # Join the uploaded and read back points on the UTC time stamp
+        dfJoin = dfUpload.merge(dfRead, on='UtcTime', how='outer', indicator=True)
+        matched = dfJoin['_merge'] == 'both'
+        valueDifference = (dfJoin['UploadValue'] - dfJoin['ReadValue']).abs()[matched]
+
+        reportRow['MissingPoints'] = int((dfJoin['_merge'] == 'left_only').sum())
+        reportRow['ExtraPoints'] = int((dfJoin['_merge'] == 'right_only').sum())
+        reportRow['ValueMismatches'] = int((valueDifference > valueTolerance).sum())
+        reportRow['TimeShifted'] = int((dfJoin['LocalTime'] != dfJoin['FileTime'])[matched].sum())
+        reportRow['MaxValueDifference'] = float(valueDifference.max()) if valueDifference.shape[0] > 0 else 0.0
+
+        # Define the Status and message
+        mismatchList = [field for field in ['MissingPoints', 'ValueMismatches', 'TimeShifted'] if reportRow[field] > 0]
+        reportRow['Status'] = 'Mismatch' if len(mismatchList) > 0 else 'Verified'
+        reportRow['Message'] = ", ".join(field + ": " + str(reportRow[field]) for field in mismatchList + ['ExtraPoints'] if reportRow[field] > 0)
+
+        return "success function", reportRow
+
+    except:
+
+        print("Error on verifyAppend Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'verifyAppend'"
+
+
+# Read a harvested logger/weather file ('.csv' or '.txt') with the 'DateTime' and value fields - as defined in 'readerBackend':
+# 'pyarrow' - multi-threaded pyarrow CSV reader with explicit column types ('DateTime' as text, value fields as 'fieldTypes' - default float64), 'pandas' - pandas C parser.
+# Falls back to pandas when pyarrow is not installed or a value field has non-numeric text (non-numeric values are then coerced and reported on validation).
+# Fields not in the file are not read. Files are read as 'utf-8-sig' so a UTF-8 byte order mark (i.e. files saved by Excel) is not part of the first field name.
+# Output: dataframe, backend used
+def readLoggerFile(file, valueFields, readerBackend, fieldTypes=None):
+    try:
+
+        # Header - fields to be read
+        headerFile = open(file, "r", encoding='utf-8-sig')
+        headerFields = [field.strip().strip('"') for field in headerFile.readline().rstrip("\r\n").split(",")]
+        headerFile.close()
+        readFields = [field for field in ['DateTime'] + list(valueFields) if field in headerFields]
+
+        if readerBackend.lower() == 'pyarrow':
+            try:
+                import pyarrow as pa
+                from pyarrow import csv as pacsv
+
+                fieldTypes = {} if fieldTypes is None else fieldTypes
+                columnTypes = {field: pa.type_for_alias(fieldTypes.get(field, 'float64')) for field in readFields if field != 'DateTime'}
+                columnTypes['DateTime'] = pa.string()
+                table = pacsv.read_csv(file, read_options=pacsv.ReadOptions(use_threads=True),
+                                       convert_options=pacsv.ConvertOptions(include_columns=readFields, column_types=columnTypes,
+                                                                            null_values=['', 'NA', 'NaN', 'nan', 'NULL', 'null'], strings_can_be_null=True))
+                return "success function", table.to_pandas(), 'pyarrow'
+
+            except ImportError:
+                print("WARNING - pyarrow not installed - reading with pandas - " + os.path.basename(file))
+            except Exception as error:
+                # i.e. ArrowInvalid - non-numeric text in a value field
+                print("WARNING - pyarrow reader failed (" + str(error).split("\n")[0] + ") - reading with pandas - " + os.path.basename(file))
+
+        df = pd.read_csv(file, sep=',', usecols=readFields, dtype={'DateTime': str}, encoding='utf-8-sig')
+        return "success function", df, 'pandas'
+
+    except:
+
+        print("Error on readLoggerFile Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'readLoggerFile'"
+
+
+# Benchmark the reader backends on the harvested files - each file is read 'repeats' times by backend (minimum time is reported)
+# Output: '.csv' report with FileName, Rows, Fields, Megabytes, Backend, BackendUsed, Seconds
+def benchmarkReader(fileList, valueFields, reportFile, repeats=3):
+    try:
+
+        import time
+        benchmarkRows = []
+        for file in fileList:
+            for readerBackend in ['pandas', 'pyarrow']:
+                seconds = []
+                for repeat in range(repeats):
+                    startTime = time.perf_counter()
+                    outVal = readLoggerFile(file, valueFields, readerBackend)
+                    seconds.append(time.perf_counter() - startTime)
+                    if outVal[0].lower() != "success function":
+                        return "Failed function - 'benchmarkReader'"
+                benchmarkRows.append({'FileName': os.path.basename(file), 'Rows': outVal[1].shape[0], 'Fields': outVal[1].shape[1],
+                                      'Megabytes': round(os.path.getsize(file) / 1048576.0, 3), 'Backend': readerBackend,
+                                      'BackendUsed': outVal[2], 'Seconds': round(min(seconds), 4)})
+
+        dfBenchmark = pd.DataFrame(benchmarkRows)
+        dfBenchmark.to_csv(reportFile, index=False)
+        print(dfBenchmark.to_string(index=False))
+
+        return "success function"
+
+    except:
+
+        print("Error on benchmarkReader Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'benchmarkReader'"
@@ -0,0 +1,709 @@
+# ---------------------------------------------------------------------------
+# AquariusIngest.py
+# Ingest engine shared by the Aquarius append scripts (Append_DTW_TimeSeries.py, AppendWeatherStation_TimeSeries.py) - harvests the logger files
+# for a logger type, prepares all mapped series of a file in one pass and appends them to the Aquarius Time Series.
+# Logger types are defined in the declarative 'loggerRegistry' (or a JSON registry file - 'registryFile') by: harvested file type, file name to
+# Location rule and the mapped time series (time series identifier, source column, dtype, unit and valid range). New logger types are added
+# by configuration - run either append script with '--loggerType' (and '--registryFile').
+# '--watch' runs a long running ingest of the new/modified files (file system notifications or polling) in micro-batches with one Aquarius session.
+# Script must be in the same directory as the append scripts.
+#
+# Created on: 20261019
+# Python Version 3.7 or greater
+# Dependices: pandas, optional watchdog (watch mode notifications), AquariusAppendFunctions.py, AquariusShard.py, AquariusMetrics.py, AquariusProfile.py, AquariusTimestamps.py (same directory)
+# ---------------------------------------------------------------------------
+
+import sys, os, glob, traceback, argparse, json, time, threading
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from AquariusMetrics import startMetrics, timedCall, countPoints, writeMetrics
+from AquariusProfile import markStage, profileRun
+from AquariusShard import parseShard, fileLocation, locationShard
+from AquariusTimestamps import parseUtcOffset, utcFromLocal, formatIsoTimes
+from AquariusAppendFunctions import validateSeries, writeValidationReport, appendPoints, verifyAppend, readLoggerFile, benchmarkReader
+
+
+# Logger type registry - by logger type:
+# FileType - harvested file type ('.csv'|'.txt'), LocationRule - regular expression on the file name, the Location is the matched groups joined
+# by '_' with the groups listed in 'Upper' upper cased (i.e. 'flfo_705_FLFO_705_2020_1_Hourly_20220412.csv' -> 'FLFO_705'),
+# UtcOffset - fixed UTC offset of the file time stamps (hours or '+/-HH:MM'), SiteUtcOffsets - optional offset by Location (i.e. {'GRKO_WX1': '-06:00'}),
+# Series - mapped time series: TimeSeries - Aquarius time series identifier (Parameter.Label), Column - field in the file, Dtype - field type on read
+# ('float64'|'int64'), Unit - time series unit (values in the field must be in this unit), ValidRange - physical range (min, max) or None.
+# SkipZeroSum - optional (default False), True: series with values summing to zero in the file are not uploaded (rule of the original append scripts) -
+# logged and reported with Status 'Skipped' in the validation report.
+loggerRegistry = {
+    "DTW": {"FileType": ".csv",
+            "LocationRule": {"Pattern": r"^([^_]+)_([^_]+)", "Upper": [1]},
+            "UtcOffset": "-07:00", "SiteUtcOffsets": {},
+            "Series": [{"TimeSeries": "DepthToWaterFromGround.DTW_g_Adjusted", "Column": "DTW_g_Adjusted", "Dtype": "float64", "Unit": "cm", "ValidRange": (-1000, 1000)},
+                       {"TimeSeries": "Absolute Pressure.Pressure_Baromerged", "Column": "Pressure_Baromerged", "Dtype": "float64", "Unit": "kPa", "ValidRange": (0, 1000)},
+                       {"TimeSeries": "Absolute Pressure.Pressure_Raw", "Column": "Pressure_Raw", "Dtype": "float64", "Unit": "kPa", "ValidRange": (0, 1000)},
+                       {"TimeSeries": "Groundwater Temp at Depth.Groundwater Temp at Depth 0-200 cm", "Column": "Temperature_Raw", "Dtype": "float64", "Unit": "degC", "ValidRange": (-10, 40)},
+                       {"TimeSeries": "Absolute Pressure.Pressure_Baro", "Column": "Pressure_Baro", "Dtype": "float64", "Unit": "kPa", "ValidRange": (0, 1000)}]},
+    "WeatherStation": {"FileType": ".csv",
+                       "LocationRule": {"Pattern": r"^([^_]+)_([^_]+)", "Upper": [1]},
+                       "UtcOffset": "-07:00", "SiteUtcOffsets": {},
+                       "Series": [{"TimeSeries": "Precip Total.Precipitation (cm)", "Column": "PRCP_CM", "Dtype": "float64", "Unit": "cm", "ValidRange": (0, 100)},
+                                  {"TimeSeries": "Snow Depth.Snow Depth (cm)", "Column": "SNWD", "Dtype": "float64", "Unit": "cm", "ValidRange": (0, 1500)},
+                                  {"TimeSeries": "Air Temp.Average Daily Temperature (C)", "Column": "TAVG_C", "Dtype": "float64", "Unit": "degC", "ValidRange": (-60, 50)},
+                                  {"TimeSeries": "Air Temp.Maximum Daily Temperature (C)", "Column": "TMAX_C", "Dtype": "float64", "Unit": "degC", "ValidRange": (-60, 50)},
+                                  {"TimeSeries": "Air Temp.Minimum Daily Temperature (C)", "Column": "TMIN_C", "Dtype": "float64", "Unit": "degC", "ValidRange": (-60, 50)}]}
+}
+
+
+def timeFun():          #Function to Grab Time
+    from datetime import datetime
+    b=datetime.now()
+    messageTime = b.isoformat()
+    return messageTime
+
+
+# Print the message and append it to the log file
+def logMessage(logFileName, scriptMsg):
+
+    print(scriptMsg)
+    logFile = open(logFileName, "a")
+    logFile.write(scriptMsg + "\n")
+    logFile.close()
+
+
+# Define the registry entry for the logger type - 'loggerRegistry' updated with the logger types in the JSON 'registryFile' (same structure)
+# Output: registry entry (FileType, LocationRule, Series)
+def loggerDefinition(loggerType, registryFile=None):
+    try:
+
+        registry = dict(loggerRegistry)
+        if registryFile is not None:
+            registryJson = open(registryFile, "r")
+            registry.update(json.load(registryJson))
+            registryJson.close()
+
+        if loggerType not in registry:
+            print("WARNING - loggerType " + str(loggerType) + " - Not Defined in the registry - " + ", ".join(sorted(registry)))
+            return "Failed function - 'loggerDefinition'"
+
+        return "success function", registry[loggerType]
+
+    except:
+
+        print("Error on loggerDefinition Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'loggerDefinition'"
+
+
+# Prepare all mapped series of a file in one pass - time stamps parsed and converted to the Aquarius time strings once for the file,
+# all value fields coerced to numeric at once. File time stamps are local time at the site 'utcOffset' (nanoseconds) - uploaded as ISO-8601
+# with the offset (i.e. '2021-06-01T00:00:00.000000-07:00') via int64 offset arithmetic.
+# Output: dictionary - Times (file time stamps as read - labeled UTC), UtcTimes (UTC instants), IsoTimes (upload time strings),
+# WindowMask (parsed time stamps in the 'overwriteStart'/'overwriteEnd' window), Values (numeric value fields)
+def prepareFileSeries(df, valueFields, appendMode, overwriteStart=None, overwriteEnd=None, utcOffset=0):
+    try:
+
+        times = pd.to_datetime(df['DateTime'], utc=True, errors='coerce')
+        windowMask = times.notna()
+
+        # Window being replaced ('overwriteStart'/'overwriteEnd') - 'OverwriteAppend' and 'Reflected' only
+        if appendMode.lower() != 'append':
+            if overwriteStart is not None:
+                windowMask &= times >= pd.Timestamp(overwriteStart, tz='UTC')
+            if overwriteEnd is not None:
+                windowMask &= times <= pd.Timestamp(overwriteEnd, tz='UTC')
+
+        utcNanoseconds = utcFromLocal(times.values.view('int64'), utcOffset)
+        utcTimes = pd.Series(pd.to_datetime(utcNanoseconds, utc=True), index=df.index)
+        isoTimes = pd.Series(formatIsoTimes(utcNanoseconds, utcOffset), index=df.index)
+        values = df[valueFields].apply(pd.to_numeric, errors='coerce')
+
+        return "success function", {'Times': times, 'UtcTimes': utcTimes, 'IsoTimes': isoTimes, 'WindowMask': windowMask, 'Values': values}
+
+    except:
+
+        print("Error on prepareFileSeries Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'prepareFileSeries'"
+
+
+# Connect to the Aquarius Service - output: timeseries client
+def openSession(settings):
+
+    # This is the Aquarius API Wrapper Class - used to hit the Next Generation Aquarius Springboard (20.1.68.0)
+    # Downlad the files from: https://github.com/AquaticInformatics/examples/tree/master/TimeSeries/PublicApis/Python
+    from timeseries_client import timeseries_client
+    return timeseries_client(settings['server'], settings['loginName'], settings['loginPass'])
+
+
+# Read back verification ('verifyUpload') with the Aquarius client of the verify thread - the client (requests.Session) of the upload thread is not
+# shared across threads. Each verify thread connects on its first verification, the clients are disconnected at the end of the run (verifyClients['Clients']).
+def threadVerifyAppend(settings, verifyClients, *verifyArguments):
+    try:
+
+        if getattr(verifyClients['Local'], 'timeseries', None) is None:
+            verifyClients['Local'].timeseries = openSession(settings)
+            with verifyClients['Lock']:
+                verifyClients['Clients'].append(verifyClients['Local'].timeseries)
+        return verifyAppend(verifyClients['Local'].timeseries, *verifyArguments)
+
+    except:
+
+        print("Error on threadVerifyAppend Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'threadVerifyAppend'"
+
+
+# Harvest and append the logger files as defined in the 'settings' (the append script parameters) for the 'loggerType' registry entry
+# harvestedFiles - files to be appended (None - all files of the file type under the 'rootDirectory'),
+# session - {'Timeseries': client, 'IdCache': time series unique id by name, 'LastUploaded': by file - last point (UTC) uploaded by time series name,
+# 'StartSizes': size by file in the tree when the watch started} shared across runs (watch mode) - None connects for the run. With a session 'Append'
+# uploads only the points after the last point uploaded from the file.
+def runIngest(settings, harvestedFiles=None, session=None):
+
+    logFileName = settings['logFileName']
+    validateOnly = settings['validateOnly']
+    appendMode = settings['appendMode']
+
+    # Request metrics for the run - metrics of a shared session are kept for the life of the session
+    if session is None:
+        startMetrics()
+
+    try:
+
+        outVal = loggerDefinition(settings['loggerType'], settings['registryFile'])
+        if outVal[0].lower() != "success function":
+            logMessage(logFileName, "WARNING - Function loggerDefinition Failed - loggerType: " + str(settings['loggerType']) + " - " + timeFun())
+            return "Failed function - 'runIngest'"
+        loggerEntry = outVal[1]
+
+        # Series to be processed - 'timeSeriesLoop' (None - all series of the logger type)
+        seriesList = loggerEntry['Series']
+        if settings['timeSeriesLoop'] is not None:
+            registrySeries = {series['TimeSeries']: series for series in seriesList}
+            seriesList = [registrySeries[timeSeries] for timeSeries in settings['timeSeriesLoop'] if timeSeries in registrySeries]
+            for timeSeries in settings['timeSeriesLoop']:
+                if timeSeries not in registrySeries:
+                    logMessage(logFileName, "WARNING Failed To Process - " + str(timeSeries) + " - No Time Series - Field Name Match Found in loggerType " + str(settings['loggerType']) + " - " + timeFun())
+
+        #################################################################
+        #Define the files to be processed
+        #################################################################
+        if harvestedFiles is None:
+            fileType = settings['fileType'] if settings['fileType'] is not None else loggerEntry['FileType']
+            harvestedFiles = glob.glob(settings['rootDirectory'] + "\\**\\*" + fileType, recursive= True)  #Sytnax Works for Python 3.x
+
+        # Subset the files to the shard being processed ('--shard i/N') - files are split by Location so all files for a Location are appended by one worker
+        shardIndex, shardCount = settings['shardIndex'], settings['shardCount']
+        if shardCount > 1:
+            harvestedFiles = [file for file in harvestedFiles if locationShard(file, shardCount, loggerEntry['LocationRule']) == shardIndex]
+            logMessage(logFileName, "Processing Shard " + str(shardIndex) + " of " + str(shardCount) + " - " + str(len(harvestedFiles)) + " Files - " + timeFun())
+
+        #Hit the Aquarius Service - not when only validating
+        if not validateOnly:
+            timeseries = openSession(settings) if session is None else session['Timeseries']
+
+        # Time series unique id by time series name - looked up once per name
+        idCache = {} if session is None else session['IdCache']
+
+        # Read back verifications run on background threads ('verifyUpload') - results are collected after the last upload
+        verifyPool = ThreadPoolExecutor(max_workers=settings['verifyThreads'], thread_name_prefix="Verify") if settings['verifyUpload'] and not validateOnly else None
+        verifyFutures = []
+        verifyClients = {'Local': threading.local(), 'Lock': threading.Lock(), 'Clients': []}   # Aquarius client by verify thread
+
+        #Loop Thru all harvested files
+        for file in harvestedFiles:
+
+            baseName = os.path.basename(file)
+            locationName = fileLocation(file, loggerEntry['LocationRule'])
+            if locationName is None:
+                logMessage(logFileName, "WARNING - Location not defined by the LocationRule - FileName: " + str(baseName) + " - " + timeFun())
+                continue
+
+            # Validation report rows for the file
+            reportRows = []
+
+            markStage("Read")
+
+            #Import the file to a Pandas Dataframe - read once with the 'DateTime' and value fields of all series ('readerBackend')
+            outVal = readLoggerFile(file, [series['Column'] for series in seriesList], settings['readerBackend'], {series['Column']: series['Dtype'] for series in seriesList})
+            if outVal[0].lower() != "success function":
+                logMessage(logFileName, "WARNING - Function readLoggerFile Failed - FileName: " + str(baseName) + " - " + timeFun())
+                continue
+            df = outVal[1]
+
+            # Prepare all mapped series in the file in one pass
+            markStage("Prepare")
+            fileSeries = [series for series in seriesList if series['Column'] in df.columns]
+            for series in seriesList:
+                if series['Column'] not in df.columns:
+                    logMessage(logFileName, "WARNING Field - " + str(series['Column']) + " for Time Series - " + series['TimeSeries'] + "@" + locationName + " not found in FileName: " + str(baseName) + " - " + timeFun())
+
+            utcOffset = parseUtcOffset(loggerEntry.get('SiteUtcOffsets', {}).get(locationName, loggerEntry.get('UtcOffset', '-07:00'))) or 0
+            outVal = prepareFileSeries(df, [series['Column'] for series in fileSeries], appendMode, settings['overwriteStart'], settings['overwriteEnd'], utcOffset)
+            if outVal[0].lower() != "success function":
+                logMessage(logFileName, "WARNING - Function prepareFileSeries Failed - FileName: " + str(baseName) + " - " + timeFun())
+                continue
+            preparedFile = outVal[1]
+
+            # Watch mode 'Append' - first change of a file in the tree when the watch started, the last points in the file at the start (uploaded by the
+            # batch run) are the last uploaded points
+            if session is not None and appendMode.lower() == 'append' and file in session['StartSizes']:
+                startRows = fileStartRows(file, session['StartSizes'].pop(file))
+                startMask = pd.Series(range(df.shape[0]), index=df.index) < startRows
+                for series in fileSeries:
+                    valueTimes = preparedFile['UtcTimes'][startMask & preparedFile['Values'][series['Column']].notna()]
+                    if valueTimes.shape[0] > 0:
+                        session['LastUploaded'].setdefault(file, {})[series['TimeSeries'] + "@" + locationName] = valueTimes.max()
+
+            #Loop Thru the Time Series to be Append to
+            for series in fileSeries:
+
+                timeSeries = series['TimeSeries']
+                fieldName = series['Column']
+
+                #Define the Time Series name at the defined Location
+                timeSeriesNameFull = timeSeries + "@" + locationName
+
+                # Validate the series before upload - no calls to Aquarius
+                markStage("Validate")
+                if settings['validateUpload'] or validateOnly:
+                    dfSeries = pd.DataFrame({'Time': df['DateTime'], 'Value': df[fieldName]})
+                    outVal = validateSeries(dfSeries, timeSeries, baseName, locationName, series['ValidRange'], settings['expectedInterval'], preparedFile['Times'],
+                                            loggerEntry.get('SkipZeroSum', False))
+                    if outVal[0].lower() != "success function":
+                        logMessage(logFileName, "WARNING - Function validateSeries Failed - " + timeSeriesNameFull + " - FileName: " + str(baseName) + " - " + timeFun())
+                        continue
+
+                    reportRow = outVal[1]
+                    reportRows.append(reportRow)
+                    if reportRow['Status'] == 'Blocked':
+                        logMessage(logFileName, "WARNING Upload Blocked - Validation Failed - " + timeSeriesNameFull + " - " + reportRow['Message'] + " - FileName: " + str(baseName) + " - " + timeFun())
+                        continue
+                    elif reportRow['Status'] == 'Empty':
+                        logMessage(logFileName, "WARNING Time Series - " + timeSeriesNameFull + " is Null/NAN:" + locationName + " - FileName: " + str(baseName) + " - " + timeFun())
+                        continue
+                    elif reportRow['Status'] == 'Skipped':
+                        logMessage(logFileName, "WARNING Time Series - " + timeSeriesNameFull + " Skipped - " + reportRow['Message'] + " - AT -" + locationName + " - FileName: " + str(baseName) + " - " + timeFun())
+                        continue
+
+                if validateOnly:
+                    continue
+
+                #Use the API getTimeSeiresUniqueId wrapper
+                markStage("Fetch")
+                try:
+                    if timeSeriesNameFull not in idCache:
+                        idCache[timeSeriesNameFull] = timedCall('getTimeSeriesUniqueId', timeSeries, timeseries.getTimeSeriesUniqueId, timeSeriesNameFull)
+                    timeSeriesId = idCache[timeSeriesNameFull]
+                    print("Time Series ID: " + timeSeriesId)
+                except:
+                    logMessage(logFileName, "WARNING Time Series - " + timeSeriesNameFull + " was not found at Site:" + locationName + " - " + timeFun())
+                    continue
+
+                # Points to upload - numeric values (rows with NaN are not uploaded - Aquarius Call not handling) in the overwrite window
+                markStage("Prepare")
+                valueMask = preparedFile['Values'][fieldName].notna()
+                if valueMask.sum() == 0:
+                    logMessage(logFileName, "WARNING Time Series - " + timeSeriesNameFull + " is Null/NAN:" + locationName + " - FileName: " + str(baseName) + " - " + timeFun())
+                    continue
+
+                # Registry 'SkipZeroSum' (opt in) with the validation off - values summing to zero are not uploaded (see validateSeries)
+                if loggerEntry.get('SkipZeroSum', False) and not settings['validateUpload'] and preparedFile['Values'][fieldName].sum() == 0:
+                    logMessage(logFileName, "WARNING Time Series - " + timeSeriesNameFull + " Skipped - Values sum to zero (SkipZeroSum) - AT -" + locationName + " - FileName: " + str(baseName) + " - " + timeFun())
+                    continue
+
+                uploadMask = valueMask & preparedFile['WindowMask']
+                if uploadMask.sum() == 0:
+                    logMessage(logFileName, "WARNING Time Series - " + timeSeriesNameFull + " has no values in the overwrite window - FileName: " + str(baseName) + " - " + timeFun())
+                    continue
+
+                # Watch mode 'Append' - the file grew since the last micro-batch, only the points after the last point uploaded from the file
+                lastUploaded = None if session is None or appendMode.lower() != 'append' else session['LastUploaded'].get(file, {}).get(timeSeriesNameFull)
+                if lastUploaded is not None:
+                    uploadMask = uploadMask & (preparedFile['UtcTimes'] > lastUploaded)
+                    if uploadMask.sum() == 0:
+                        logMessage(logFileName, "Time Series - " + timeSeriesNameFull + " has no new points since the last upload (" + lastUploaded.isoformat() + ") - FileName: " + str(baseName) + " - " + timeFun())
+                        continue
+
+                # Export the time strings and values to a list of dictionaries ('Time', 'Value') for upload to Aquarius
+                uploadTimes = preparedFile['IsoTimes'][uploadMask]
+                uploadValues = preparedFile['Values'][fieldName][uploadMask]
+                listToPush = [{'Time': timeString, 'Value': value} for timeString, value in zip(uploadTimes.tolist(), uploadValues.tolist())]
+
+                # Append ('appendMode') - 'OverwriteAppend'/'Reflected' replace the points in the time range of the points in one request
+                markStage("Upload")
+                outVal = timedCall(appendMode, timeSeries, appendPoints, timeseries, timeSeriesId, listToPush, preparedFile['UtcTimes'][uploadMask], appendMode)
+                if outVal[0].lower() == "success function":
+                    response = outVal[1]
+                    countPoints(appendMode, timeSeries, len(listToPush), len(json.dumps({'Points': listToPush, 'TimeRange': outVal[2]})))
+                    print(response)
+                    timeRangeMsg = "" if outVal[2] is None else " - " + appendMode + " TimeRange: " + outVal[2]['Start'] + " to " + outVal[2]['End']
+                    logMessage(logFileName, "Successfully Appended Time Series - " + timeSeriesNameFull + " - AT -" + locationName + " - Append ID is:" + str(response) + timeRangeMsg + " - FileName: " + str(baseName) + " - " + timeFun())
+                    if session is not None:
+                        session['LastUploaded'].setdefault(file, {})[timeSeriesNameFull] = preparedFile['UtcTimes'][uploadMask].max()
+
+                    # Read back the appended window on a background thread - the next upload is not blocked
+                    if verifyPool is not None:
+                        verifyFutures.append(verifyPool.submit(threadVerifyAppend, settings, verifyClients, timeSeriesId, timeSeriesNameFull, baseName, locationName, response,
+                                                               uploadTimes.values, uploadValues.values, preparedFile['Times'][uploadMask].dt.tz_localize(None).values))
+                else:
+                    logMessage(logFileName, "WARNING - Failed To Process - " + timeSeriesNameFull + " - AT -" + locationName + " - FileName: " + str(baseName) + " - " + timeFun())
+
+            del df, preparedFile
+
+            # Export the validation report for the file
+            markStage("Write")
+            outVal = writeValidationReport(reportRows, settings['validationReportFile'])
+            if outVal.lower() != "success function":
+                print("WARNING - Function writeValidationReport Failed - FileName: " + str(baseName))
+
+        # Wait for the read back verifications and export the verification report
+        if verifyPool is not None:
+            markStage("Verify")
+            verifyRows = []
+            for future in verifyFutures:
+                outVal = future.result()
+                if outVal[0].lower() != "success function":
+                    logMessage(logFileName, "WARNING - Function verifyAppend Failed - " + timeFun())
+                    continue
+                reportRow = outVal[1]
+                verifyRows.append(reportRow)
+                if reportRow['Status'] != 'Verified':
+                    logMessage(logFileName, "WARNING - Append Verification " + reportRow['Status'] + " - " + reportRow['TimeSeries'] + " - AT -" + reportRow['Location'] + " - " + reportRow['Message'] + " - FileName: " + reportRow['FileName'] + " - " + timeFun())
+            verifyPool.shutdown()
+            for verifyClient in verifyClients['Clients']:
+                verifyClient.disconnect()
+
+            outVal = writeValidationReport(verifyRows, settings['verificationReportFile'])
+            if outVal.lower() != "success function":
+                print("WARNING - Function writeValidationReport Failed - " + settings['verificationReportFile'])
+
+            verifiedCount = len([reportRow for reportRow in verifyRows if reportRow['Status'] == 'Verified'])
+            logMessage(logFileName, "Append Verification - " + str(verifiedCount) + " of " + str(len(verifyFutures)) + " Appends Verified - Report: " + settings['verificationReportFile'] + " - " + timeFun())
+
+        #Next Generation Disconnect - a shared session stays connected
+        if not validateOnly and session is None:
+            timeseries.disconnect()
+
+        logMessage(logFileName, "Successfully processed - " + settings['scriptName'] + ".py - " + timeFun())
+        outVal = "success function"
+
+    except:
+        logMessage(logFileName, "Exiting Error - " + settings['scriptName'] + ".py - " + timeFun())
+        print("See log file " + logFileName + " for more details")
+        traceback.print_exc(file=sys.stdout)
+        outVal = "Failed function - 'runIngest'"
+
+    # Export the run metrics - request counts, errors, latency histograms, points and bytes posted by endpoint and time series
+    if settings['exportMetrics'] and not validateOnly:
+        metricsOut = writeMetrics(settings['scriptName'], settings['metricsFile'])
+        if metricsOut[0].lower() != "success function":
+            print("WARNING - Function writeMetrics Failed")
+        else:
+            summary = metricsOut[1]
+            logMessage(logFileName, "Run Metrics - " + str(summary['Requests']) + " Requests - " + str(summary['Errors']) + " Errors - " + str(summary['Points']) + " Points - " + str(summary['BytesPosted']) + " Bytes Posted - " + str(summary['PointsPerSecond']) + " Points/Second - " + settings['metricsFile'] + " - " + timeFun())
+
+    return outVal
+
+
+# Number of data rows in the first 'startSize' bytes of a logger file (complete, non blank lines after the header) - watch mode 'Append', rows of a file
+# in the tree when the watch started (uploaded by the batch run)
+def fileStartRows(file, startSize):
+
+    startFile = open(file, "rb")
+    startBytes = startFile.read(startSize)
+    startFile.close()
+    completeLines = startBytes.split(b"\n")[:-1]
+    return max(len([line for line in completeLines if line.strip() != b""]) - 1, 0)
+
+
+# Size and modified time of a file - None when the file doesn't exist (i.e. removed or renamed)
+def fileSignature(file):
+
+    try:
+        fileStat = os.stat(file)
+        return fileStat.st_size, fileStat.st_mtime_ns
+    except OSError:
+        return None
+
+
+# Scan the files of the file type under the root directory - output: dictionary with file: size and modified time, dictionary with directory: size and
+# modified time. With the files and directories of the last scan ('lastFiles', 'lastDirectories') only the directories with a new modified time (files
+# created, removed or renamed) and new directories are listed - the other known files are checked by their size and modified time
+def scanLoggerFiles(rootDirectory, fileType, lastFiles=None, lastDirectories=None):
+
+    scannedFiles = {}
+    scannedDirectories = {}
+    listDirectories = [rootDirectory]
+    if lastDirectories is not None:
+        listDirectories = []
+        for directory, signature in lastDirectories.items():
+            currentSignature = fileSignature(directory)
+            if currentSignature is None:
+                continue
+            if currentSignature != signature:
+                listDirectories.append(directory)
+            else:
+                scannedDirectories[directory] = signature
+        for file in lastFiles:
+            if os.path.dirname(file) in scannedDirectories:
+                signature = fileSignature(file)
+                if signature is not None:
+                    scannedFiles[file] = signature
+
+    while len(listDirectories) > 0:
+        directory = listDirectories.pop()
+        scannedDirectories[directory] = fileSignature(directory)
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir():
+                if lastDirectories is None or entry.path not in lastDirectories:
+                    listDirectories.append(entry.path)
+            elif entry.name.lower().endswith(fileType.lower()):
+                signature = fileSignature(entry.path)
+                if signature is not None:
+                    scannedFiles[entry.path] = signature
+    return scannedFiles, scannedDirectories
+
+
+# Start the file system notifications (watchdog package) on the root directory - 'fileChanged(file)' called on each created, modified or moved (destination) file.
+# Output: started observer, None when watchdog is not installed
+def startFileObserver(rootDirectory, fileChanged):
+
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        return None
+
+    class LoggerFileHandler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if not event.is_directory and event.event_type in ('created', 'modified', 'moved', 'closed'):
+                fileChanged(getattr(event, 'dest_path', '') or event.src_path)
+
+    observer = Observer()
+    observer.schedule(LoggerFileHandler(), rootDirectory, recursive=True)
+    observer.start()
+    return observer
+
+
+# Watch mode ('--watch') - long running ingest of the new and modified logger files under the 'rootDirectory'. Changes are detected by file system
+# notifications (watchdog package) or by scanning the file sizes/modified times every 'watchPollSeconds' ('watchMethod' 'Poll' or watchdog not installed).
+# Files in the tree when the watch starts are not ingested (batch run). A changed file is settled once its size and modified time are unchanged for
+# 'watchDebounceSeconds'. Settled files are ingested as a micro-batch (ordered by Location and modified time) when no other file is changing or
+# 'watchBatchSeconds' after the first settled file - one Aquarius session and time series id cache for the life of the watch (reconnected after a
+# failed micro-batch). With 'appendMode' 'Append' a file growing between micro-batches is appended from the point after the last point uploaded from the
+# file by time series - the rows of the files in the tree when the watch starts (uploaded by the batch run) are those in the file size at the start,
+# found when the file first changes (no file is read at the start).
+# Runs for 'watchDuration' seconds - None until interrupted (Ctrl+C)
+def watchIngest(settings):
+
+    logFileName = settings['logFileName']
+    validateOnly = settings['validateOnly']
+    observer = None
+    session = {'Timeseries': None, 'IdCache': {}, 'LastUploaded': {}, 'StartSizes': {}}
+
+    # Request metrics for the life of the watch - exported after each micro-batch
+    startMetrics()
+
+    try:
+
+        outVal = loggerDefinition(settings['loggerType'], settings['registryFile'])
+        if outVal[0].lower() != "success function":
+            logMessage(logFileName, "WARNING - Function loggerDefinition Failed - loggerType: " + str(settings['loggerType']) + " - " + timeFun())
+            return "Failed function - 'watchIngest'"
+        loggerEntry = outVal[1]
+        fileType = settings['fileType'] if settings['fileType'] is not None else loggerEntry['FileType']
+
+        # Changed files being debounced - file: [time of the last change, size and modified time]
+        pendingFiles = {}
+        pendingLock = threading.Lock()
+
+        def fileChanged(file):
+            if file.lower().endswith(fileType.lower()):
+                with pendingLock:
+                    pendingFiles[file] = [time.time(), fileSignature(file)]
+
+        knownFiles, knownDirectories = scanLoggerFiles(settings['rootDirectory'], fileType)
+        if settings['watchMethod'].lower() != 'poll':
+            observer = startFileObserver(settings['rootDirectory'], fileChanged)
+
+        # 'Append' - size of the existing files, the rows in it are not appended again when the file grows (see runIngest)
+        if not validateOnly and settings['appendMode'].lower() == 'append':
+            session['StartSizes'] = {file: signature[0] for file, signature in knownFiles.items()}
+
+        if not validateOnly:
+            session['Timeseries'] = openSession(settings)
+
+        logMessage(logFileName, "Watching - " + settings['rootDirectory'] + " - " + fileType + " Files - " + ("Notifications" if observer is not None else "Polling every " + str(settings['watchPollSeconds']) + " Seconds") + " - " + str(len(knownFiles)) + " Existing Files - " + timeFun())
+
+        batchFiles = {}
+        batchStart = None
+        batchNumber = 0
+        watchStart = lastScan = time.time()
+        while settings['watchDuration'] is None or time.time() - watchStart < settings['watchDuration']:
+
+            time.sleep(1)
+            now = time.time()
+
+            # Polling - files with a new size/modified time since the last scan
+            if observer is None and now - lastScan >= settings['watchPollSeconds']:
+                scannedFiles, knownDirectories = scanLoggerFiles(settings['rootDirectory'], fileType, knownFiles, knownDirectories)
+                for file, signature in scannedFiles.items():
+                    if knownFiles.get(file) != signature:
+                        fileChanged(file)
+                knownFiles = scannedFiles
+                lastScan = now
+
+            # Debounce - a file is settled when unchanged for 'watchDebounceSeconds'
+            with pendingLock:
+                for file, (changeTime, signature) in list(pendingFiles.items()):
+                    if now - changeTime < settings['watchDebounceSeconds']:
+                        continue
+                    currentSignature = fileSignature(file)
+                    if currentSignature is None:
+                        del pendingFiles[file]
+                    elif currentSignature != signature:
+                        pendingFiles[file] = [now, currentSignature]
+                    else:
+                        del pendingFiles[file]
+                        batchFiles[file] = signature
+                        batchStart = now if batchStart is None else batchStart
+                pendingCount = len(pendingFiles)
+
+            # Micro-batch - the settled files once no other file is changing or 'watchBatchSeconds' after the first settled file
+            if len(batchFiles) == 0 or (pendingCount > 0 and now - batchStart < settings['watchBatchSeconds']):
+                continue
+
+            batchNumber += 1
+            batchList = sorted(batchFiles, key=lambda file: (str(fileLocation(file, loggerEntry['LocationRule'])), batchFiles[file][1]))
+            locationCount = len(set(fileLocation(file, loggerEntry['LocationRule']) for file in batchList))
+            batchFiles = {}
+            batchStart = None
+            logMessage(logFileName, "Micro-batch " + str(batchNumber) + " - " + str(len(batchList)) + " Files - " + str(locationCount) + " Locations - " + timeFun())
+
+            if not validateOnly and session['Timeseries'] is None:
+                session['Timeseries'] = openSession(settings)
+
+            outVal = runIngest(settings, batchList, session)
+            if outVal.lower() != "success function":
+                logMessage(logFileName, "WARNING - Micro-batch " + str(batchNumber) + " Failed - Reconnecting for the next micro-batch - " + timeFun())
+                if session['Timeseries'] is not None:
+                    try:
+                        session['Timeseries'].disconnect()
+                    except:
+                        pass
+                    session['Timeseries'] = None
+
+        logMessage(logFileName, "Watch Finished - " + str(batchNumber) + " Micro-batches - " + timeFun())
+        outVal = "success function"
+
+    except KeyboardInterrupt:
+        logMessage(logFileName, "Watch Stopped - " + timeFun())
+        outVal = "success function"
+
+    except:
+        logMessage(logFileName, "Exiting Error - Watch - " + settings['scriptName'] + ".py - " + timeFun())
+        print("See log file " + logFileName + " for more details")
+        traceback.print_exc(file=sys.stdout)
+        outVal = "Failed function - 'watchIngest'"
+
+    if observer is not None:
+        observer.stop()
+        observer.join()
+    if session['Timeseries'] is not None:
+        session['Timeseries'].disconnect()
+
+    return outVal
+
+
+# Benchmark the reader backends ('pandas', 'pyarrow') on the harvested files - report exported to the workspace
+def readerBenchmark(settings):
+
+    outVal = loggerDefinition(settings['loggerType'], settings['registryFile'])
+    if outVal[0].lower() != "success function":
+        return "Failed function - 'readerBenchmark'"
+    loggerEntry = outVal[1]
+
+    fileType = settings['fileType'] if settings['fileType'] is not None else loggerEntry['FileType']
+    harvestedFiles = glob.glob(settings['rootDirectory'] + "\\**\\*" + fileType, recursive= True)  #Sytnax Works for Python 3.x
+    valueFields = [series['Column'] for series in loggerEntry['Series'] if settings['timeSeriesLoop'] is None or series['TimeSeries'] in settings['timeSeriesLoop']]
+    reportFile = settings['workspace'] + "\\" + settings['outLogFileName'] + "_ReaderBenchmark.csv"
+
+    outVal = benchmarkReader(harvestedFiles, valueFields, reportFile)
+    if outVal.lower() != "success function":
+        print("WARNING - Function benchmarkReader Failed")
+    return outVal
+
+
+# Parse the command line options into the 'settings' - options not defined default to the parameters defined at the start of the append script
+def parseIngestArguments(settings, description, argumentList=None):
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--loggerType', help="Logger type in the registry (i.e. 'DTW', 'WeatherStation' or a type in the '--registryFile')")
+    parser.add_argument('--registryFile', help="JSON registry file with additional logger types (same structure as 'loggerRegistry' in AquariusIngest.py)")
+    parser.add_argument('--rootDirectory', help="Root Directory - all child directories and files will be processed")
+    parser.add_argument('--timeSeriesLoop', nargs='+', help="Time series to be processed")
+    parser.add_argument('--fileType', choices=['.csv', '.txt'], help="Defines if .csv or .txt files are being processed (default - the logger type file type)")
+    parser.add_argument('--workspace', help="Workspace for processing (log file)")
+    parser.add_argument('--appendMode', choices=['Append', 'OverwriteAppend', 'Reflected'], help="'Append' or replace the points in the file time range ('OverwriteAppend'/'Reflected')")
+    parser.add_argument('--overwriteStart', help="Start of the window to be replaced (i.e. '2021-07-01 00:00')")
+    parser.add_argument('--overwriteEnd', help="End of the window to be replaced (i.e. '2021-07-15 00:00')")
+    parser.add_argument('--readerBackend', choices=['pyarrow', 'pandas'], help="File reader backend")
+    parser.add_argument('--benchmarkReader', action='store_true', help="Benchmark the reader backends on the harvested files - no connection to Aquarius")
+    parser.add_argument('--validateOnly', action='store_true', help="Only validate the harvested files - no connection to Aquarius")
+    parser.add_argument('--verifyUpload', action='store_true', help="Read back each appended window and compare to the uploaded points - verification report in the workspace")
+    parser.add_argument('--profile', action='store_true', help="Profile the run - time by stage, flame graph and top allocations files in the workspace")
+    parser.add_argument('--profileMode', choices=['Sample', 'Deterministic'], help="'Sample' - stack sampling (flame graph files), 'Deterministic' - cProfile")
+    parser.add_argument('--shard', type=parseShard, help="Process shard i of N (i.e. 2/4) - files are split across shards by a hash of the Location")
+    parser.add_argument('--watch', action='store_true', help="Watch the root directory and ingest new/modified files in micro-batches until interrupted (or '--watchDuration')")
+    parser.add_argument('--watchMethod', choices=['Auto', 'Poll'], help="'Auto' - file system notifications (watchdog package) with polling when not installed, 'Poll' - polling")
+    parser.add_argument('--watchDuration', type=float, help="Seconds the watch runs before exiting")
+    args = parser.parse_args(argumentList)
+
+    for option in ['loggerType', 'registryFile', 'rootDirectory', 'timeSeriesLoop', 'fileType', 'workspace', 'appendMode', 'overwriteStart', 'overwriteEnd', 'readerBackend', 'profileMode',
+                   'watchMethod', 'watchDuration']:
+        if getattr(args, option) is not None:
+            settings[option] = getattr(args, option)
+    if args.validateOnly:
+        settings['validateOnly'] = True
+    if args.verifyUpload:
+        settings['verifyUpload'] = True
+    if args.shard is not None:
+        settings['shardIndex'], settings['shardCount'] = args.shard
+
+    workspace, outLogFileName = settings['workspace'], settings['outLogFileName']
+    if args.workspace is not None:
+        settings['validationReportFile'] = workspace + "\\" + outLogFileName + "_ValidationReport.csv"
+        settings['verificationReportFile'] = workspace + "\\" + outLogFileName + "_VerificationReport.csv"
+        settings['metricsFile'] = workspace + "\\" + outLogFileName + "_Metrics.prom"
+        settings['logFileName'] = workspace + "\\" + outLogFileName + ".LogFile.txt"
+
+    # Log and metrics files by shard so concurrent workers don't share a log file
+    if settings['shardCount'] > 1:
+        shardText = "_Shard" + str(settings['shardIndex']) + "of" + str(settings['shardCount'])
+        settings['logFileName'] = workspace + "\\" + outLogFileName + shardText + ".LogFile.txt"
+        settings['metricsFile'] = workspace + "\\" + outLogFileName + shardText + "_Metrics.prom"
+
+    return args
+
+
+# Run the parsed command - reader benchmark ('--benchmarkReader'), watch mode ('--watch'), profiled run ('--profile') or the ingest run
+def runIngestCommand(settings, args):
+
+    if args.benchmarkReader:
+        return readerBenchmark(settings)
+
+    if args.watch:
+        return watchIngest(settings)
+
+    if args.profile:
+        # Profile the run - output files in the workspace (by shard)
+        outVal = profileRun(lambda: runIngest(settings), settings['profileMode'], settings['logFileName'].replace(".LogFile.txt", "_Profile"), traceMemory=settings['profileMemory'])
+        if outVal[0].lower() != "success function":
+            print("WARNING - Function profileRun Failed")
+            return "Failed function - 'runIngestCommand'"
+        print("Profile Exported - " + ", ".join(outVal[1]))
+        return "success function"
+
+    return runIngest(settings)
@@ -0,0 +1,182 @@
+# ---------------------------------------------------------------------------
+# AquariusMetrics.py
+# Request metrics shared by the Aquarius append and export scripts - request and error counts, latency histograms, points and bytes posted
+# by endpoint (i.e. 'getTimeSeriesUniqueId', 'getTimeSeriesCorrectedData', 'append') and time series. Exported at the end of each run
+# to a Prometheus textfile (i.e. for the node_exporter textfile collector) and a JSON summary.
+# Script must be in the same directory as the append and export scripts.
+#
+# Created on: 20261019
+# Python Version 3.7 or greater
+# Dependices: none
+# ---------------------------------------------------------------------------
+
+import sys, os, traceback, time, json, threading
+
+# Latency histogram bucket upper bounds (seconds)
+latencyBuckets = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0]
+
+# Metrics by endpoint and time series - updated from the main and background (i.e. verification) threads
+metricLock = threading.Lock()
+requestMetrics = {}
+runStartTime = time.time()
+
+
+# Start the metrics for a run - clears the metrics and sets the run start time
+def startMetrics():
+
+    global runStartTime
+    with metricLock:
+        requestMetrics.clear()
+        runStartTime = time.time()
+
+
+# Metrics entry for the endpoint and time series - created on first use (called with the lock held)
+def metricEntry(endpoint, timeSeries):
+
+    key = (str(endpoint), str(timeSeries))
+    if key not in requestMetrics:
+        requestMetrics[key] = {'Requests': 0, 'Errors': 0, 'Points': 0, 'Bytes': 0, 'Seconds': [], 'Buckets': [0] * len(latencyBuckets)}
+    return requestMetrics[key]
+
+
+# Record a request - latency (seconds) and error by endpoint and time series
+def observeRequest(endpoint, timeSeries, seconds, error=False):
+
+    with metricLock:
+        entry = metricEntry(endpoint, timeSeries)
+        entry['Requests'] += 1
+        entry['Errors'] += 1 if error else 0
+        entry['Seconds'].append(seconds)
+        for index, bucket in enumerate(latencyBuckets):
+            if seconds <= bucket:
+                entry['Buckets'][index] += 1
+                break
+
+
+# Record the points fetched/posted and bytes posted by endpoint and time series
+def countPoints(endpoint, timeSeries, points, postBytes=0):
+
+    with metricLock:
+        entry = metricEntry(endpoint, timeSeries)
+        entry['Points'] += int(points)
+        entry['Bytes'] += int(postBytes)
+
+
+# Time a call to an Aquarius endpoint - the call is an error when it raises (exception is re-raised) or returns a "Failed function" result
+def timedCall(endpoint, timeSeries, function, *args, **kwargs):
+
+    startTime = time.perf_counter()
+    try:
+        result = function(*args, **kwargs)
+    except:
+        observeRequest(endpoint, timeSeries, time.perf_counter() - startTime, error=True)
+        raise
+    failed = isinstance(result, str) and result.lower().startswith("failed function")
+    observeRequest(endpoint, timeSeries, time.perf_counter() - startTime, error=failed)
+    return result
+
+
+# Percentile of the sorted latencies (nearest rank)
+def latencyPercentile(sortedSeconds, percentile):
+
+    if len(sortedSeconds) == 0:
+        return 0.0
+    return sortedSeconds[min(len(sortedSeconds) - 1, int(round(percentile * (len(sortedSeconds) - 1))))]
+
+
+# Escape a Prometheus label value
+def labelValue(value):
+
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+# Export the run metrics - Prometheus textfile ('metricsFile') and JSON summary (same name with a '.json' suffix)
+# Both files are written to a temporary file and renamed so a collector never reads a partial file.
+# Output: JSON summary dictionary
+def writeMetrics(script, metricsFile):
+    try:
+
+        runEndTime = time.time()
+        runSeconds = max(runEndTime - runStartTime, 1e-9)
+        with metricLock:
+            metricItems = sorted((key, dict(entry, Seconds=sorted(entry['Seconds']), Buckets=list(entry['Buckets']))) for key, entry in requestMetrics.items())
+
+        # JSON summary by endpoint and time series
+        seriesRows = []
+        for (endpoint, timeSeries), entry in metricItems:
+            seriesRows.append({'Endpoint': endpoint,
+                               'TimeSeries': timeSeries,
+                               'Requests': entry['Requests'],
+                               'Errors': entry['Errors'],
+                               'ErrorRate': round(entry['Errors'] / entry['Requests'], 4) if entry['Requests'] > 0 else 0.0,
+                               'Points': entry['Points'],
+                               'BytesPosted': entry['Bytes'],
+                               'PointsPerSecond': round(entry['Points'] / runSeconds, 2),
+                               'LatencySum': round(sum(entry['Seconds']), 4),
+                               'LatencyMean': round(sum(entry['Seconds']) / len(entry['Seconds']), 4) if len(entry['Seconds']) > 0 else 0.0,
+                               'LatencyP50': round(latencyPercentile(entry['Seconds'], 0.5), 4),
+                               'LatencyP95': round(latencyPercentile(entry['Seconds'], 0.95), 4),
+                               'LatencyMax': round(entry['Seconds'][-1], 4) if len(entry['Seconds']) > 0 else 0.0})
+
+        requests = sum(row['Requests'] for row in seriesRows)
+        errors = sum(row['Errors'] for row in seriesRows)
+        summary = {'Script': script,
+                   'RunStart': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(runStartTime)),
+                   'RunEnd': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(runEndTime)),
+                   'RunSeconds': round(runSeconds, 3),
+                   'Requests': requests,
+                   'Errors': errors,
+                   'ErrorRate': round(errors / requests, 4) if requests > 0 else 0.0,
+                   'Points': sum(row['Points'] for row in seriesRows),
+                   'BytesPosted': sum(row['BytesPosted'] for row in seriesRows),
+                   'PointsPerSecond': round(sum(row['Points'] for row in seriesRows) / runSeconds, 2),
+                   'Endpoints': seriesRows}
+
+        # Prometheus text exposition format - metrics are for the last run
+        lines = []
+        counterMetrics = [('aquarius_requests_total', 'Requests', "Aquarius requests by endpoint and time series"),
+                          ('aquarius_request_errors_total', 'Errors', "Aquarius requests failed by endpoint and time series"),
+                          ('aquarius_points_total', 'Points', "Points fetched or posted by endpoint and time series"),
+                          ('aquarius_posted_bytes_total', 'Bytes', "Bytes posted (JSON body) by endpoint and time series")]
+        for metricName, field, helpText in counterMetrics:
+            lines.append("# HELP " + metricName + " " + helpText)
+            lines.append("# TYPE " + metricName + " counter")
+            for (endpoint, timeSeries), entry in metricItems:
+                lines.append(metricName + '{script="' + labelValue(script) + '",endpoint="' + labelValue(endpoint) + '",time_series="' + labelValue(timeSeries) + '"} ' + str(entry[field]))
+
+        lines.append("# HELP aquarius_request_duration_seconds Aquarius request latency by endpoint and time series")
+        lines.append("# TYPE aquarius_request_duration_seconds histogram")
+        for (endpoint, timeSeries), entry in metricItems:
+            labels = 'script="' + labelValue(script) + '",endpoint="' + labelValue(endpoint) + '",time_series="' + labelValue(timeSeries) + '"'
+            cumulative = 0
+            for bucket, count in zip(latencyBuckets, entry['Buckets']):
+                cumulative += count
+                lines.append('aquarius_request_duration_seconds_bucket{' + labels + ',le="' + str(bucket) + '"} ' + str(cumulative))
+            lines.append('aquarius_request_duration_seconds_bucket{' + labels + ',le="+Inf"} ' + str(entry['Requests']))
+            lines.append('aquarius_request_duration_seconds_sum{' + labels + '} ' + repr(round(sum(entry['Seconds']), 6)))
+            lines.append('aquarius_request_duration_seconds_count{' + labels + '} ' + str(entry['Requests']))
+
+        runGauges = [('aquarius_run_duration_seconds', summary['RunSeconds'], "Run duration"),
+                     ('aquarius_run_points_per_second', summary['PointsPerSecond'], "Points fetched or posted per second of the run"),
+                     ('aquarius_run_error_rate', summary['ErrorRate'], "Failed requests / requests in the run"),
+                     ('aquarius_run_timestamp_seconds', round(runEndTime, 3), "Run end time (Unix time)")]
+        for metricName, value, helpText in runGauges:
+            lines.append("# HELP " + metricName + " " + helpText)
+            lines.append("# TYPE " + metricName + " gauge")
+            lines.append(metricName + '{script="' + labelValue(script) + '"} ' + repr(value))
+
+        summaryFile = os.path.splitext(metricsFile)[0] + ".json"
+        for outFile, outText in [(metricsFile, "\n".join(lines) + "\n"), (summaryFile, json.dumps(summary, indent=2))]:
+            tempFile = outFile + ".tmp"
+            metricsOut = open(tempFile, "w")
+            metricsOut.write(outText)
+            metricsOut.close()
+            os.replace(tempFile, outFile)
+
+        return "success function", summary
+
+    except:
+
+        print("Error on writeMetrics Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'writeMetrics'"
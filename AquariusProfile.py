@@ -0,0 +1,210 @@
+# ---------------------------------------------------------------------------
+# AquariusProfile.py
+# Profiling of a full run of the Aquarius append and export scripts ('--profile') - time by pipeline stage (i.e. fetch, setupDateValues,
+# labeling, aggregation, write, upload), flame graph stacks (collapsed stack and speedscope files) and a tracemalloc top allocations report.
+# Stages are marked in the scripts with 'markStage' - time is attributed to the marked stage until the next mark.
+# Script must be in the same directory as the append and export scripts.
+#
+# Created on: 20261019
+# Python Version 3.7 or greater
+# Dependices: none
+# ---------------------------------------------------------------------------
+
+import sys, os, traceback, time, json, threading, tracemalloc
+
+# Stage of the main thread and the time by stage - only tracked while profiling
+profileActive = False
+currentStage = "Setup"
+stageStartTime = 0.0
+stageTimes = {}
+stagePeakMemory = {}
+memorySnapshot = None
+memorySnapshotPeak = 0
+
+
+# Mark the start of a pipeline stage - time since the last mark is attributed to the previous stage
+def markStage(stage):
+
+    global currentStage, stageStartTime, memorySnapshot, memorySnapshotPeak
+    if not profileActive:
+        return
+
+    now = time.perf_counter()
+    stageTimes[currentStage] = stageTimes.get(currentStage, 0.0) + now - stageStartTime
+
+    # Traced memory peak of the stage - top allocations are snapshot at the end of the stage with the largest peak (>10% over the last snapshot)
+    if tracemalloc.is_tracing():
+        tracedPeak = tracemalloc.get_traced_memory()[1]
+        stagePeakMemory[currentStage] = max(stagePeakMemory.get(currentStage, 0), tracedPeak)
+        if tracedPeak > memorySnapshotPeak * 1.1:
+            memorySnapshot = (currentStage, tracedPeak, tracemalloc.take_snapshot())
+            memorySnapshotPeak = tracedPeak
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+
+    currentStage = stage
+    stageStartTime = time.perf_counter()
+
+
+# Frame label for the flame graph - function (file:first line)
+def frameLabel(frame):
+
+    code = frame.f_code
+    return code.co_name + " (" + os.path.basename(code.co_filename) + ":" + str(code.co_firstlineno) + ")"
+
+
+# Sample the stacks of all threads every 'sampleInterval' seconds until 'stopEvent' is set - main thread stacks are rooted on the current stage,
+# other threads (i.e. background writers) on the thread name. Idle worker threads (waiting in threading/queue or on the executor work queue) are not counted.
+def sampleStacks(stackCounts, sampleInterval, stopEvent, mainThreadId):
+
+    threadNames = {}
+    samplerThreadId = threading.get_ident()
+    while not stopEvent.wait(sampleInterval):
+        for threadId, frame in sys._current_frames().items():
+            if threadId == samplerThreadId:
+                continue
+            if threadId != mainThreadId and (os.path.basename(frame.f_code.co_filename) in ('threading.py', 'queue.py') or
+                                             (frame.f_code.co_name == '_worker' and 'concurrent' in frame.f_code.co_filename)):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frameLabel(frame))
+                frame = frame.f_back
+            if threadId == mainThreadId:
+                root = "Stage: " + currentStage
+            else:
+                if threadId not in threadNames:
+                    threadNames.update({thread.ident: thread.name for thread in threading.enumerate()})
+                root = "Thread: " + threadNames.get(threadId, str(threadId))
+            key = (root,) + tuple(reversed(stack))
+            stackCounts[key] = stackCounts.get(key, 0) + 1
+
+
+# Export the collapsed stack file ('frame;frame;frame count' - i.e. for flamegraph.pl) and the speedscope sampled profile (https://www.speedscope.app)
+def writeStacks(stackCounts, sampleSeconds, profilePrefix, profileName):
+
+    collapsedFile = open(profilePrefix + ".collapsed.txt", "w")
+    for stack, count in sorted(stackCounts.items()):
+        collapsedFile.write(";".join(frame.replace(";", ":") for frame in stack) + " " + str(count) + "\n")
+    collapsedFile.close()
+
+    frames = []
+    frameIndex = {}
+    samples = []
+    weights = []
+    for stack, count in sorted(stackCounts.items()):
+        for frame in stack:
+            if frame not in frameIndex:
+                frameIndex[frame] = len(frames)
+                frames.append({'name': frame})
+        samples.append([frameIndex[frame] for frame in stack])
+        weights.append(round(count * sampleSeconds, 6))
+
+    speedscope = {'$schema': 'https://www.speedscope.app/file-format-schema.json',
+                  'shared': {'frames': frames},
+                  'profiles': [{'type': 'sampled', 'name': profileName, 'unit': 'seconds', 'startValue': 0, 'endValue': round(sum(weights), 6),
+                                'samples': samples, 'weights': weights}],
+                  'name': profileName,
+                  'exporter': 'AquariusProfile.py'}
+    speedscopeFile = open(profilePrefix + ".speedscope.json", "w")
+    json.dump(speedscope, speedscopeFile)
+    speedscopeFile.close()
+
+
+# Profile a full run of 'function' as defined in 'profileMode': 'Sample' - stack sampling every 'sampleInterval' seconds (flame graph files),
+# 'Deterministic' - cProfile of every call ('.pstats' file and the top functions by cumulative time). Both modes export the time by stage
+# ('_Stages.csv') and, with 'traceMemory', the tracemalloc top allocations ('_Memory.txt' - tracing slows the run).
+# Output files are prefixed with 'profilePrefix' (i.e. '{workspace}\{outLogFileName}_Profile')
+# Output: list of the exported files
+def profileRun(function, profileMode, profilePrefix, sampleInterval=0.005, traceMemory=True, topAllocations=25):
+
+    global profileActive, currentStage, stageStartTime, memorySnapshot, memorySnapshotPeak
+    try:
+
+        stageTimes.clear()
+        stagePeakMemory.clear()
+        memorySnapshot = None
+        memorySnapshotPeak = 0
+        stackCounts = {}
+        outputFiles = []
+
+        if traceMemory:
+            tracemalloc.start()
+        profileActive = True
+        currentStage = "Setup"
+        runStartTime = time.perf_counter()
+        stageStartTime = runStartTime
+
+        if profileMode.lower() == 'deterministic':
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                function()
+            finally:
+                profiler.disable()
+        else:
+            stopEvent = threading.Event()
+            sampler = threading.Thread(target=sampleStacks, args=(stackCounts, sampleInterval, stopEvent, threading.get_ident()), name="ProfileSampler", daemon=True)
+            sampler.start()
+            try:
+                function()
+            finally:
+                stopEvent.set()
+                sampler.join()
+
+        markStage("End")
+        runSeconds = time.perf_counter() - runStartTime
+        profileActive = False
+
+        # Time by stage
+        stagesFile = open(profilePrefix + "_Stages.csv", "w")
+        stagesFile.write("Stage,Seconds,Percent,PeakTracedMB\n")
+        for stage, seconds in sorted(stageTimes.items(), key=lambda item: -item[1]):
+            stagesFile.write(stage + "," + str(round(seconds, 4)) + "," + str(round(100.0 * seconds / runSeconds, 2)) + "," +
+                             (str(round(stagePeakMemory[stage] / 1048576.0, 2)) if stage in stagePeakMemory else "") + "\n")
+        stagesFile.close()
+        outputFiles.append(profilePrefix + "_Stages.csv")
+
+        if profileMode.lower() == 'deterministic':
+            import pstats, io
+            profiler.dump_stats(profilePrefix + ".pstats")
+            statsText = io.StringIO()
+            pstats.Stats(profiler, stream=statsText).sort_stats('cumulative').print_stats(60)
+            functionsFile = open(profilePrefix + "_Functions.txt", "w")
+            functionsFile.write(statsText.getvalue())
+            functionsFile.close()
+            outputFiles.extend([profilePrefix + ".pstats", profilePrefix + "_Functions.txt"])
+        else:
+            sampleCount = sum(stackCounts.values())
+            sampleSeconds = runSeconds / sampleCount if sampleCount > 0 else sampleInterval
+            writeStacks(stackCounts, sampleSeconds, profilePrefix, os.path.basename(profilePrefix))
+            outputFiles.extend([profilePrefix + ".collapsed.txt", profilePrefix + ".speedscope.json"])
+
+        # Top allocations (live allocations at the end of the stage with the largest traced peak) by source line
+        if traceMemory:
+            currentTraced, peakTraced = tracemalloc.get_traced_memory()
+            if memorySnapshot is None:
+                memorySnapshot = ("End", peakTraced, tracemalloc.take_snapshot())
+            tracemalloc.stop()
+            snapshotStage, snapshotPeak, snapshot = memorySnapshot
+            snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")])
+            memoryFile = open(profilePrefix + "_Memory.txt", "w")
+            memoryFile.write("Traced Memory (MB) - End: " + str(round(currentTraced / 1048576.0, 2)) + " - Peak (Stage " + snapshotStage + "): " + str(round(snapshotPeak / 1048576.0, 2)) + "\n")
+            memoryFile.write("Top " + str(topAllocations) + " allocations by line - live at the end of stage " + snapshotStage + "\n\n")
+            for rank, statistic in enumerate(snapshot.statistics('lineno')[:topAllocations], 1):
+                frame = statistic.traceback[0]
+                memoryFile.write(str(rank) + ". " + frame.filename + ":" + str(frame.lineno) + " - " + str(round(statistic.size / 1048576.0, 3)) + " MB - " + str(statistic.count) + " blocks\n")
+            memoryFile.close()
+            outputFiles.append(profilePrefix + "_Memory.txt")
+
+        return "success function", outputFiles
+
+    except:
+
+        profileActive = False
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        print("Error on profileRun Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'profileRun'"
@@ -0,0 +1,52 @@
+# ---------------------------------------------------------------------------
+# AquariusShard.py
+# '--shard i/N' helpers shared by the Aquarius append (Append_DTW_TimeSeries.py, AppendWeatherStation_TimeSeries.py) and export scripts - parses
+# the shard option and assigns a key (site or harvested file Location) to a shard by a CRC32 hash so the assignment is independent of the order
+# of the sites/files and the same in every worker.
+# Script must be in the same directory as the append and export scripts.
+#
+# Created on: 20261019
+# Python Version 3.7 or greater
+# Dependices: none (standard library)
+# ---------------------------------------------------------------------------
+
+import os, re, zlib, argparse
+
+defaultShard = 1   #Shard of the harvested files without a Location (file name doesn't match the Location rule) - processed by one worker
+defaultLocationRule = {"Pattern": r"^([^_]+)_([^_]+)", "Upper": [1]}   #Location from the file name ('Pattern' groups joined by '_' - 'Upper' groups upper cased)
+
+
+# Parse the '--shard i/N' option - output: shard index (1 to N), shard count
+def parseShard(shardText):
+
+    match = re.match(r'^\s*(\d+)\s*/\s*(\d+)\s*$', shardText)
+    if match is None or not (1 <= int(match.group(1)) <= int(match.group(2))):
+        raise argparse.ArgumentTypeError("Shard must be defined as i/N with 1 <= i <= N (i.e. 2/4) - " + str(shardText))
+    return int(match.group(1)), int(match.group(2))
+
+
+# Define the shard (1 to 'shardCount') of a key (i.e. site name) - CRC32 hash of the key
+def keyShard(key, shardCount):
+
+    return zlib.crc32(str(key).encode('utf-8')) % shardCount + 1
+
+
+# Define the Location of a harvested file from the file name via the Location rule - output: Location, None when the rule doesn't match
+def fileLocation(file, locationRule=None):
+
+    if locationRule is None:
+        locationRule = defaultLocationRule
+    match = re.match(locationRule['Pattern'], os.path.basename(file))
+    if match is None:
+        return None
+    return "_".join(group.upper() if index in locationRule.get('Upper', []) else group for index, group in enumerate(match.groups(), 1))
+
+
+# Define the shard (1 to 'shardCount') of a harvested file - CRC32 hash of the Location so all files for a Location are in one shard
+# Files without a Location are assigned to the 'defaultShard' (logged and skipped by the append).
+def locationShard(file, shardCount, locationRule=None):
+
+    locationName = fileLocation(file, locationRule)
+    if locationName is None:
+        return defaultShard
+    return keyShard(locationName, shardCount)
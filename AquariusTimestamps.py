@@ -0,0 +1,199 @@
+# ---------------------------------------------------------------------------
+# AquariusTimestamps.py
+# Time stamp handling shared by the Aquarius append (AquariusIngest.py) and export scripts - fixed UTC offsets by site applied as int64 nanosecond
+# arithmetic (no time zone conversion) and vectorized ISO-8601 parsing/formatting with the UTC offset (numpy datetime_as_string - no per value strftime).
+# Run 'python AquariusTimestamps.py' to benchmark against the strftime paths previously used by the append and export scripts.
+# Script must be in the same directory as the append and export scripts.
+#
+# Created on: 20261019
+# Python Version 3.7 or greater
+# Dependices: pandas, numpy
+# ---------------------------------------------------------------------------
+
+import sys, os, traceback, re, time, argparse
+import numpy as np
+import pandas as pd
+
+nanosecondsPerSecond = 1000000000
+natValue = np.iinfo(np.int64).min   # int64 value of NaT
+
+
+# Parse a fixed UTC offset - hours (i.e. -7, '-7', -9.5 - the site list 'UtcOffset' field), '+/-HH:MM', '+/-HHMM', 'UTC-07:00' or 'Z'
+# Output: offset in nanoseconds (int), None when not defined (None, NaN or blank)
+def parseUtcOffset(utcOffset):
+
+    if utcOffset is None:
+        return None
+    if isinstance(utcOffset, (int, float, np.integer, np.floating)):
+        if np.isnan(utcOffset):
+            return None
+        return int(round(float(utcOffset) * 3600)) * nanosecondsPerSecond
+
+    offsetString = str(utcOffset).strip().upper()
+    if offsetString in ('', 'NAN', 'NONE'):
+        return None
+    if offsetString.startswith('UTC'):
+        offsetString = offsetString[3:]
+    if offsetString in ('', 'Z'):
+        return 0
+
+    match = re.match(r'^([+-]?)(\d{1,2}):?(\d{2})$', offsetString)
+    if match is not None:
+        seconds = int(match.group(2)) * 3600 + int(match.group(3)) * 60
+        return (-seconds if match.group(1) == '-' else seconds) * nanosecondsPerSecond
+    try:
+        return int(round(float(offsetString) * 3600)) * nanosecondsPerSecond
+    except ValueError:
+        raise ValueError("UTC offset must be defined as hours, +/-HH:MM or Z - " + str(utcOffset))
+
+
+# UTC offset text ('+/-HH:MM' - i.e. the export 'Utc' field) for an offset in nanoseconds
+def offsetText(offsetNanoseconds):
+
+    minutes = int(offsetNanoseconds) // (60 * nanosecondsPerSecond)
+    return ('-' if minutes < 0 else '+') + '%02d:%02d' % divmod(abs(minutes), 60)
+
+
+# UTC offset text ('+/-HH:MM') of each time stamp for the offsets in nanoseconds (i.e. from parseOffsetTimes) - formatted once by distinct offset
+def offsetTexts(offsetNanoseconds):
+
+    offsetNanoseconds = pd.Series(np.asarray(offsetNanoseconds, dtype='int64'))
+    return offsetNanoseconds.map({offset: offsetText(offset) for offset in pd.unique(offsetNanoseconds)}).values
+
+
+# Parse ISO-8601 time stamps with a UTC offset (i.e. Aquarius '2021-06-01T00:00:00.0000000-07:00') - time stamps without an offset are UTC
+# Output: UTC nanoseconds (int64 array - unparseable time stamps NaT), offset of each time stamp in nanoseconds (int64 array)
+def parseOffsetTimes(timeStrings):
+
+    timeStrings = pd.Series(timeStrings, dtype=object).reset_index(drop=True)
+
+    # Offset by the distinct offset suffixes (one or two by series) rather than by time stamp
+    suffixes = timeStrings.str[-6:]
+    distinctSuffixes = pd.unique(suffixes)
+    suffixOffsets = {suffix: parseUtcOffset(suffix) for suffix in distinctSuffixes if re.match(r'^[+-]\d{2}:\d{2}$', str(suffix))}
+
+    if len(suffixOffsets) == len(distinctSuffixes):
+        # All time stamps with a '+/-HH:MM' offset - wall clock text parsed (ISO fast path) and the offset subtracted
+        offsetNanoseconds = suffixes.map(suffixOffsets).values.astype('int64')
+        utcNanoseconds = utcFromLocal(pd.to_datetime(timeStrings.str[:-6], errors='coerce').values.view('int64'), offsetNanoseconds)
+    else:
+        # 'Z', '+/-HHMM', no offset or unparseable time stamps - offset from the designator at the end of the time stamp (none - UTC)
+        utcNanoseconds = pd.to_datetime(timeStrings, utc=True, errors='coerce').values.view('int64')
+        suffixes = timeStrings.str.extract(r'(Z|[+-]\d{2}:?\d{2})$', flags=re.IGNORECASE, expand=False)
+        suffixOffsets = {suffix: parseUtcOffset(suffix) for suffix in pd.unique(suffixes.dropna())}
+        offsetNanoseconds = suffixes.map(suffixOffsets).fillna(0).values.astype('int64')
+
+    return utcNanoseconds, offsetNanoseconds
+
+
+# Local (wall clock) time stamps of UTC nanoseconds at the offset(s) - datetime64[ns] without a time zone, NaT kept
+# resolution - 'ns' or floor to 's' (seconds - as the previous strftime('%Y-%m-%d %H:%M:%S') round trip)
+def localTimes(utcNanoseconds, offsetNanoseconds, resolution='ns'):
+
+    utcNanoseconds = np.asarray(utcNanoseconds, dtype='int64')
+    localNanoseconds = utcNanoseconds + np.asarray(offsetNanoseconds, dtype='int64')
+    if resolution == 's':
+        localNanoseconds = localNanoseconds // nanosecondsPerSecond * nanosecondsPerSecond
+    return np.where(utcNanoseconds == natValue, natValue, localNanoseconds).view('datetime64[ns]')
+
+
+# UTC nanoseconds of local (wall clock) time stamps at the offset(s) - i.e. logger file times recorded at the site offset
+def utcFromLocal(localNanoseconds, offsetNanoseconds):
+
+    localNanoseconds = np.asarray(localNanoseconds, dtype='int64')
+    return np.where(localNanoseconds == natValue, natValue, localNanoseconds - np.asarray(offsetNanoseconds, dtype='int64'))
+
+
+# Local time stamps (datetime64[ns] without a time zone) of ISO-8601 time stamps with a UTC offset - replaces the strftime and astype('datetime64') round trip.
+# utcOffset - fixed offset in nanoseconds the time stamps are converted to (see parseUtcOffset - i.e. the site offset), None - offset of each time stamp
+def localTimesFromText(timeStrings, utcOffset=None, resolution='s'):
+
+    utcNanoseconds, offsetNanoseconds = parseOffsetTimes(timeStrings)
+    return localTimes(utcNanoseconds, offsetNanoseconds if utcOffset is None else utcOffset, resolution)
+
+
+# Format UTC nanoseconds as ISO-8601 time stamps at the offset(s) (i.e. '2021-06-01T00:00:00.000000-07:00') - vectorized, 0 offset formatted as 'Z'
+# fractionUnit - fraction of seconds ('s' - none, 'ms', 'us' - default 6 digits, 'ns'). Output: numpy string array ('NaT' for NaT)
+def formatIsoTimes(utcNanoseconds, offsetNanoseconds, fractionUnit='us'):
+
+    utcNanoseconds = np.asarray(utcNanoseconds, dtype='int64')
+    offsetNanoseconds = np.broadcast_to(np.asarray(offsetNanoseconds, dtype='int64'), utcNanoseconds.shape)
+    missing = utcNanoseconds == natValue
+    localText = np.datetime_as_string(localTimes(utcNanoseconds, offsetNanoseconds), unit=fractionUnit)
+
+    # Offset suffix by the distinct offsets
+    distinctOffsets = np.unique(offsetNanoseconds)
+    suffixes = np.array(["Z" if offset == 0 else offsetText(offset) for offset in distinctOffsets])
+    isoText = np.char.add(localText, suffixes[0] if len(distinctOffsets) == 1 else suffixes[np.searchsorted(distinctOffsets, offsetNanoseconds)])
+    isoText[missing] = 'NaT'
+    return isoText
+
+
+# Benchmark the offset arithmetic paths against the strftime paths previously used on 'pointCount' 15 minute time stamps (minimum of 'repeats' runs):
+# 'Ingest' - file times to upload strings ('Asia/Bangkok' conversion and strftime + '.000000Z' vs. formatIsoTimes),
+# 'Export' - Aquarius time stamp text to local time stamps (strftime and astype('datetime64') vs. localTimesFromText).
+# Outputs of both methods are checked to be the same instants/local times ('Match'). Report exported to 'reportFile'
+# Output: report dataframe
+def benchmarkTimestamps(reportFile, pointCount=200000, utcOffset='-07:00', repeats=3):
+    try:
+
+        import pytz
+        offsetNanoseconds = parseUtcOffset(utcOffset)
+        fileTimes = pd.Series(pd.date_range('2020-01-01', periods=pointCount, freq='15min', tz='UTC'))
+        fileNanoseconds = fileTimes.values.view('int64')
+        aquariusText = pd.Series(np.char.add(np.datetime_as_string(fileNanoseconds.view('datetime64[ns]'), unit='us'), "0" + offsetText(offsetNanoseconds)), dtype=object)   # as Aquarius ('...00.0000000-07:00')
+
+        def ingestStrftime():
+            # File time shifted by the inverse offset (i.e. 'Asia/Bangkok' for -7 hours) and labeled as UTC
+            return fileTimes.dt.tz_convert(pytz.FixedOffset(-offsetNanoseconds // (60 * nanosecondsPerSecond))).dt.strftime('%Y-%m-%dT%H:%M:%S') + ".000000Z"
+
+        def ingestOffset():
+            return formatIsoTimes(utcFromLocal(fileNanoseconds, offsetNanoseconds), offsetNanoseconds)
+
+        def exportStrftime():
+            return pd.to_datetime(aquariusText).dt.strftime('%Y-%m-%d %H:%M:%S').astype('datetime64[ns]').values
+
+        def exportOffset():
+            return localTimesFromText(aquariusText)
+
+        reportRows = []
+        for path, methods, sameValues in [('Ingest', [('strftime', ingestStrftime), ('OffsetArithmetic', ingestOffset)],
+                                           lambda old, new: bool((pd.to_datetime(pd.Series(old), utc=True).values == pd.to_datetime(pd.Series(new), utc=True).values).all())),
+                                          ('Export', [('strftime', exportStrftime), ('OffsetArithmetic', exportOffset)],
+                                           lambda old, new: bool((old == new).all()))]:
+            results = {}
+            for method, function in methods:
+                seconds = []
+                for repeat in range(repeats):
+                    startTime = time.perf_counter()
+                    results[method] = function()
+                    seconds.append(time.perf_counter() - startTime)
+                reportRows.append({'Path': path, 'Method': method, 'Points': pointCount, 'Seconds': round(min(seconds), 4),
+                                   'PointsPerSecond': round(pointCount / max(min(seconds), 1e-9), 1)})
+            match = sameValues(results['strftime'], results['OffsetArithmetic'])
+            for reportRow in reportRows[-2:]:
+                reportRow['Speedup'] = round(reportRows[-2]['Seconds'] / max(reportRow['Seconds'], 1e-9), 2)
+                reportRow['Match'] = match
+
+        dfReport = pd.DataFrame(reportRows)
+        dfReport.to_csv(reportFile, index=False)
+        return "success function", dfReport
+
+    except:
+
+        print("Error on benchmarkTimestamps Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'benchmarkTimestamps'"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the time stamp offset arithmetic against the strftime paths.")
+    parser.add_argument('--points', type=int, default=200000, help="Number of 15 minute time stamps")
+    parser.add_argument('--utcOffset', default='-07:00', help="Site UTC offset (hours or +/-HH:MM)")
+    parser.add_argument('--reportFile', default="AquariusTimestamps_Benchmark.csv", help="Benchmark report file")
+    args = parser.parse_args()
+    outVal = benchmarkTimestamps(args.reportFile, args.points, args.utcOffset)
+    if outVal[0].lower() != "success function":
+        print("WARNING - Function benchmarkTimestamps Failed")
+    else:
+        print(outVal[1].to_string(index=False))
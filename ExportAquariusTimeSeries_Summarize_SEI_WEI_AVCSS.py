@@ -11,11 +11,38 @@
 # Version Updates:
 # Update 2022/7/7  - Added logic specific to SEI/WEI versus AVCSS. AVCSS processing defines the Site, Aspect and Plot, while SEI and WEI doesn't.
 # Update 2022/7/8  - Added function for Weekly Time Step summary.
+# Update 2026/10/19 - Added 'Rolling' time step - Daily Max/Min/Mean with 7-Day rolling metrics (MWAT and 7DADM) derived in one pass via cumulative sums.
+# Update 2026/10/19 - Daily, Weekly, Monthly and Yearly summaries derived from a persisted per bin aggregate state - only bins with changed raw values are recomputed.
+# Update 2026/10/19 - Added 10th, Median and 90th percentile values to the Daily, Weekly, Monthly and Yearly summaries via a mergeable quantile sketch ('quantileMode').
+# Update 2026/10/19 - Calendar bin index (integer bin ordinals) with bincount aggregation. Added 'WaterYear' and 'Seasonal' calendar time steps.
+# Update 2026/10/19 - Grade, Approval and Note fields held as integer coded categoricals with Dictionary or Run Length encoded Raw exports ('labelEncoding').
+# Update 2026/10/19 - Command line options (run with -h) to override the parameters below, '--shard i/N' to process a subset of sites and 'merge' to
+#                     combine the per shard '_AllSites_' files.
+# Update 2026/10/19 - Raw and calendar summary outputs loaded (append only) to an embedded SQLite/DuckDB database per protocol ('exportDatabase') with a 'benchmark' command.
+# Update 2026/10/19 - Added 'Wide' time step - all time series for a site in one aligned wide file via one getTimeSeriesData call ('Exact' or 'Nearest' alignment).
+# Update 2026/10/19 - Export manifest ('skipUnchanged') - series with unchanged fetched data and code version are not reprocessed or rewritten.
+# Update 2026/10/19 - Cleaned DateTime/Value arrays defined once by series and shared by the summary stages without copying. Peak memory reported.
+# Update 2026/10/19 - Per site outputs compressed ('outputCompression') and written atomically on background writer threads ('writerThreads') while the next series are fetched.
+# Update 2026/10/19 - Per day block hash fingerprint by series with a change report of the changed windows ('changeDetection'). 'windowedFetch' only re-fetches
+#                     the points in windows with corrections applied since the last run and after the last point.
+# Update 2026/10/19 - Request counts, errors, latency histograms and points fetched by endpoint and time series exported at the end of the run ('exportMetrics').
+# Update 2026/10/19 - '--profile' run - time by pipeline stage, flame graph stacks (collapsed/speedscope) or cProfile stats and tracemalloc top allocations ('profileMode').
+# Update 2026/10/19 - Local time stamps derived by int64 offset arithmetic (AquariusTimestamps.py) rather than the strftime/astype round trip. Optional fixed UTC offset
+#                     by site from the site list ('siteUtcOffsetField').
+# Update 2026/10/19 - 'Compact' frame memory mode ('frameMemoryMode') - categorical site and label fields, int8/int16 Grade and Approval codes and optional
+#                     float32 values carried through labeling, aggregation and writing. Bytes per point before/after logged.
+# Update 2026/10/19 - Data completeness and gap fields (ExpectedCount, PercentComplete, LongestGapHours, GapCount) in the calendar summaries from the inferred
+#                     sampling interval of each series ('gapStatistics').
+# Update 2026/10/19 - 'serve' command - long running export service with a local HTTP job API. Warm worker processes keep the Aquarius session, time series
+#                     ids, site list and recently fetched series across jobs. Per job latency logged ('servicePort', 'serviceWorkers').
+# Update 2026/10/19 - Run checkpoint saved after each completed (site, time series) unit with '--resume'. A failed unit is isolated and retried ('unitRetries')
+#                     while the other units continue - the '_AllSites_' files are exported from the completed units.
 
 # Anaconda Environment (Kirk): py37
 # Python Version 3.7 Dependices: Requests, pyrfc3339, pytz The Aquarius 'Timeseries_client.py' wrapper class
 # (see: Z:\MONITORING\Loggers\Documents\Aquarius\Python\NextGeneration\AquariusTimeSeries) Scripts: timeseries_client.py and setup.py must be in the Python Environment
 # - 'Lib\site-packages' directory before the timeseries client can be used to hit the Aquarius REST endpoints
+# AquariusMetrics.py (request metrics), AquariusProfile.py ('--profile'), AquariusTimestamps.py (time stamps) and AquariusShard.py ('--shard') must be in the same directory as this script.
 
 #######################################
 # Start of Parameters requiring set up.
@@ -23,8 +50,38 @@
 
 siteListFile = r'C:\ROMN\Monitoring\Streams\Data\Deliverable\DataPackage\2021\StreamTemperature\Output\SEI_SitesList.xlsx'   #Excel or CSV with the Sites/Locations to be processed
 siteListIdentifier = "LocationIdentifier"   #Field name in 'siteListFile' used to define the Site/Location identifier
+siteUtcOffsetField = None   #Optional field name in 'siteListFile' with the fixed UTC offset of the site (hours i.e. -7 or '+/-HH:MM' - i.e. 'UtcOffset'). Points, grades, approvals and notes are exported in the site local time - None (or a blank value) uses the offset of the Aquarius time series
 timeSeriesList = ["Water Temp.Water Temperature (C) HOBO"]  #List defining the time series to be processed
-timeStepList = ["Raw","Daily","Weekly","Monthly","Yearly"]    #List defining the time steps to be processed ('Raw'|'Daily'|'Weekly'|'Monthly'|'Yearly')
+timeStepList = ["Raw","Daily","Weekly","Monthly","Yearly"]    #List defining the time steps to be processed ('Raw'|'Daily'|'Weekly'|'Monthly'|'Yearly'|'WaterYear'|'Seasonal'|'Rolling'|'Wide')
+wideAlignment = "Nearest"   #('Exact'|'Nearest') 'Wide' time step alignment. 'Exact' - union of the time stamps of all series, 'Nearest' - time stamps of the first series in 'timeSeriesList' with the nearest value of the other series within 'wideTolerance'
+wideTolerance = "10min"   #Max time difference for the 'Nearest' alignment (pandas time delta i.e. '10min', '1h') - values beyond the tolerance are blank
+waterYearStartMonth = 10   #First month of the 'WaterYear' time step (i.e. 10 - October to September)
+seasonTable = {"Winter": 12, "Spring": 3, "Summer": 6, "Fall": 9}   #Seasons for the 'Seasonal' time step - Season Name: Start Month
+rollingWindowDays = 7   #Number of consecutive days in the 'Rolling' time step window (i.e. 7 for MWAT and 7DADM)
+frameMemoryMode = "Standard"   #('Standard'|'Compact') Dtypes of the Raw frame through labeling, aggregation and writing. 'Compact' - Park, SiteName, Utc and the Grade, Approval and Note labels as categoricals, Grade and Approval codes as int8/int16 - exported files are unchanged, bytes per point (Standard and Compact) are logged by series
+compactValueType = "float64"   #('float64'|'float32') Value dtype of the Raw frame in the 'Compact' mode - 'float32' is only applied to series with values written the same at float32 (up to 7 significant digits), summaries are always derived from the float64 values
+labelEncoding = "Full"   #('Full'|'Dictionary'|'RunLength') Raw export of the Grade, Approval and Note fields. 'Full' - text on every point, 'Dictionary' - integer codes with a '_LabelDictionary' file, 'RunLength' - 'LabelRun' code with a '_LabelRuns' interval file
+quantileMode = "Sketch"   #('Sketch'|'Exact'|'None') Percentile summaries for the Daily, Weekly, Monthly and Yearly time steps. 'Sketch' - mergeable quantile sketch built once by day and merged upward, 'Exact' - exact quantiles by bin (validation)
+quantileList = [0.1, 0.5, 0.9]   #Quantiles to be summarized (0.5 is output as the Median)
+quantileSketchSize = 128   #Max number of weighted values retained per bin in the quantile sketch - rank error bound per compaction is 1/quantileSketchSize
+exportDatabase = "None"   #('None'|'SQLite'|'DuckDB') Load the Raw and calendar summary (Daily, Weekly, Monthly, Yearly, WaterYear, Seasonal) outputs to an embedded database - one database per protocol indexed on SiteName and DateTime
+benchmarkRepeats = 5   #Number of times each query is run by the 'benchmark' command (minimum time is reported)
+skipUnchanged = True   #(True|False) Skip processing/writing a series when the fetched points and metadata and the code version (script and processing parameters) are unchanged since the last run - tracked in the export manifest in the workspace
+changeDetection = True   #(True|False) Keep a per day block hash of the (DateTime, Value, GradeCode, ApprovalCode) points of each series - windows of days changed since the last run are exported to the '_AllSites_ChangeReport' file
+windowedFetch = True   #(True|False) Only re-fetch the points in windows with corrections applied since the last fetch and after the last point (queryFrom/queryTo) - the other points are reused from the last fetch, metadata (grades, approvals, notes) is always fetched in full
+windowedFetchFullDays = 30   #Days between full fetches when 'windowedFetch' is True - edits to raw points without a correction (or removed corrections) are only picked up on a full fetch
+outputCompression = "None"   #('None'|'gzip'|'zstd') Compression of the per site output files ('.csv'|'.csv.gz'|'.csv.zst') - 'zstd' is written and read through the zstandard package (pandas 'zstd' compression requires pandas 1.4/Python 3.8). The '_AllSites_' files are not compressed
+writerThreads = 2   #Number of background threads compressing and writing the per site output files while processing continues - 0 writes in the main loop
+writerQueueSize = 8   #Max number of output files queued to the background writer - processing waits (backpressure) when the writer falls behind
+
+exportMetrics = True   #(True|False) Export the request counts, errors, latency histograms and points fetched by endpoint and time series at the end of the run - Prometheus textfile ('metricsFile') and JSON summary ('.json')
+profileMode = "Sample"   #('Sample'|'Deterministic') Profiling of a '--profile' run. 'Sample' - stack sampling with flame graph files (collapsed stack and speedscope), 'Deterministic' - cProfile stats. Both export the time by pipeline stage - files '{outLogFileName}_Profile*' in the workspace
+profileMemory = True   #(True|False) Trace the memory allocations on a '--profile' run (tracemalloc top allocations report) - tracing slows the run
+gapStatistics = True   #(True|False) Add the ExpectedCount, PercentComplete, LongestGapHours and GapCount fields to the Daily, Weekly, Monthly, Yearly, WaterYear and Seasonal summaries - the sampling interval of each series is the most common interval between consecutive values, a gap is more than 1.5 intervals between values
+unitRetries = 1   #Number of times a failed unit (site and time series) is retried - retried after the other time series of the site, the other units continue. Units still failing are recorded in the run checkpoint
+unitRetrySeconds = 10   #Seconds waited before a failed unit is retried
+resumeRun = False   #(True|False) Resume an interrupted run from the run checkpoint ('_Checkpoint.json' in the workspace) - units completed in the interrupted run are not fetched or reprocessed. Set via the '--resume' command line option
+incrementalSummary = True   #(True|False) Persist the per bin aggregate state (Count, Mean, M2 - sum of squared deviations from the mean, Min, Max) - subsequent runs only recompute bins with new/changed raw values
 protocol = "SEI"   #Defines the Protocol Being Processes ('SEI'|'WEI'|'AVCSS')
 
 outFileName = "TemperatureLogger"    #output dataset file name prefix for each exported time step complied across all processed sites.
@@ -33,42 +90,100 @@ workspace = r'C:\ROMN\Monitoring\Streams\Data\Deliverable\DataPackage\2021\Strea
 
 outLogFileName = "SEI_Temperature_LoggerProcessing_2021_20220707"
 logFileName = workspace + "\\" + outLogFileName + ".LogFile.txt"
+stateDirectory = workspace + "\\SummaryState"   # Directory with the persisted aggregate state files used when 'incrementalSummary' is True
+
+metricsFile = workspace + "\\" + outLogFileName + "_Metrics.prom"   # Prometheus textfile with the run metrics (i.e. in the node_exporter textfile collector directory) - JSON summary exported with a '.json' suffix
+changeDirectory = workspace + "\\ChangeDetection"   # Directory with the block hash fingerprints and fetched points used when 'changeDetection'/'windowedFetch' is True
+
+shardIndex = 1   #Shard (i.e. worker) of 'shardCount' being processed - set via the '--shard i/N' command line option
+shardCount = 1   #Number of shards the sites are split across - 1 processes all sites
+
+#Service Parameters ('serve' command)
+servicePort = 8765   #Local port of the export service job API (bound to 127.0.0.1 - not reachable from other machines)
+serviceWorkers = 2   #Number of worker processes running the export jobs - each keeps an Aquarius session, the time series ids, the site list and the recently fetched series for the life of the service
+serviceCacheSeries = 64   #Max number of recently fetched series kept by each worker (least recently used series dropped)
+serviceCacheSeconds = 300   #Seconds a fetched series is reused by later jobs on the worker - fetched again after
+serviceDirectory = outDirectory + "\\ServiceJobs"   # Directory with the output folder of each service job ('Job_<service start>_<job id>') and the job latency log ('ServiceJobs.csv')
 ###############################
 
 #Import Pacakge/Libraries, etc.
-import sys, string, os, glob, traceback, shutil, csv, pytz, ast
+import sys, string, os, glob, traceback, shutil, csv, pytz, ast, argparse, re, sqlite3, time, json, hashlib, threading, concurrent.futures, gzip, io
+import collections, multiprocessing, http.server
 import pandas as pd
 import requests,  pyrfc3339
 from datetime import datetime
 from pytz import timezone
 import numpy as np
+from AquariusShard import keyShard, parseShard
+from AquariusMetrics import startMetrics, timedCall, countPoints, writeMetrics, latencyPercentile
+from AquariusProfile import markStage, profileRun
+from AquariusTimestamps import parseUtcOffset, offsetText, offsetTexts, parseOffsetTimes, localTimes, localTimesFromText
+
 
+# Export run - session: service worker state ('serve' command - {'Timeseries': client, 'IdCache': time series unique id by name, 'SeriesCache': recently
+# fetched series, 'JobSites': site list dataframe of the job}) - None connects and reads the site list for the run
+def main(session=None):
 
-def main():
+    # Request metrics for the run
+    startMetrics()
+    runStatus = "Failed function - 'main'"
+    manifest = None
 
     try:
 
-        # AQUARIUS Server Connection steps
-        server = 'https://aquarius.nps.gov'  # NPS Aquarius Server Name
-        loginName = 'AQ_User'  # Aquarius Login Name
-        loginPass = 'xxxxxx'  # Aquarius Login Password
+        if session is None:
+            # Hit the Aquarius Service
+            timeseries = connectAquarius()
+
+            # Setup/Define dataframe with sites to be processed
+            siteListDf = readSiteList()
+        else:
+            # Service job - session and site list of the worker, sites of the job
+            timeseries = session['Timeseries']
+            siteListDf = session['JobSites']
+
+        # Subset the sites to the shard being processed ('--shard i/N')
+        if shardCount > 1:
+            siteListDf = siteListDf[[keyShard(site, shardCount) == shardIndex for site in siteListDf[siteListIdentifier]]].reset_index(drop=True)
+
+            messageTime = timeFun()
+            scriptMsg = "Processing Shard " + str(shardIndex) + " of " + str(shardCount) + " - " + str(siteListDf.shape[0]) + " Sites - " + messageTime
+            print(scriptMsg)
+            logFile = open(logFileName, "a")
+            logFile.write(scriptMsg + "\n")
+            logFile.close()
+
+        # 'zstd' output compression - the zstandard package is required
+        if outputCompression.lower() == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                messageTime = timeFun()
+                scriptMsg = "WARNING - outputCompression 'zstd' requires the zstandard package (pip install zstandard) - Exiting Script - " + messageTime
+                print(scriptMsg)
+                logFile = open(logFileName, "a")
+                logFile.write(scriptMsg + "\n")
+                logFile.close()
+                exit()
+
+        # Peak memory before processing
+        peakMemoryStart = peakMemoryMB()
 
-        # This is the Aquarius API Wrapper Class - used to hit the Next Generation Aquarius Springboard (20.1.68.0)
-        # Downlad the files from: https://github.com/AquaticInformatics/examples/tree/master/TimeSeries/PublicApis/Python
-        from timeseries_client import timeseries_client
-        # Hit the Aquarius Service
-        timeseries = timeseries_client(server, loginName, loginPass)
+        # Background writer for the per site output files
+        startOutputWriter()
 
-        # Setup/Define dataframe with sites to be processed
-        siteFileBaseName = os.path.basename(siteListFile)
-        siteFileSplit = os.path.splitext(siteFileBaseName)
-        x = len(siteFileSplit)
-        siteFileSuffix = siteFileSplit[x - 1]
+        # Export manifest - input hash and output files by site and time series from the previous runs
+        manifest = loadManifest()
+        codeHash = codeVersionHash()
+        skippedSeries = []
 
-        if siteFileSuffix == ".csv":
-            siteListDf = pd.read_csv(siteListFile)
-        else:  # excel
-            siteListDf = pd.read_excel(siteListFile)
+        # Change report rows - windows of days changed since the last run by site and time series
+        changeRows = []
+
+        # Run checkpoint - units (site and time series) completed in the interrupted run when resuming ('--resume')
+        checkpointUnits = startCheckpoint(codeHash)
+        resumedSeries = []
+        failedUnits = []
 
         ##############################
         ##############################
@@ -84,12 +199,33 @@ def main():
         weeklyList = []
         monthlyList = []
         yearlyList = []
+        rollingList = []
+        rollingAnnualList = []
+        wideList = []
+        calendarLists = {}   # Output file lists for the 'WaterYear' and 'Seasonal' calendar time steps
+        outputLists = {'raw': rawList, 'daily': dailyList, 'weekly': weeklyList, 'monthly': monthlyList, 'yearly': yearlyList,
+                       'rolling': rollingList, 'rollingannual': rollingAnnualList}
 
         for row in rowRange:
 
             rowValues = siteListDf.iloc[row]
             site = rowValues.get(siteListIdentifier)
 
+            # Fixed UTC offset of the site (nanoseconds) - None uses the offset of the Aquarius time series. The units of a site with an invalid offset fail
+            try:
+                siteUtcOffset = parseUtcOffset(rowValues.get(siteUtcOffsetField)) if siteUtcOffsetField is not None else None
+            except ValueError as error:
+                for timeSeries in timeSeriesList:
+                    failedUnits.append(str(site) + "|" + str(timeSeries))
+                    markCheckpoint(str(site) + "|" + str(timeSeries), error=str(error))
+                messageTime = timeFun()
+                scriptMsg = "WARNING - Failed Site - " + str(site) + " - " + str(error) + " - " + messageTime
+                print(scriptMsg)
+                logFile = open(logFileName, "a")
+                logFile.write(scriptMsg + "\n")
+                logFile.close()
+                continue
+
             # Create Site Folder
             outDirBySite = os.path.join(outDirectory, site)
             if os.path.exists(outDirBySite):
@@ -97,93 +233,182 @@ def main():
             else:
                 os.makedirs(outDirBySite)
 
-            # Loop Thru the Time Series's to be processed
-            for timeSeries in timeSeriesList:
-
-                # Define the Time Series name at the defined Location
-                timeSeriesNameFull = timeSeries + "@" + site
+            # Time Series Id's at the site for the 'Wide' time step
+            siteSeriesIds = []
 
-                # Use the API getTimeSeiresUniqueId wrapper
-                try:
-                    timeSeriesId = timeseries.getTimeSeriesUniqueId(timeSeriesNameFull)
-                    print("Time Series ID: " + timeSeriesId)
-                except:
-                    messageTime = timeFun()
-                    scriptMsg = "WARNING Time Series - " + timeSeriesNameFull + " was not found at Site:" + locationName + " - " + messageTime
-                    print(scriptMsg)
-                    logFile = open(logFileName, "a")
-                    logFile.write(scriptMsg + "\n")
-                    logFile.close()
+            # Loop Thru the Time Series's to be processed
+            # Time series of the site - a failed unit (site and time series) is retried after the other time series of the site ('unitRetries')
+            seriesQueue = [[timeSeries, 1] for timeSeries in timeSeriesList]
+            siteFetched = False   # Series of the site fetched in the run - the Wide file of the site is not resumed
+            for timeSeries, attempt in seriesQueue:
+
+                manifestKey = str(site) + "|" + str(timeSeries)
+
+                # Resume ('--resume') - unit completed in the interrupted run, the output files are reused without fetching
+                if manifestKey in checkpointUnits and manifestKey in manifest and manifestUnchanged(manifest, manifestKey, manifest[manifestKey]['InputHash'], codeHash):
+                    addOutputFiles(manifest[manifestKey]['OutputFiles'], outputLists, calendarLists)
+                    changeRows.extend(runCheckpoint['ChangeRows'].get(manifestKey, []))
+                    if checkpointUnits[manifestKey] is not None:
+                        siteSeriesIds.append([timeSeries, checkpointUnits[manifestKey]])
+                    markCheckpoint(manifestKey, checkpointUnits[manifestKey])
+                    resumedSeries.append(manifestKey)
                     continue
 
-                # Pull Time Series data from via Aquarius Publish API - output is a dictionary see: https://aquarius.nps.gov/AQUARIUS/Publish/v2/json/metadata?op=TimeSeriesDataCorrectedServiceRequest
-                timeseriesData = timeseries.getTimeSeriesCorrectedData(timeSeriesId)
-
-                # Function To Setup Value Data From Processing
-                outVal = setupDateValues(timeseriesData, site, protocol)
-                if outVal[0].lower() != "success function":
-                    print("WARNING - Function setupDateValues " + str(site) + "-" + str(timeSeries) + " - Failed - Exiting Script")
-                    exit()
-                else:
-                    print("Success - Function setupDateValues " + str(site) + "-" + str(timeSeries))
-                    # Assign the reference Data Frame
-                    df2 = outVal[1]
-
-                # Function Process Grades
-                outVal = gradeValues(timeseriesData, df2)
-                if outVal[0].lower() != "success function":
-                    print("WARNING - Function gradeValues " + str(site) + "-" + str(timeSeries) + " - Failed - Exiting Script")
-                    exit()
-                else:
-                    print("Success - Function gradeValues " + str(site) + "-" + str(timeSeries))
-                    # Assign the reference Data Frame
-                    df3 = outVal[1]
-                    del df2
-
-                # Function Process Grade Name
-                outVal = defineGradeName(df3, protocol)
-                if outVal[0].lower() != "success function":
-                    print("WARNING - Function defineGradeName " + str(site) + "-" + str(timeSeries) + " - Failed - Exiting Script")
-                    exit()
-                else:
-                    print("Success - Function defineGradeName " + str(site) + "-" + str(timeSeries))
-                    # Assign the reference Data Frame
-                    df4 = outVal[1]
-                    del df3
-
-                # Function Process Approvals
-                outVal = approvalValues(timeseriesData, df4)
-                if outVal[0].lower() != "success function":
-                    print("WARNING - Function approvalValues " + str(site) + "-" + str(timeSeries) + " - Failed - Exiting Script")
-                    exit()
-                else:
-                    print("Success - Function approvalValues " + str(site) + "-" + str(timeSeries))
-                    # Assign the reference Data Frame
-                    df5 = outVal[1]
-                    del df4
+                if attempt > 1:
+                    time.sleep(unitRetrySeconds)
 
-                # Function Process Notes
-                outVal = noteValues(timeseriesData, df5)
-                if outVal[0].lower() != "success function":
-                    print("WARNING - Function noteValues " + str(site) + "-" + str(timeSeries) + " - Failed - Exiting Script")
-                    #If Notes function fails export the df5 without notes as the Raw Dataset
-                    dfRawFinal = df5
+                # Output list lengths before the unit - the outputs of a failed attempt are removed
+                unitMarks = [[outputList, len(outputList)] for outputList in list(outputLists.values()) + list(calendarLists.values()) + [siteSeriesIds, changeRows]]
+                unitCalendarSteps = list(calendarLists)
+                unitWrittenMark = len(writtenFiles)
+                # Change detection files staged by the unit (saved when the unit is committed) and the change report rows of the unit
+                unitChange = {'Files': [], 'Rows': []}
 
-                else:
-                    print("Success - Function noteValues " + str(site) + "-" + str(timeSeries))
-                    # Assign the reference Data Frame - this is the final Raw DataFrame
-                    dfRawFinal = outVal[1]
-                    del df5
+                try:
 
-                # Begin Routines to Export by desired time step
-                for timeStep in timeStepList:
+                    # Define the Time Series name at the defined Location
+                    timeSeriesNameFull = timeSeries + "@" + site
+                    markStage("Fetch")
 
-                    if timeStep.lower() == 'raw':
+                    # Use the API getTimeSeiresUniqueId wrapper - looked up once per name by a service worker
+                    try:
+                        if session is not None and timeSeriesNameFull in session['IdCache']:
+                            timeSeriesId = session['IdCache'][timeSeriesNameFull]
+                        else:
+                            timeSeriesId = timedCall('getTimeSeriesUniqueId', timeSeries, timeseries.getTimeSeriesUniqueId, timeSeriesNameFull)
+                            if session is not None:
+                                session['IdCache'][timeSeriesNameFull] = timeSeriesId
+                        print("Time Series ID: " + timeSeriesId)
+                    except:
+                        messageTime = timeFun()
+                        scriptMsg = "WARNING Time Series - " + timeSeriesNameFull + " was not found at Site:" + str(site) + " - " + messageTime
+                        print(scriptMsg)
+                        logFile = open(logFileName, "a")
+                        logFile.write(scriptMsg + "\n")
+                        logFile.close()
+                        continue
+
+                    siteSeriesIds.append([timeSeries, timeSeriesId])
+
+                    # Only the 'Wide' time step - series are pulled together for the site after the time series loop
+                    if all(timeStep.lower() == 'wide' for timeStep in timeStepList):
+                        continue
+                    siteFetched = True
+
+                    # Pull Time Series data from via Aquarius Publish API - output is a dictionary see: https://aquarius.nps.gov/AQUARIUS/Publish/v2/json/metadata?op=TimeSeriesDataCorrectedServiceRequest
+                    if windowedFetch:
+                        # Only the points in the changed windows are fetched - merged with the points from the last fetch
+                        outVal = fetchChangedWindows(timeseries, timeSeriesId, site, timeSeries)
+                        if outVal[0].lower() != "success function":
+                            print("WARNING - Function fetchChangedWindows " + str(site) + "-" + str(timeSeries) + " - Failed")
+                            raise UnitFailedError("Function fetchChangedWindows Failed")
+                        timeseriesData = outVal[1]
+                        unitChange['Files'].extend(outVal[2])
+                    else:
+                        timeseriesData = fetchSeriesData(timeseries, timeSeriesId, timeSeries, session)
+
+                    # Skip the series when the fetched points and metadata and the code version are unchanged since the last run and the outputs exist
+                    inputHash = seriesInputHash(timeseriesData, siteUtcOffset)
+                    if skipUnchanged and manifestUnchanged(manifest, manifestKey, inputHash, codeHash):
+                        addOutputFiles(manifest[manifestKey]['OutputFiles'], outputLists, calendarLists)
+                        commitChangeFiles(unitChange['Files'])
+                        markCheckpoint(manifestKey, timeSeriesId)
+                        skippedSeries.append(manifestKey)
+                        messageTime = timeFun()
+                        scriptMsg = "Skipped Unchanged - " + str(site) + " - " + str(timeSeries) + " - " + messageTime
+                        print(scriptMsg)
+                        logFile = open(logFileName, "a")
+                        logFile.write(scriptMsg + "\n")
+                        logFile.close()
+                        continue
+
+                    # Function To Setup Value Data From Processing
+                    markStage("setupDateValues")
+                    outVal = setupDateValues(timeseriesData, site, protocol, siteUtcOffset)
+                    if outVal[0].lower() != "success function":
+                        print("WARNING - Function setupDateValues " + str(site) + "-" + str(timeSeries) + " - Failed")
+                        raise UnitFailedError("Function setupDateValues Failed")
+                    else:
+                        print("Success - Function setupDateValues " + str(site) + "-" + str(timeSeries))
+                        # Assign the reference Data Frame
+                        df2 = outVal[1]
+
+                    # Function Process Grades
+                    markStage("Labeling")
+                    outVal = gradeValues(timeseriesData, df2, siteUtcOffset)
+                    if outVal[0].lower() != "success function":
+                        print("WARNING - Function gradeValues " + str(site) + "-" + str(timeSeries) + " - Failed")
+                        raise UnitFailedError("Function gradeValues Failed")
+                    else:
+                        print("Success - Function gradeValues " + str(site) + "-" + str(timeSeries))
+                        # Assign the reference Data Frame
+                        df3 = outVal[1]
+                        del df2
+
+                    # Function Process Grade Name
+                    outVal = defineGradeName(df3, protocol)
+                    if outVal[0].lower() != "success function":
+                        print("WARNING - Function defineGradeName " + str(site) + "-" + str(timeSeries) + " - Failed")
+                        raise UnitFailedError("Function defineGradeName Failed")
+                    else:
+                        print("Success - Function defineGradeName " + str(site) + "-" + str(timeSeries))
+                        # Assign the reference Data Frame
+                        df4 = outVal[1]
+                        del df3
+
+                    # Function Process Approvals
+                    outVal = approvalValues(timeseriesData, df4, siteUtcOffset)
+                    if outVal[0].lower() != "success function":
+                        print("WARNING - Function approvalValues " + str(site) + "-" + str(timeSeries) + " - Failed")
+                        raise UnitFailedError("Function approvalValues Failed")
+                    else:
+                        print("Success - Function approvalValues " + str(site) + "-" + str(timeSeries))
+                        # Assign the reference Data Frame
+                        df5 = outVal[1]
+                        del df4
+
+                    # Function Process Notes
+                    outVal = noteValues(timeseriesData, df5, siteUtcOffset)
+                    # Release the service response - the points are in the Raw frame
+                    del timeseriesData
+                    if outVal[0].lower() != "success function":
+                        print("WARNING - Function noteValues " + str(site) + "-" + str(timeSeries) + " - Failed")
+                        #If Notes function fails export the df5 without notes as the Raw Dataset
+                        dfRawFinal = df5
 
+                    else:
+                        print("Success - Function noteValues " + str(site) + "-" + str(timeSeries))
+                        # Assign the reference Data Frame - this is the final Raw DataFrame
+                        dfRawFinal = outVal[1]
+                        del df5
+
+                    # Encode the Grade, Approval and Note fields as integer coded categoricals
+                    if labelEncoding.lower() != 'full':
+                        dfRawFinal = encodeLabelFields(dfRawFinal)
+
+                    # Function Change Report - compare the per day block hashes to the last run
+                    markStage("ChangeDetection")
+                    if changeDetection:
+                        outVal = changeReport(dfRawFinal, site, timeSeries)
+                        if outVal[0].lower() != "success function":
+                            print("WARNING - Function changeReport " + str(site) + "-" + str(timeSeries) + " - Failed")
+                            raise UnitFailedError("Function changeReport Failed")
+                        else:
+                            print("Success - Function changeReport " + str(site) + "-" + str(timeSeries))
+                            changeRows.extend(outVal[1])
+                            unitChange['Rows'] = outVal[1]
+                            unitChange['Files'].extend(outVal[2])
+
+                    # Raw export - written before the summary stages
+                    for timeStep in [timeStep for timeStep in timeStepList if timeStep.lower() == 'raw']:
+                        markStage("Write")
                         outFull = outDirBySite + "\\" + outFileName + "_" + str(site) + "_" + str(
-                            timeSeries) + "_" + str(timeStep) + ".csv"
-                        # Export
-                        dfRawFinal.to_csv(outFull, index=False)
+                            timeSeries) + "_" + str(timeStep) + outputSuffix()
+                        # Export - Grade, Approval and Note fields as defined in 'labelEncoding'
+                        outVal = exportRawPoints(dfRawFinal, outFull)
+                        if outVal.lower() != "success function":
+                            print("WARNING - Function exportRawPoints " + str(site) + "-" + str(timeSeries) + " - Failed")
+                            raise UnitFailedError("Function exportRawPoints Failed")
                         rawList.append(outFull)
 
                         messageTime = timeFun()
@@ -193,98 +418,274 @@ def main():
                         logFile.write(scriptMsg + "\n")
                         logFile.close()
 
+                    # Function Raw Series Arrays - DateTime, Value and row hash arrays defined once for the summary stages
+                    markStage("Aggregation")
+                    outVal = rawSeriesArrays(dfRawFinal)
+                    if outVal[0].lower() != "success function":
+                        print("WARNING - Function rawSeriesArrays " + str(site) + "-" + str(timeSeries) + " - Failed")
+                        raise UnitFailedError("Function rawSeriesArrays Failed")
+                    else:
+                        print("Success - Function rawSeriesArrays " + str(site) + "-" + str(timeSeries))
+                        rawArrays = outVal[1]
+
+                    # Function Compact Raw Frame - float32 values ('compactValueType') once the float64 arrays are defined, bytes per point logged
+                    if frameMemoryMode.lower() == 'compact':
+                        outVal = compactRawFrame(dfRawFinal, site, timeSeries)
+                        if outVal[0].lower() != "success function":
+                            print("WARNING - Function compactRawFrame " + str(site) + "-" + str(timeSeries) + " - Failed")
+                            raise UnitFailedError("Function compactRawFrame Failed")
+                        else:
+                            print("Success - Function compactRawFrame " + str(site) + "-" + str(timeSeries))
+                            dfRawFinal = outVal[1]
 
-                    elif timeStep.lower() == 'daily':
 
-                        outVal = processDaily(dfRawFinal, outDirBySite, site, timeSeries, outFileName, timeStep, dailyList, protocol)
-                        outVal0 = str(outVal[0])
-                        if outVal0.lower() != "success function":
-                            messageTime = timeFun()
-                            scriptMsg = "WARNING - Function processDaily " + str(site) + "-" + str(timeSeries) + " - " + timeStep + " - Failed - Exiting Script - " + messageTime
-                            print(scriptMsg)
-                            logFile = open(logFileName, "a")
-                            logFile.write(scriptMsg + "\n")
-                            logFile.close()
-                            exit()
+                    # Function Define the Calendar Bin Index - integer bin ordinal of each raw value for each calendar time step, derived once
+                    outVal = defineCalendarBinIndex(rawArrays, timeStepList)
+                    if outVal[0].lower() != "success function":
+                        print("WARNING - Function defineCalendarBinIndex " + str(site) + "-" + str(timeSeries) + " - Failed")
+                        raise UnitFailedError("Function defineCalendarBinIndex Failed")
+                    else:
+                        print("Success - Function defineCalendarBinIndex " + str(site) + "-" + str(timeSeries))
+                        calendarBins = outVal[1]
+
+                    # Function Build the Daily Quantile Sketch - built once and merged upward for the Weekly, Monthly and Yearly time steps
+                    dfDailySketch = None
+                    if quantileMode.lower() == 'sketch':
+                        outVal = buildDailySketch(rawArrays)
+                        if outVal[0].lower() != "success function":
+                            print("WARNING - Function buildDailySketch " + str(site) + "-" + str(timeSeries) + " - Failed")
+                            raise UnitFailedError("Function buildDailySketch Failed")
                         else:
-                            messageTime = timeFun()
-                            dailyList = outVal[1]
-                            print("Success - Exporting: " + str(site) + " - " + str(timeSeries) + " - " + str(
-                                timeStep) + " - " + messageTime)
-                    elif timeStep.lower() == 'weekly':
-                        outVal = processWeekly(dfRawFinal, outDirBySite, site, timeSeries, outFileName, timeStep, weeklyList, protocol)
-                        outVal0 = str(outVal[0])
-                        if outVal0.lower() != "success function":
-                            messageTime = timeFun()
-                            scriptMsg = "WARNING - Function processWeekly " + str(site) + "-" + str(timeSeries) + " - " + timeStep + " - Failed - Exiting Script - " + messageTime
-                            print(scriptMsg)
-                            logFile = open(logFileName, "a")
-                            logFile.write(scriptMsg + "\n")
-                            logFile.close()
-                            exit()
+                            print("Success - Function buildDailySketch " + str(site) + "-" + str(timeSeries))
+                            dfDailySketch = outVal[1]
+
+                    # Begin Routines to Export by desired time step
+                    for timeStep in timeStepList:
+
+                        # Summaries (queued to the background writer) are attributed to the 'Aggregation' stage
+                        markStage("Aggregation")
+
+                        if timeStep.lower() == 'raw':
+                            # Exported before the summary stages
+                            pass
+
+                        elif timeStep.lower() == 'daily':
+
+                            outVal = processDaily(rawArrays, outDirBySite, site, timeSeries, outFileName, timeStep, dailyList, protocol, dfDailySketch, calendarBins)
+                            outVal0 = str(outVal[0])
+                            if outVal0.lower() != "success function":
+                                messageTime = timeFun()
+                                scriptMsg = "WARNING - Function processDaily " + str(site) + "-" + str(timeSeries) + " - " + timeStep + " - Failed - " + messageTime
+                                print(scriptMsg)
+                                logFile = open(logFileName, "a")
+                                logFile.write(scriptMsg + "\n")
+                                logFile.close()
+                                raise UnitFailedError("Function processDaily Failed")
+                            else:
+                                messageTime = timeFun()
+                                dailyList = outVal[1]
+                                print("Success - Exporting: " + str(site) + " - " + str(timeSeries) + " - " + str(
+                                    timeStep) + " - " + messageTime)
+                        elif timeStep.lower() == 'weekly':
+                            outVal = processWeekly(rawArrays, outDirBySite, site, timeSeries, outFileName, timeStep, weeklyList, protocol, dfDailySketch, calendarBins)
+                            outVal0 = str(outVal[0])
+                            if outVal0.lower() != "success function":
+                                messageTime = timeFun()
+                                scriptMsg = "WARNING - Function processWeekly " + str(site) + "-" + str(timeSeries) + " - " + timeStep + " - Failed - " + messageTime
+                                print(scriptMsg)
+                                logFile = open(logFileName, "a")
+                                logFile.write(scriptMsg + "\n")
+                                logFile.close()
+                                raise UnitFailedError("Function processWeekly Failed")
+                            else:
+                                messageTime = timeFun()
+                                weeklyList = outVal[1]
+                                print("Success - Exporting: " + str(site) + " - " + str(timeSeries) + " - " + str(timeStep) + " - " + messageTime)
+
+                        elif timeStep.lower() == 'monthly':
+                            outVal = processMonthly(rawArrays, outDirBySite, site, timeSeries, outFileName, timeStep, monthlyList, protocol, dfDailySketch, calendarBins)
+                            outVal0 = str(outVal[0])
+                            if outVal0.lower() != "success function":
+                                messageTime = timeFun()
+                                scriptMsg = "WARNING - Function processMonthly " + str(site) + "-" + str(timeSeries) + " - " + timeStep + " - Failed - " + messageTime
+                                print(scriptMsg)
+                                logFile = open(logFileName, "a")
+                                logFile.write(scriptMsg + "\n")
+                                logFile.close()
+                                raise UnitFailedError("Function processMonthly Failed")
+                            else:
+                                messageTime = timeFun()
+                                monthlyList = outVal[1]
+                                print("Success - Exporting: " + str(site) + " - " + str(timeSeries) + " - " + str(
+                                    timeStep) + " - " + messageTime)
+
+                        elif timeStep.lower() == 'yearly':
+                            outVal = processYearly(rawArrays, outDirBySite, site, timeSeries, outFileName, timeStep, yearlyList, protocol, dfDailySketch, calendarBins)
+                            outVal0 = str(outVal[0])
+                            if outVal0.lower() != "success function":
+                                messageTime = timeFun()
+                                scriptMsg = "WARNING - Function processYearly " + str(site) + "-" + str(timeSeries) + " - " + timeStep + " - Failed - " + messageTime
+                                print(scriptMsg)
+                                logFile = open(logFileName, "a")
+                                logFile.write(scriptMsg + "\n")
+                                logFile.close()
+                                raise UnitFailedError("Function processYearly Failed")
+
+                            else:
+                                messageTime = timeFun()
+                                yearlyList = outVal[1]
+                                print("Success - Exporting: " + str(site) + " - " + str(timeSeries) + " - " + str(timeStep) + " - " + messageTime)
+
+                        elif timeStep.lower() in ('wateryear', 'seasonal'):
+                            calendarList = calendarLists.setdefault(timeStep, [])
+                            outVal = processCalendar(rawArrays, outDirBySite, site, timeSeries, outFileName, timeStep, calendarList, protocol, dfDailySketch, calendarBins)
+                            outVal0 = str(outVal[0])
+                            if outVal0.lower() != "success function":
+                                messageTime = timeFun()
+                                scriptMsg = "WARNING - Function processCalendar " + str(site) + "-" + str(timeSeries) + " - " + timeStep + " - Failed - " + messageTime
+                                print(scriptMsg)
+                                logFile = open(logFileName, "a")
+                                logFile.write(scriptMsg + "\n")
+                                logFile.close()
+                                raise UnitFailedError("Function processCalendar Failed")
+
+                            else:
+                                messageTime = timeFun()
+                                calendarLists[timeStep] = outVal[1]
+                                print("Success - Exporting: " + str(site) + " - " + str(timeSeries) + " - " + str(timeStep) + " - " + messageTime)
+
+                        elif timeStep.lower() == 'rolling':
+                            outVal = processRolling(rawArrays, outDirBySite, site, timeSeries, outFileName, timeStep, rollingList, rollingAnnualList, protocol)
+                            outVal0 = str(outVal[0])
+                            if outVal0.lower() != "success function":
+                                messageTime = timeFun()
+                                scriptMsg = "WARNING - Function processRolling " + str(site) + "-" + str(timeSeries) + " - " + timeStep + " - Failed - " + messageTime
+                                print(scriptMsg)
+                                logFile = open(logFileName, "a")
+                                logFile.write(scriptMsg + "\n")
+                                logFile.close()
+                                raise UnitFailedError("Function processRolling Failed")
+
+                            else:
+                                messageTime = timeFun()
+                                rollingList = outVal[1]
+                                rollingAnnualList = outVal[2]
+                                print("Success - Exporting: " + str(site) + " - " + str(timeSeries) + " - " + str(timeStep) + " - " + messageTime)
+
+                        elif timeStep.lower() == 'wide':
+                            # Exported by site after the time series loop
+                            pass
+
                         else:
-                            messageTime = timeFun()
-                            weeklyList = outVal[1]
-                            print("Success - Exporting: " + str(site) + " - " + str(timeSeries) + " - " + str(timeStep) + " - " + messageTime)
 
-                    elif timeStep.lower() == 'monthly':
-                        outVal = processMonthly(dfRawFinal, outDirBySite, site, timeSeries, outFileName, timeStep, monthlyList, protocol)
-                        outVal0 = str(outVal[0])
-                        if outVal0.lower() != "success function":
+                            print("WARNING - timeStep " + str(timeStep) + " - Not Defined")
                             messageTime = timeFun()
-                            scriptMsg = "WARNING - Function processMonthly " + str(site) + "-" + str(timeSeries) + " - " + timeStep + " - Failed - Exiting Script - " + messageTime
+                            scriptMsg = "WARNING - timeStep " + str(timeStep) + " - Not Defined - " + messageTime
                             print(scriptMsg)
                             logFile = open(logFileName, "a")
                             logFile.write(scriptMsg + "\n")
                             logFile.close()
-                            exit()
-                        else:
-                            messageTime = timeFun()
-                            monthlyList = outVal[1]
-                            print("Success - Exporting: " + str(site) + " - " + str(timeSeries) + " - " + str(
-                                timeStep) + " - " + messageTime)
-
-                    elif timeStep.lower() == 'yearly':
-                        outVal = processYearly(dfRawFinal, outDirBySite, site, timeSeries, outFileName, timeStep, yearlyList, protocol)
-                        outVal0 = str(outVal[0])
-                        if outVal0.lower() != "success function":
+
+                    # Load the Raw and calendar summary outputs to the protocol database - append only by Site, Time Series and Time Step
+                    if exportDatabase.lower() != 'none':
+                        markStage("Write")
+                        # Wait for the queued per site files - read on the load
+                        outVal = flushOutputWriter(manifest)
+                        if outVal.lower() != "success function" and attemptWritesFailed(unitWrittenMark):
+                            print("WARNING - Function flushOutputWriter " + str(site) + "-" + str(timeSeries) + " - Failed")
+                            raise UnitFailedError("Function flushOutputWriter Failed")
+
+                        outVal = loadDatabase(dfRawFinal, outDirBySite, site, timeSeries)
+                        if outVal.lower() != "success function":
                             messageTime = timeFun()
-                            scriptMsg = "WARNING - Function processYearly " + str(site) + "-" + str(timeSeries) + " - " + timeStep + " - Failed - Exiting Script - " + messageTime
+                            scriptMsg = "WARNING - Function loadDatabase " + str(site) + "-" + str(timeSeries) + " - Failed - " + messageTime
                             print(scriptMsg)
                             logFile = open(logFileName, "a")
                             logFile.write(scriptMsg + "\n")
                             logFile.close()
-                            exit()
 
-                        else:
-                            messageTime = timeFun()
-                            yearlyList = outVal[1]
-                            print("Success - Exporting: " + str(site) + " - " + str(timeSeries) + " - " + str(timeStep) + " - " + messageTime)
+                    # Release the arrays of the series - the summaries are defined
+                    del rawArrays, calendarBins, dfDailySketch
+
+                    # Update the export manifest, run checkpoint and change detection files - saved by series (once the queued outputs are written) so completed series are retained if the run is interrupted
+                    queueManifest(manifest, manifestKey, {'InputHash': inputHash, 'CodeHash': codeHash, 'OutputFiles': seriesOutputFiles(outDirBySite, site, timeSeries)}, timeSeriesId, unitChange)
+
+                    # Move on to Next Time Series
+                    messageTime = timeFun()
+                    scriptMsg = "Successfully Processed - " + str(site) + " - " + str(timeSeries) + " - " + messageTime
+                    print(scriptMsg)
+                    logFile = open(logFileName, "a")
+                    logFile.write(scriptMsg + "\n")
+                    logFile.close()
 
+                except Exception:
+                    # Failed unit (a failed stage raises UnitFailedError) - isolated from the other units and retried up to 'unitRetries' times
+                    traceback.print_exc(file=sys.stdout)
+                    for outputList, listLength in unitMarks:
+                        del outputList[listLength:]
+                    for timeStep in list(calendarLists):
+                        if timeStep not in unitCalendarSteps:
+                            del calendarLists[timeStep]
+                    discardChangeFiles(unitChange['Files'])
+                    discardOutputs(unitWrittenMark, manifestKey)
+
+                    if attempt <= unitRetries:
+                        seriesQueue.append([timeSeries, attempt + 1])
+                        retryText = "Retried after the other time series of the site"
                     else:
+                        failedUnits.append(manifestKey)
+                        markCheckpoint(manifestKey, error="Failed after " + str(attempt) + " attempts")
+                        retryText = "Not Retried"
 
-                        print("WARNING - timeStep " + str(timeStep) + " - Not Defined")
-                        messageTime = timeFun()
-                        scriptMsg = "WARNING - timeStep " + str(timeStep) + " - Not Defined - " + messageTime
-                        print(scriptMsg)
-                        logFile = open(logFileName, "a")
-                        logFile.write(scriptMsg + "\n")
-                        logFile.close()
+                    messageTime = timeFun()
+                    scriptMsg = "WARNING - Failed Unit - " + str(site) + " - " + str(timeSeries) + " - Attempt " + str(attempt) + " of " + str(unitRetries + 1) + " - " + retryText + " - " + messageTime
+                    print(scriptMsg)
+                    logFile = open(logFileName, "a")
+                    logFile.write(scriptMsg + "\n")
+                    logFile.close()
 
-                # Move on to Next Time Series
-                messageTime = timeFun()
-                scriptMsg = "Successfully Processed - " + str(site) + " - " + str(timeSeries) + " - " + messageTime
-                print(scriptMsg)
-                logFile = open(logFileName, "a")
-                logFile.write(scriptMsg + "\n")
-                logFile.close()
+            # Export all time series for the site in one aligned wide file - the wide file of the site is a unit ('Site|Wide') in the checkpoint
+            wideKey = str(site) + "|Wide"
+            if 'wide' in [timeStep.lower() for timeStep in timeStepList] and wideKey in checkpointUnits and not siteFetched and os.path.exists(str(checkpointUnits[wideKey])):
+                wideList.append(checkpointUnits[wideKey])
+                markCheckpoint(wideKey, checkpointUnits[wideKey])
+                resumedSeries.append(wideKey)
+
+            elif 'wide' in [timeStep.lower() for timeStep in timeStepList] and len(siteSeriesIds) >= 1:
+                markStage("Wide")
+                outVal = processWide(timeseries, siteSeriesIds, outDirBySite, site, outFileName, "Wide", wideList, protocol, siteUtcOffset)
+                outVal0 = str(outVal[0])
+                if outVal0.lower() != "success function":
+                    failedUnits.append(wideKey)
+                    markCheckpoint(wideKey, error="Function processWide Failed")
+                    messageTime = timeFun()
+                    scriptMsg = "WARNING - Function processWide " + str(site) + " - Failed - " + messageTime
+                    print(scriptMsg)
+                    logFile = open(logFileName, "a")
+                    logFile.write(scriptMsg + "\n")
+                    logFile.close()
+
+                else:
+                    messageTime = timeFun()
+                    wideList = outVal[1]
+                    queueManifest(manifest, wideKey, None, wideList[-1])
+                    print("Success - Exporting: " + str(site) + " - Wide - " + messageTime)
+
+        # Wait for the queued per site files - read on the append
+        markStage("Write")
+        outVal = flushOutputWriter(manifest)
+        if outVal.lower() != "success function":
+            print("WARNING - Function flushOutputWriter - Failed")
+
+        # Units with an output file that failed to write are failed - rolled back so the '_AllSites_' files are exported from the other units
+        failedUnits.extend(rollbackFailedWrites(outputLists, calendarLists, wideList, changeRows))
 
         # Loop Thru the Time Series's Lists and append to one file by time step
         for timeStep in timeStepList:
             if timeStep.lower() == 'raw':
                 if len(rawList) >= 1:  # Append
 
-                    outVal = appendFiles(rawList, timeStep)
+                    outVal = appendFiles(rawList, timeStep, manifest)
                     if outVal.lower() != "success function":
                         messageTime = timeFun()
                         scriptMsg = "WARNING - Function appendFiles for rawList failed - " + messageTime
@@ -301,7 +702,7 @@ def main():
                 # Append if > 1
                 if len(dailyList) >= 1:
 
-                    outVal = appendFiles(dailyList, timeStep)
+                    outVal = appendFiles(dailyList, timeStep, manifest)
                     if outVal.lower() != "success function":
                         messageTime = timeFun()
                         scriptMsg = "WARNING - Function appendFiles for dailyList failed - " + messageTime
@@ -318,7 +719,7 @@ def main():
                 # Append if > 1
                 if len(monthlyList) >= 1:
 
-                    outVal = appendFiles(weeklyList, timeStep)
+                    outVal = appendFiles(weeklyList, timeStep, manifest)
                     if outVal.lower() != "success function":
                         messageTime = timeFun()
                         scriptMsg = "WARNING - Function appendFiles for weeklyList failed - " + messageTime
@@ -335,7 +736,7 @@ def main():
                 # Append if > 1
                 if len(monthlyList) >= 1:
 
-                    outVal = appendFiles(monthlyList, timeStep)
+                    outVal = appendFiles(monthlyList, timeStep, manifest)
                     if outVal.lower() != "success function":
                         messageTime = timeFun()
                         scriptMsg = "WARNING - Function appendFiles for monthlyList failed - " + messageTime
@@ -352,7 +753,7 @@ def main():
                 # Append if > 1
                 if len(yearlyList) >= 1:
 
-                    outVal = appendFiles(yearlyList, timeStep)
+                    outVal = appendFiles(yearlyList, timeStep, manifest)
                     if outVal.lower() != "success function":
                         messageTime = timeFun()
                         scriptMsg = "WARNING - Function appendFiles for yearlyList failed - " + messageTime
@@ -365,16 +766,173 @@ def main():
 
                         print("Success - Function appendFiles for yearlyList - " + messageTime)
 
+            elif timeStep.lower() in ('wateryear', 'seasonal'):
+                # Append if > 1
+                if len(calendarLists.get(timeStep, [])) >= 1:
+
+                    outVal = appendFiles(calendarLists[timeStep], timeStep, manifest)
+                    if outVal.lower() != "success function":
+                        messageTime = timeFun()
+                        scriptMsg = "WARNING - Function appendFiles for " + timeStep + " list failed - " + messageTime
+                        print(scriptMsg)
+                        logFile = open(logFileName, "a")
+                        logFile.write(scriptMsg + "\n")
+                        logFile.close()
+                    else:
+                        messageTime = timeFun()
+
+                        print("Success - Function appendFiles for " + timeStep + " list - " + messageTime)
+
+            elif timeStep.lower() == 'rolling':
+                # Append if > 1
+                if len(rollingList) >= 1:
+
+                    outVal = appendFiles(rollingList, timeStep, manifest)
+                    if outVal.lower() != "success function":
+                        messageTime = timeFun()
+                        scriptMsg = "WARNING - Function appendFiles for rollingList failed - " + messageTime
+                        print(scriptMsg)
+                        logFile = open(logFileName, "a")
+                        logFile.write(scriptMsg + "\n")
+                        logFile.close()
+                    else:
+                        messageTime = timeFun()
+
+                        print("Success - Function appendFiles for rollingList - " + messageTime)
+
+                # Annual MWAT and Max 7DADM summary
+                if len(rollingAnnualList) >= 1:
+
+                    outVal = appendFiles(rollingAnnualList, timeStep + "Annual", manifest)
+                    if outVal.lower() != "success function":
+                        messageTime = timeFun()
+                        scriptMsg = "WARNING - Function appendFiles for rollingAnnualList failed - " + messageTime
+                        print(scriptMsg)
+                        logFile = open(logFileName, "a")
+                        logFile.write(scriptMsg + "\n")
+                        logFile.close()
+                    else:
+                        messageTime = timeFun()
+
+                        print("Success - Function appendFiles for rollingAnnualList - " + messageTime)
+
+            elif timeStep.lower() == 'wide':
+                # Append if > 1
+                if len(wideList) >= 1:
+
+                    outVal = appendFiles(wideList, timeStep, manifest)
+                    if outVal.lower() != "success function":
+                        messageTime = timeFun()
+                        scriptMsg = "WARNING - Function appendFiles for wideList failed - " + messageTime
+                        print(scriptMsg)
+                        logFile = open(logFileName, "a")
+                        logFile.write(scriptMsg + "\n")
+                        logFile.close()
+                    else:
+                        messageTime = timeFun()
+
+                        print("Success - Function appendFiles for wideList - " + messageTime)
+
             else:
 
                 print("WARNING - timeStep " + str(timeStep) + " - Not Defined")
 
+        # Report the series skipped as unchanged
+        if len(skippedSeries) > 0:
+            messageTime = timeFun()
+            scriptMsg = "Skipped Unchanged - " + str(len(skippedSeries)) + " Time Series: " + ", ".join(skippedSeries) + " - " + messageTime
+            print(scriptMsg)
+            logFile = open(logFileName, "a")
+            logFile.write(scriptMsg + "\n")
+            logFile.close()
+
+        # Export the change report - windows changed since the last run (no rows when nothing changed)
+        if changeDetection:
+            dfChangeReport = pd.DataFrame(changeRows, columns=changeReportFields)
+            dfChangeReport.to_csv(allSitesFile("ChangeReport"), index=False)
+
+            messageTime = timeFun()
+            scriptMsg = "Change Report - " + str(dfChangeReport.shape[0]) + " Changed Windows in " + str(dfChangeReport[['SiteName', 'TimeSeries']].drop_duplicates().shape[0]) + " Time Series - " + allSitesFile("ChangeReport") + " - " + messageTime
+            print(scriptMsg)
+            logFile = open(logFileName, "a")
+            logFile.write(scriptMsg + "\n")
+            logFile.close()
+
+        # Sharded runs - export the shard complete file (checked on 'merge'), the quantile metadata is exported on 'merge'
+        if shardCount > 1:
+            shardFile = open(allSitesFile("Complete").replace(".csv", ".txt"), "w")
+            shardFile.write("Shard " + str(shardIndex) + " of " + str(shardCount) + " - Sites: " + ",".join(str(site) for site in siteListDf[siteListIdentifier]) + "\n")
+            shardFile.close()
+            outVal = "success function"
+        else:
+            outVal = quantileMetadata(timeStepList)
+        if outVal.lower() != "success function":
+            messageTime = timeFun()
+            scriptMsg = "WARNING - Function quantileMetadata failed - " + messageTime
+            print(scriptMsg)
+            logFile = open(logFileName, "a")
+            logFile.write(scriptMsg + "\n")
+            logFile.close()
+
+        # Wait for the '_AllSites_' Raw export and stop the background writer
+        outVal = flushOutputWriter(manifest)
+        if outVal.lower() != "success function":
+            messageTime = timeFun()
+            scriptMsg = "WARNING - Function flushOutputWriter failed - " + messageTime
+            print(scriptMsg)
+            logFile = open(logFileName, "a")
+            logFile.write(scriptMsg + "\n")
+            logFile.close()
+        stopOutputWriter()
+
+        # Report the units resumed from the checkpoint and the failed units - the checkpoint is removed once all units are completed,
+        # else kept so a '--resume' run only processes the failed (and not processed) units
+        if len(resumedSeries) > 0:
+            messageTime = timeFun()
+            scriptMsg = "Resumed - " + str(len(resumedSeries)) + " Units Completed in the Interrupted Run - " + checkpointFile() + " - " + messageTime
+            print(scriptMsg)
+            logFile = open(logFileName, "a")
+            logFile.write(scriptMsg + "\n")
+            logFile.close()
+        if len(failedUnits) > 0:
+            messageTime = timeFun()
+            scriptMsg = "WARNING - " + str(len(failedUnits)) + " Failed Units: " + ", ".join(failedUnits) + " - '_AllSites_' files exported without the failed units - run with '--resume' to retry the failed units - " + messageTime
+            print(scriptMsg)
+            logFile = open(logFileName, "a")
+            logFile.write(scriptMsg + "\n")
+            logFile.close()
+        else:
+            removeCheckpoint()
+
+        # Report the Raw frame bytes per point of the run in the Standard and Compact dtypes ('frameMemoryMode')
+        if frameMemoryMode.lower() == 'compact' and frameBytes['Points'] > 0:
+            messageTime = timeFun()
+            scriptMsg = "Frame Memory (Bytes/Point) - Standard: " + str(round(frameBytes['Standard'] / frameBytes['Points'], 1)) + " - Compact: " + str(round(frameBytes['Compact'] / frameBytes['Points'], 1)) + " - Points: " + str(frameBytes['Points']) + " - " + messageTime
+            print(scriptMsg)
+            logFile = open(logFileName, "a")
+            logFile.write(scriptMsg + "\n")
+            logFile.close()
+
+        # Report the peak memory (resident set) of the run - exported to the '_Memory.json' file in the workspace
+        peakMemoryEnd = peakMemoryMB()
+        if peakMemoryEnd is not None:
+            messageTime = timeFun()
+            scriptMsg = "Peak Memory (MB) - Start: " + str(round(peakMemoryStart, 1)) + " - End: " + str(round(peakMemoryEnd, 1)) + " - Writer Waits (backpressure): " + str(writerWaits) + " - " + messageTime
+            print(scriptMsg)
+            logFile = open(logFileName, "a")
+            logFile.write(scriptMsg + "\n")
+            logFile.close()
+
+            with open(logFileName.replace(".LogFile.txt", "_Memory.json"), "w") as memoryFile:
+                json.dump({'StartMemoryMB': round(peakMemoryStart, 1), 'PeakMemoryMB': round(peakMemoryEnd, 1)}, memoryFile)
+
         messageTime = timeFun()
         scriptMsg = "Successfully finished processing - ExportAquariusTimeSeries_Summarize_SEI_WEI_AVCSS.ipynb - " + messageTime
         print(scriptMsg)
         logFile = open(logFileName, "a")
         logFile.write(scriptMsg + "\n")
         logFile.close()
+        runStatus = "success function"
 
     except:
         messageTime = timeFun()
@@ -386,6 +944,57 @@ def main():
         traceback.print_exc(file=sys.stdout)
         logFile.close()
 
+        # Wait for the queued output files so the completed units are saved to the manifest and run checkpoint ('--resume')
+        if manifest is not None:
+            flushOutputWriter(manifest)
+            stopOutputWriter()
+
+    # Export the run metrics - request counts, errors, latency histograms and points fetched by endpoint and time series
+    if exportMetrics:
+        outVal = writeMetrics("ExportAquariusTimeSeries_Summarize_SEI_WEI_AVCSS", metricsFile)
+        if outVal[0].lower() != "success function":
+            print("WARNING - Function writeMetrics Failed")
+        else:
+            summary = outVal[1]
+            scriptMsg = "Run Metrics - " + str(summary['Requests']) + " Requests - " + str(summary['Errors']) + " Errors - " + str(summary['Points']) + " Points - " + str(summary['PointsPerSecond']) + " Points/Second - " + metricsFile + " - " + timeFun()
+            print(scriptMsg)
+            logFile = open(logFileName, "a")
+            logFile.write(scriptMsg + "\n")
+            logFile.close()
+
+    return runStatus
+
+
+# Connect to the Aquarius Service
+# Output: timeseries_client
+def connectAquarius():
+
+    # AQUARIUS Server Connection steps
+    server = 'https://aquarius.nps.gov'  # NPS Aquarius Server Name
+    loginName = 'AQ_User'  # Aquarius Login Name
+    loginPass = 'xxxxxx'  # Aquarius Login Password
+
+    # This is the Aquarius API Wrapper Class - used to hit the Next Generation Aquarius Springboard (20.1.68.0)
+    # Downlad the files from: https://github.com/AquaticInformatics/examples/tree/master/TimeSeries/PublicApis/Python
+    from timeseries_client import timeseries_client
+    return timeseries_client(server, loginName, loginPass)
+
+
+# Read the sites to be processed from the 'siteListFile' (Excel or CSV)
+# Output: site list dataframe
+def readSiteList():
+
+    siteFileBaseName = os.path.basename(siteListFile)
+    siteFileSplit = os.path.splitext(siteFileBaseName)
+    x = len(siteFileSplit)
+    siteFileSuffix = siteFileSplit[x - 1]
+
+    if siteFileSuffix == ".csv":
+        siteListDf = pd.read_csv(siteListFile)
+    else:  # excel
+        siteListDf = pd.read_excel(siteListFile)
+    return siteListDf
+
 
 
 def timeFun():          #Function to Grab Time
@@ -395,27 +1004,23 @@ def timeFun():          #Function to Grab Time
     return messageTime
 
 
-# output: dataframe with Site, Date, UTC, Values for the input time series
-def setupDateValues(timeseriesData, site, protocol):
+# output: dataframe with Site, Date, UTC, Values for the input time series - local time at 'utcOffset' (nanoseconds, None - time series offset)
+def setupDateValues(timeseriesData, site, protocol, utcOffset=None):
     try:
 
         # Created dataframe with the 'Points' element from the Aquarius REST call
         df = pd.DataFrame.from_dict(timeseriesData['Points'])
         df.rename(columns={"Values": "ValuesDic"})
 
-        # Define the UTC
-        utc = df['Timestamp'].str[-6:][0]
+        # Define the UTC - offset parsed from the time stamp designator ('+/-HH:MM', '+/-HHMM' or 'Z') of the first point
+        utcNanoseconds, offsetNanoseconds = parseOffsetTimes(df['Timestamp'])
+        utc = offsetText(offsetNanoseconds[0]) if utcOffset is None else offsetText(utcOffset)
 
-        # Define initial DateTime field - with UTC
-        df['DateTime_UTC'] = pd.to_datetime(df['Timestamp'])
         # Create UTC field
         df['Utc'] = utc
 
-        # Create intermediate datetime string field with UTC excluded
-        df['DateTimeStr'] = df['DateTime_UTC'].dt.strftime('%Y-%m-%d %H:%M:%S')
-
-        # Create DateTime with UTC excluded
-        df['DateTime'] = df['DateTimeStr'].astype('datetime64')
+        # Create DateTime with UTC excluded - local time by offset arithmetic on the parsed time stamps
+        df['DateTime'] = localTimes(utcNanoseconds, offsetNanoseconds if utcOffset is None else utcOffset, 's')
 
         # Redefining as String - not sure why this is necessary
         df['Value'] = df['Value'].astype('str')
@@ -470,6 +1075,10 @@ def setupDateValues(timeseriesData, site, protocol):
         # Add Approval Code to df2DTV
         df2DTV.insert(lastColumn + 2, "ApprovalCode", "")
 
+        # Site fields as categoricals ('frameMemoryMode')
+        if frameMemoryMode.lower() == 'compact':
+            df2DTV = compactFrameFields(df2DTV, ['Park', 'Summit', 'Plot', 'SiteName', 'Utc'])
+
         return "success function", df2DTV
 
     except:
@@ -482,7 +1091,7 @@ def setupDateValues(timeseriesData, site, protocol):
 
 # Process the Aquarius Time Series Grade Values found in the timeseriesData'Grade' variable
 # output: dataframe with Grade Values
-def gradeValues(timeseriesData, df2DTV):
+def gradeValues(timeseriesData, df2DTV, utcOffset=None):
     try:
 
         # Create Data From Aquarius 'Grades' service dictionary
@@ -498,17 +1107,11 @@ def gradeValues(timeseriesData, df2DTV):
 
         ###################
         # Routine to define Start Time without UTC and a datetime field
-        dfGrades['StartTime_UTC'] = pd.to_datetime(dfGrades['StartTime'])
-        # Create intermediate datetime string field with UTC excluded
-        dfGrades['StartTimeNoUTC'] = dfGrades['StartTime_UTC'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        dfGrades.astype({'StartTimeNoUTC': 'datetime64'}).dtypes
+        dfGrades['StartTimeNoUTC'] = localTimesFromText(dfGrades['StartTime'], utcOffset)
 
         ###################
         # Routine to define End Time without UTC and a datetime field
-        dfGrades['EndTime_UTC'] = pd.to_datetime(dfGrades['EndTime'])
-        # Create intermediate datetime string field with UTC excluded
-        dfGrades['EndTimeNoUTC'] = dfGrades['EndTime_UTC'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        dfGrades.astype({'EndTimeNoUTC': 'datetime64'}).dtypes
+        dfGrades['EndTimeNoUTC'] = localTimesFromText(dfGrades['EndTime'], utcOffset)
 
         shapeOutput = dfGrades.shape
         rowCount = (shapeOutput[0])
@@ -567,6 +1170,10 @@ def defineGradeName(df3, protocol):
         df4.insert(lastColumn, "GradeCode", df3_merge['GradeCode_x'])
         df4.insert(lastColumn + 1, "GradeName", df3_merge['GradeName_y'])
 
+        # Grade code as a small integer and name as a categorical ('frameMemoryMode')
+        if frameMemoryMode.lower() == 'compact':
+            df4 = compactFrameFields(df4, ['GradeCode', 'GradeName'])
+
         return "success function", df4
 
     except:
@@ -577,44 +1184,23 @@ def defineGradeName(df3, protocol):
         return "Failed function - 'defineGradeTableDef'"
 
 
-def approvalValues(timeseriesData, df4):
+def approvalValues(timeseriesData, df4, utcOffset=None):
     try:
 
         # Create Data From Aquarius 'Grades' service dictionary
         dfApproval = pd.DataFrame.from_dict(timeseriesData['Approvals'])
 
         ###################
-        # Routine to define Start Time without UTC and a datetime field
-        dfApproval['StartTime_UTC'] = pd.to_datetime(dfApproval['StartTime'], errors='coerce')
-        # Create intermediate datetime string field with UTC excluded
-        dfApproval['StartTimeNoUTC'] = dfApproval['StartTime_UTC'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        # dfApproval.astype({'StartTimeNoUTC': 'datetime64'}).dtypes
-        dfApproval['StartTimeNoUTC'] = pd.to_datetime(dfApproval['StartTimeNoUTC'], errors='coerce')
+        # Routine to define Start Time without UTC and a datetime field - time stamps out of range (i.e. open ended approvals) are NaT
+        dfApproval['StartTimeNoUTC'] = localTimesFromText(dfApproval['StartTime'], utcOffset)
         ###################
         # Routine to define End Time without UTC and a datetime field
-        dfApproval['EndTime_UTC'] = pd.to_datetime(dfApproval['EndTime'], errors='coerce')
-        # Create intermediate datetime string field with UTC excluded
-        dfApproval['EndTimeNoUTC'] = dfApproval['EndTime_UTC'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        # dfApproval.astype({'EndTimeNoUTC': 'datetime64'}).dtypes
-        dfApproval['EndTimeNoUTC'] = pd.to_datetime(dfApproval['EndTimeNoUTC'], errors='coerce')
-
-        #####
-        # Create StartTime and EndTime Text Fields
-        dfApproval['StartTimeNoUTCStr'] = dfApproval['StartTimeNoUTC'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        dfApproval['EndTimeNoUTCStr'] = dfApproval['EndTimeNoUTC'].dt.strftime('%Y-%m-%d %H:%M:%S')
+        dfApproval['EndTimeNoUTC'] = localTimesFromText(dfApproval['EndTime'], utcOffset)
 
         # Define Max and Min times in raw data
         minDateTime = df4.DateTime.min()
         maxDateTime = df4.DateTime.max()
 
-        # Add Min and Max date values to 'dfApproval'
-        dfApproval['MinDateTimeStr'] = minDateTime
-        dfApproval['MaxDateTimeStr'] = maxDateTime
-
-        # Create StartTime and EndTime Text Fields
-        dfApproval['MinDateTimeStr'] = dfApproval['MinDateTimeStr'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        dfApproval['MaxDateTimeStr'] = dfApproval['MaxDateTimeStr'].dt.strftime('%Y-%m-%d %H:%M:%S')
-
         # Create Stand alone data frame with the StartTime values
         startTimeDf = dfApproval[['ApprovalLevel', 'LevelDescription', 'StartTimeNoUTC']]
         # Infill NAT values in the StartTimeFilled with the minDateTime value
@@ -656,6 +1242,10 @@ def approvalValues(timeseriesData, df4):
             df4['ApprovalName'] = np.where((df4['DateTime'] >= startTime) & (df4['DateTime'] <= endTime),
                                            str(approvalName), df4['ApprovalName'])
 
+        # Approval code as a small integer and name as a categorical ('frameMemoryMode')
+        if frameMemoryMode.lower() == 'compact':
+            df4 = compactFrameFields(df4, ['ApprovalCode', 'ApprovalName'])
+
         return "success function", df4
 
     except:
@@ -668,7 +1258,7 @@ def approvalValues(timeseriesData, df4):
 
 # Process the Aquarius Time Series Note Values found in the timeseriesData'Notes' variable
 # output: dataframe with Approval Values
-def noteValues(timeseriesData, df5):
+def noteValues(timeseriesData, df5, utcOffset=None):
     try:
 
         # Create Data From Aquarius 'Grades' service dictionary
@@ -684,17 +1274,11 @@ def noteValues(timeseriesData, df5):
 
             ###################
             # Routine to define Start Time without UTC and a datetime field
-            dfNotes['StartTime_UTC'] = pd.to_datetime(dfNotes['StartTime'])
-            # Create intermediate datetime string field with UTC excluded
-            dfNotes['StartTimeNoUTC'] = dfNotes['StartTime_UTC'].dt.strftime('%Y-%m-%d %H:%M:%S')
-            dfNotes.astype({'StartTimeNoUTC': 'datetime64'}).dtypes
+            dfNotes['StartTimeNoUTC'] = localTimesFromText(dfNotes['StartTime'], utcOffset)
 
             ###################
             # Routine to define End Time without UTC and a datetime field
-            dfNotes['EndTime_UTC'] = pd.to_datetime(dfNotes['EndTime'])
-            # Create intermediate datetime string field with UTC excluded
-            dfNotes['EndTimeNoUTC'] = dfNotes['EndTime_UTC'].dt.strftime('%Y-%m-%d %H:%M:%S')
-            dfNotes.astype({'EndTimeNoUTC': 'datetime64'}).dtypes
+            dfNotes['EndTimeNoUTC'] = localTimesFromText(dfNotes['EndTime'], utcOffset)
 
             # Add ApprovalLevel to df5
             shapeOutput = df5.shape
@@ -725,6 +1309,10 @@ def noteValues(timeseriesData, df5):
             lastColumn = int(shapeOutput[1])
             df5.insert(lastColumn, "NoteText", "")
 
+        # Note text as a categorical ('frameMemoryMode')
+        if frameMemoryMode.lower() == 'compact':
+            df5 = compactFrameFields(df5, ['NoteText'])
+
         return "success function", df5
 
     except:
@@ -736,79 +1324,33 @@ def noteValues(timeseriesData, df5):
 
 
 # Process Daily Summaries
-def processDaily(dfRawFinal, outDirBySite, site, timeSeries, outFileName, timeStep, dailyList, protocol):
+def processDaily(rawArrays, outDirBySite, site, timeSeries, outFileName, timeStep, dailyList, protocol, dfDailySketch, calendarBins):
     try:
 
-        # Create workDataFrame
-        dfDailyWork = dfRawFinal[['SiteName', 'DateTime', 'Value']]
-
-        # Set the Row Inde value to 'DataTime' to allow for Time Series calculation, must set inplace=True so copy of 'DateTime is retained for use
-        dfDailyWork.set_index(dfDailyWork['DateTime'], inplace=True)
-
-        # Calculate the Daily Mean - output is a series
-        dailyMeanSeries = dfDailyWork['Value'].resample(rule='D').mean()
-
-        # Export dataseries to a dataframe - reset_index so both columns are retained
-        dfDailyMean = dailyMeanSeries.to_frame().reset_index()
-
-        dfDailyMean.rename(columns={"Value": "DailyMean", "DateTime": "DateTime"}, inplace=True)
-
-        # Calculate the Standard Deviation - output is a series
-        dailySTDSeries = dfDailyWork['Value'].resample(rule='D').std()
-
-        # Export dataseries to a dataframe - reset_index so both columns are retained
-        dfDailySTD = dailySTDSeries.to_frame().reset_index()
+        # Aggregate state (Count, Mean, M2, Min, Max) by day - only days with changed raw values are recomputed
+        outVal = aggregateBinState(rawArrays, site, timeSeries, timeStep, calendarBins[timeStep.lower()])
+        if outVal[0].lower() != "success function":
+            print("WARNING - Function aggregateBinState " + str(site) + "-" + str(timeSeries) + " - " + timeStep + " - Failed")
+            return "Failed function - 'processDaily'"
+        dfDailyState = outVal[1]
 
-        # Rename Columns
-        dfDailySTD.rename(columns={"Value": "DailyStandardDev", "DateTime": "DateTimeDropSTD"}, inplace=True)
+        # Derive the Daily Mean, Standard Deviation and Count from the aggregate state
+        dfDailyFinal = summaryFromState(dfDailyState, "Daily")
 
-        # Concatenate (i.e. join) the dfDailyMean, and dfDailySTD dataframes
-        dfDailyMeanStd = pd.concat([dfDailyMean, dfDailySTD], axis=1, join='inner')
-
-        # Drop duplicate 'DateTime' field
-        dfDailyMeanStd.drop(['DateTimeDropSTD'], axis=1, inplace=True)
-
-        # Calculate the Daily Count - output is a series
-        dailyCountSeries = dfDailyWork['Value'].resample(rule='D').count()
-
-        # Export dataseries to a dataframe - reset_index so both columns are retained
-        dfDailyCount = dailyCountSeries.to_frame().reset_index()
-
-        # Rename Columns
-        dfDailyCount.rename(columns={"Value": "DailyCount", "DateTime": "DateTimeDrop"}, inplace=True)
-
-        # Concatenate (i.e. join) the dfDailyMeanStd, and defDailyCount dataframes
-        dfDailyFinal = pd.concat([dfDailyMeanStd, dfDailyCount], axis=1, join='inner')
-
-        # Drop duplicate 'DateTime' field
-        dfDailyFinal.drop(['DateTimeDrop'], axis=1, inplace=True)
-
-
-        #Add Park, Summit, and Plot Fields
-        siteSplit = site.split("_")
-        park = siteSplit[0]
-
-        if protocol.lower() == 'avcss':
-
-            summit = siteSplit[3]
-            plot = siteSplit[4]
+        # Percentile fields - merged from the daily quantile sketch ('Sketch') or exact ('Exact')
+        outVal = quantileSummary(rawArrays, dfDailySketch, timeStep, "Daily", calendarBins)
+        if outVal[0].lower() != "success function":
+            print("WARNING - Function quantileSummary " + str(site) + "-" + str(timeSeries) + " - " + timeStep + " - Failed")
+            return "Failed function - 'processDaily'"
+        dfDailyFinal = dfDailyFinal.merge(outVal[1], on='DateTime', how='left')
 
-            # Add Park, Summit, Plot and SiteName fields
-            dfDailyFinal.insert(0, "Park", park)
-            dfDailyFinal.insert(1, "Summit", summit)
-            dfDailyFinal.insert(2, "Plot", plot)
-            dfDailyFinal.insert(3, "SiteName", site)
+        # Add Park, Summit, Plot and SiteName fields
+        addSiteFields(dfDailyFinal, site, protocol)
 
-        else: #SEI,WEI
-            # Add Park, Summit, Plot and SiteName fields
-            dfDailyFinal.insert(0, "Park", park)
-            dfDailyFinal.insert(1, "SiteName", site)
+        outFull = outDirBySite + "\\" + outFileName + "_" + str(site) + "_" + str(timeSeries) + "_" + str(timeStep) + outputSuffix()
 
-
-        outFull = outDirBySite + "\\" + outFileName + "_" + str(site) + "_" + str(timeSeries) + "_" + str(timeStep) + ".csv"
-
-        # Export
-        dfDailyFinal.to_csv(outFull, index=False)
+        # Export - queued to the background writer
+        writeOutput(dfDailyFinal, outFull)
 
         dailyList.append(outFull)
 
@@ -821,12 +1363,6 @@ def processDaily(dfRawFinal, outDirBySite, site, timeSeries, outFileName, timeSt
 
         return "success function", dailyList
 
-        del dfDailyWork
-        del dailyMeanSeries
-        del dfDailyMean
-        del dfDailyCount
-
-
     except:
 
         messageTime = timeFun()
@@ -834,82 +1370,84 @@ def processDaily(dfRawFinal, outDirBySite, site, timeSeries, outFileName, timeSt
         traceback.print_exc(file=sys.stdout)
         return "Failed function - 'processDaily'"
 
-#Process Monthly Summaries
-def processWeekly(dfRawFinal, outDirBySite, site, timeSeries, outFileName, timeStep, weeklyList, protocol):
+#Process Weekly Summaries
+def processWeekly(rawArrays, outDirBySite, site, timeSeries, outFileName, timeStep, weeklyList, protocol, dfDailySketch, calendarBins):
     try:
 
-        # Create workDataFrame
-        dfWeeklyWork = dfRawFinal[['SiteName', 'DateTime', 'Value']]
-
-        # Set the Row Inde value to 'DataTime' to allow for Time Series calculation, must set inplace=True so copy of 'DateTime is retained for use
-        dfWeeklyWork.set_index(dfWeeklyWork['DateTime'], inplace=True)
-
-        # Calculate the Daily Mean - output is a series
-        WeeklyMeanSeries = dfWeeklyWork['Value'].resample(rule='W').mean()
+        # Aggregate state (Count, Mean, M2, Min, Max) by week - only weeks with changed raw values are recomputed
+        outVal = aggregateBinState(rawArrays, site, timeSeries, timeStep, calendarBins[timeStep.lower()])
+        if outVal[0].lower() != "success function":
+            print("WARNING - Function aggregateBinState " + str(site) + "-" + str(timeSeries) + " - " + timeStep + " - Failed")
+            return "Failed function - 'processWeekly'"
+        dfWeeklyState = outVal[1]
 
-        # Export dataseries to a dataframe - reset_index so both columns are retained
-        dfWeeklyMean = WeeklyMeanSeries.to_frame().reset_index()
+        # Derive the Weekly Mean, Standard Deviation and Count from the aggregate state
+        dfWeeklyFinal = summaryFromState(dfWeeklyState, "Weekly")
 
-        dfWeeklyMean.rename(columns={"Value": "WeeklyMean", "DateTime": "DateTime"}, inplace=True)
+        # Percentile fields - merged from the daily quantile sketch ('Sketch') or exact ('Exact')
+        outVal = quantileSummary(rawArrays, dfDailySketch, timeStep, "Weekly", calendarBins)
+        if outVal[0].lower() != "success function":
+            print("WARNING - Function quantileSummary " + str(site) + "-" + str(timeSeries) + " - " + timeStep + " - Failed")
+            return "Failed function - 'processWeekly'"
+        dfWeeklyFinal = dfWeeklyFinal.merge(outVal[1], on='DateTime', how='left')
 
-        # Calculate the Standard Deviation - output is a series
-        WeeklySTDSeries = dfWeeklyWork['Value'].resample(rule='W').std()
+        # Add Park, Summit, Plot and SiteName fields
+        addSiteFields(dfWeeklyFinal, site, protocol)
 
-        # Export dataseries to a dataframe - reset_index so both columns are retained
-        dfWeeklySTD = WeeklySTDSeries.to_frame().reset_index()
+        outFull = outDirBySite + "\\" + outFileName + "_" + str(site) + "_" + str(timeSeries) + "_" + str(timeStep) + outputSuffix()
 
-        # Rename Columns
-        dfWeeklySTD.rename(columns={"Value": "WeeklyStandardDev", "DateTime": "DateTimeDropSTD"}, inplace=True)
+        # Export - queued to the background writer
+        writeOutput(dfWeeklyFinal, outFull)
 
-        # Concatenate (i.e. join) the dfDailyMean, and dfDailySTD dataframes
-        dfWeeklyMeanStd = pd.concat([dfWeeklyMean, dfWeeklySTD], axis=1, join='inner')
-
-        # Drop duplicate 'DateTime' field
-        dfWeeklyMeanStd.drop(['DateTimeDropSTD'], axis=1, inplace=True)
-
-        # Calculate the Count - output is a series
-        WeeklyCountSeries = dfWeeklyWork['Value'].resample(rule='W').count()
-
-        # Export dataseries to a dataframe - reset_index so both columns are retained
-        dfWeeklyCount = WeeklyCountSeries.to_frame().reset_index()
+        weeklyList.append(outFull)
 
-        # Rename Columns
-        dfWeeklyCount.rename(columns={"Value": "WeeklyCount", "DateTime": "DateTimeDrop"}, inplace=True)
+        messageTime = timeFun()
+        scriptMsg = "Successfully Exported " + timeStep + "- " + outFull + " - " + messageTime
+        print(scriptMsg)
+        logFile = open(logFileName, "a")
+        logFile.write(scriptMsg + "\n")
+        logFile.close()
 
-        # Concatenate (i.e. join) the dfWeeklyMeanStd, and defWeeklyCount dataframes
-        dfWeeklyFinal = pd.concat([dfWeeklyMeanStd, dfWeeklyCount], axis=1, join='inner')
+        return "success function", weeklyList
 
-        # Drop duplicate 'DateTime' field
-        dfWeeklyFinal.drop(['DateTimeDrop'], axis=1, inplace=True)
+    except:
 
-        # Add Park, Summit, and Plot Fields
-        siteSplit = site.split("_")
-        park = siteSplit[0]
+        messageTime = timeFun()
+        print("Error on processWeekly Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'processWeekly'"
 
 
-        if protocol.lower() == 'avcss':
+#Process Monthly Summaries
+def processMonthly(rawArrays, outDirBySite, site, timeSeries, outFileName, timeStep, monthlyList, protocol, dfDailySketch, calendarBins):
+    try:
 
-            summit = siteSplit[3]
-            plot = siteSplit[4]
+        # Aggregate state (Count, Mean, M2, Min, Max) by month - only months with changed raw values are recomputed
+        outVal = aggregateBinState(rawArrays, site, timeSeries, timeStep, calendarBins[timeStep.lower()])
+        if outVal[0].lower() != "success function":
+            print("WARNING - Function aggregateBinState " + str(site) + "-" + str(timeSeries) + " - " + timeStep + " - Failed")
+            return "Failed function - 'processMonthly'"
+        dfMonthlyState = outVal[1]
 
-            # Add Park, Summit, Plot and SiteName fields
-            dfWeeklyFinal.insert(0, "Park", park)
-            dfWeeklyFinal.insert(1, "Summit", summit)
-            dfWeeklyFinal.insert(2, "Plot", plot)
-            dfWeeklyFinal.insert(3, "SiteName", site)
+        # Derive the Monthly Mean, Standard Deviation and Count from the aggregate state
+        dfMonthlyFinal = summaryFromState(dfMonthlyState, "Monthly")
 
-        else: #SEI or WEI
-            # Add Park, and SiteName fields
-            dfWeeklyFinal.insert(0, "Park", park)
-            dfWeeklyFinal.insert(1, "SiteName", site)
+        # Percentile fields - merged from the daily quantile sketch ('Sketch') or exact ('Exact')
+        outVal = quantileSummary(rawArrays, dfDailySketch, timeStep, "Monthly", calendarBins)
+        if outVal[0].lower() != "success function":
+            print("WARNING - Function quantileSummary " + str(site) + "-" + str(timeSeries) + " - " + timeStep + " - Failed")
+            return "Failed function - 'processMonthly'"
+        dfMonthlyFinal = dfMonthlyFinal.merge(outVal[1], on='DateTime', how='left')
 
+        # Add Park, Summit, Plot and SiteName fields
+        addSiteFields(dfMonthlyFinal, site, protocol)
 
-        outFull = outDirBySite + "\\" + outFileName + "_" + str(site) + "_" + str(timeSeries) + "_" + str(timeStep) + ".csv"
+        outFull = outDirBySite + "\\" + outFileName + "_" + str(site) + "_" + str(timeSeries) + "_" + str(timeStep) + outputSuffix()
 
-        # Export
-        dfWeeklyFinal.to_csv(outFull, index=False)
+        # Export - queued to the background writer
+        writeOutput(dfMonthlyFinal, outFull)
 
-        weeklyList.append(outFull)
+        monthlyList.append(outFull)
 
         messageTime = timeFun()
         scriptMsg = "Successfully Exported " + timeStep + "- " + outFull + " - " + messageTime
@@ -918,107 +1456,711 @@ def processWeekly(dfRawFinal, outDirBySite, site, timeSeries, outFileName, timeS
         logFile.write(scriptMsg + "\n")
         logFile.close()
 
-        return "success function", weeklyList
-
-        del dfWeeklyWork
-        del WeeklyMeanSeries
-        del dfWeeklyMean
-        del dfWeeklyCount
-
+        return "success function", monthlyList
 
     except:
 
         messageTime = timeFun()
-        print("Error on processDaily Function ")
+        print("Error on processMonthly Function ")
         traceback.print_exc(file=sys.stdout)
         return "Failed function - 'processMonthly'"
 
 
+# Process Yearly Summaries
+def processYearly(rawArrays, outDirBySite, site, timeSeries, outFileName, timeStep, yearlyList, protocol, dfDailySketch, calendarBins):
+    try:
 
+        # Aggregate state (Count, Mean, M2, Min, Max) by year - only years with changed raw values are recomputed
+        outVal = aggregateBinState(rawArrays, site, timeSeries, timeStep, calendarBins[timeStep.lower()])
+        if outVal[0].lower() != "success function":
+            print("WARNING - Function aggregateBinState " + str(site) + "-" + str(timeSeries) + " - " + timeStep + " - Failed")
+            return "Failed function - 'processYearly'"
+        dfYearlyState = outVal[1]
 
+        # Derive the Yearly Mean, Standard Deviation and Count from the aggregate state
+        dfYearlyFinal = summaryFromState(dfYearlyState, "Yearly")
 
+        # Percentile fields - merged from the daily quantile sketch ('Sketch') or exact ('Exact')
+        outVal = quantileSummary(rawArrays, dfDailySketch, timeStep, "Yearly", calendarBins)
+        if outVal[0].lower() != "success function":
+            print("WARNING - Function quantileSummary " + str(site) + "-" + str(timeSeries) + " - " + timeStep + " - Failed")
+            return "Failed function - 'processYearly'"
+        dfYearlyFinal = dfYearlyFinal.merge(outVal[1], on='DateTime', how='left')
 
+        # Add Park, Summit, Plot and SiteName fields
+        addSiteFields(dfYearlyFinal, site, protocol)
 
+        outFull = outDirBySite + "\\" + outFileName + "_" + str(site) + "_" + str(timeSeries) + "_" + str(timeStep) + outputSuffix()
 
+        # Export - queued to the background writer
+        writeOutput(dfYearlyFinal, outFull)
 
+        yearlyList.append(outFull)
 
+        messageTime = timeFun()
+        scriptMsg = "Successfully Exported " + timeStep + "- " + outFull + " - " + messageTime
+        print(scriptMsg)
+        logFile = open(logFileName, "a")
+        logFile.write(scriptMsg + "\n")
+        logFile.close()
 
-#Process Monthly Summaries
-def processMonthly(dfRawFinal, outDirBySite, site, timeSeries, outFileName, timeStep, monthlyList, protocol):
+        return "success function", yearlyList
+
+    except:
+
+        messageTime = timeFun()
+        print("Error on processYearly Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'processYearly'"
+
+
+# Process Calendar Summaries - calendar time steps beyond the standard Daily, Weekly, Monthly and Yearly (i.e. 'WaterYear', 'Seasonal')
+# as defined in 'defineCalendarBins'. Output includes the 'PeriodName' field (i.e. 'WY2022', 'Summer 2021').
+def processCalendar(rawArrays, outDirBySite, site, timeSeries, outFileName, timeStep, calendarList, protocol, dfDailySketch, calendarBins):
     try:
 
-        # Create workDataFrame
-        dfMonthlyWork = dfRawFinal[['SiteName', 'DateTime', 'Value']]
+        # Aggregate state (Count, Mean, M2, Min, Max) by calendar bin - only bins with changed raw values are recomputed
+        outVal = aggregateBinState(rawArrays, site, timeSeries, timeStep, calendarBins[timeStep.lower()])
+        if outVal[0].lower() != "success function":
+            print("WARNING - Function aggregateBinState " + str(site) + "-" + str(timeSeries) + " - " + timeStep + " - Failed")
+            return "Failed function - 'processCalendar'"
+        dfCalendarState = outVal[1]
 
-        # Set the Row Inde value to 'DataTime' to allow for Time Series calculation, must set inplace=True so copy of 'DateTime is retained for use
-        dfMonthlyWork.set_index(dfMonthlyWork['DateTime'], inplace=True)
+        # Derive the Mean, Standard Deviation and Count from the aggregate state
+        dfCalendarFinal = summaryFromState(dfCalendarState, timeStep)
+        dfCalendarFinal.insert(1, "PeriodName", calendarPeriodNames(dfCalendarState['BinOrdinal'].values, timeStep))
 
-        # Calculate the Daily Mean - output is a series
-        monthlyMeanSeries = dfMonthlyWork['Value'].resample(rule='M').mean()
+        # Percentile fields - merged from the daily quantile sketch ('Sketch') or exact ('Exact')
+        outVal = quantileSummary(rawArrays, dfDailySketch, timeStep, timeStep, calendarBins)
+        if outVal[0].lower() != "success function":
+            print("WARNING - Function quantileSummary " + str(site) + "-" + str(timeSeries) + " - " + timeStep + " - Failed")
+            return "Failed function - 'processCalendar'"
+        dfCalendarFinal = dfCalendarFinal.merge(outVal[1], on='DateTime', how='left')
 
-        # Export dataseries to a dataframe - reset_index so both columns are retained
-        dfMonthlyMean = monthlyMeanSeries.to_frame().reset_index()
+        # Add Park, Summit, Plot and SiteName fields
+        addSiteFields(dfCalendarFinal, site, protocol)
 
-        dfMonthlyMean.rename(columns={"Value": "MonthlyMean", "DateTime": "DateTime"}, inplace=True)
+        outFull = outDirBySite + "\\" + outFileName + "_" + str(site) + "_" + str(timeSeries) + "_" + str(timeStep) + outputSuffix()
 
-        # Calculate the Standard Deviation - output is a series
-        monthlySTDSeries = dfMonthlyWork['Value'].resample(rule='M').std()
+        # Export - queued to the background writer
+        writeOutput(dfCalendarFinal, outFull)
 
-        # Export dataseries to a dataframe - reset_index so both columns are retained
-        dfMonthlySTD = monthlySTDSeries.to_frame().reset_index()
+        calendarList.append(outFull)
 
-        # Rename Columns
-        dfMonthlySTD.rename(columns={"Value": "MonthlyStandardDev", "DateTime": "DateTimeDropSTD"}, inplace=True)
+        messageTime = timeFun()
+        scriptMsg = "Successfully Exported " + timeStep + "- " + outFull + " - " + messageTime
+        print(scriptMsg)
+        logFile = open(logFileName, "a")
+        logFile.write(scriptMsg + "\n")
+        logFile.close()
 
-        # Concatenate (i.e. join) the dfDailyMean, and dfDailySTD dataframes
-        dfMonthlyMeanStd = pd.concat([dfMonthlyMean, dfMonthlySTD], axis=1, join='inner')
+        return "success function", calendarList
 
-        # Drop duplicate 'DateTime' field
-        dfMonthlyMeanStd.drop(['DateTimeDropSTD'], axis=1, inplace=True)
+    except:
 
-        # Calculate the Count - output is a series
-        monthlyCountSeries = dfMonthlyWork['Value'].resample(rule='M').count()
+        messageTime = timeFun()
+        print("Error on processCalendar Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'processCalendar'"
 
-        # Export dataseries to a dataframe - reset_index so both columns are retained
-        dfMonthlyCount = monthlyCountSeries.to_frame().reset_index()
 
-        # Rename Columns
-        dfMonthlyCount.rename(columns={"Value": "MonthlyCount", "DateTime": "DateTimeDrop"}, inplace=True)
+# Define the DateTime (datetime64[ns]), Value (float64) and RowHash (int64 hash of the DateTime and Value of each point) arrays of the series
+# defined once and shared by the calendar, quantile and rolling stages without copying.
+# Output: dictionary with the 'DateTime', 'Value' and 'RowHash' arrays
+def rawSeriesArrays(dfRawFinal):
+    try:
 
-        # Concatenate (i.e. join) the dfMOnthlyMeanStd, and defMonthlyCount dataframes
-        dfMonthlyFinal = pd.concat([dfMonthlyMeanStd, dfMonthlyCount], axis=1, join='inner')
+        rawArrays = {'DateTime': dfRawFinal['DateTime'].values.astype('datetime64[ns]', copy=False),
+                     'Value': dfRawFinal['Value'].values.astype('float64', copy=False),
+                     'RowHash': pd.util.hash_pandas_object(dfRawFinal[['DateTime', 'Value']], index=False).values.view('int64')}
 
-        # Drop duplicate 'DateTime' field
-        dfMonthlyFinal.drop(['DateTimeDrop'], axis=1, inplace=True)
+        return "success function", rawArrays
 
-        # Add Park, Summit, and Plot Fields
-        siteSplit = site.split("_")
-        park = siteSplit[0]
+    except:
 
+        messageTime = timeFun()
+        print("Error on rawSeriesArrays Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'rawSeriesArrays'"
 
-        if protocol.lower() == 'avcss':
 
-            summit = siteSplit[3]
-            plot = siteSplit[4]
+# Peak memory (resident set, MB) of the process - psutil peak working set on Windows, else the 'resource' module (Linux/Mac). None when not available
+def peakMemoryMB():
 
-            # Add Park, Summit, Plot and SiteName fields
-            dfMonthlyFinal.insert(0, "Park", park)
-            dfMonthlyFinal.insert(1, "Summit", summit)
-            dfMonthlyFinal.insert(2, "Plot", plot)
-            dfMonthlyFinal.insert(3, "SiteName", site)
+    try:
+        import psutil
+        memoryInfo = psutil.Process().memory_info()
+        if hasattr(memoryInfo, 'peak_wset'):
+            return memoryInfo.peak_wset / 1048576.0
+    except ImportError:
+        pass
 
-        else: #SEI or WEI
-            # Add Park, and SiteName fields
-            dfMonthlyFinal.insert(0, "Park", park)
-            dfMonthlyFinal.insert(1, "SiteName", site)
+    try:
+        import resource
+        peakMemory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Bytes on Mac, kilobytes on Linux
+        return peakMemory / (1048576.0 if sys.platform == 'darwin' else 1024.0)
+    except ImportError:
+        return None
 
 
-        outFull = outDirBySite + "\\" + outFileName + "_" + str(site) + "_" + str(timeSeries) + "_" + str(timeStep) + ".csv"
+# Calendar time steps with integer bin ordinals defined in 'defineCalendarBins' - add new calendars here and in 'defineCalendarBins'/'calendarBinLabels'
+calendarTimeSteps = ['daily', 'weekly', 'monthly', 'yearly', 'wateryear', 'seasonal']
 
-        # Export
-        dfMonthlyFinal.to_csv(outFull, index=False)
 
-        monthlyList.append(outFull)
+# Define the Calendar Bin Index - integer bin ordinal of each raw value for each requested calendar time step, derived once per series
+# Output: dictionary with time step (lower case): bin ordinal array
+def defineCalendarBinIndex(rawArrays, timeStepList):
+    try:
+
+        dateTimeValues = rawArrays['DateTime']
+        calendarBins = {}
+        for timeStep in timeStepList:
+            if timeStep.lower() in calendarTimeSteps:
+                calendarBins[timeStep.lower()] = defineCalendarBins(dateTimeValues, timeStep)
+
+        return "success function", calendarBins
+
+    except:
+
+        messageTime = timeFun()
+        print("Error on defineCalendarBinIndex Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'defineCalendarBinIndex'"
+
+
+# Define the integer bin ordinal of each date time value by calendar time step. Bins match the pandas resample rules used historically:
+# Daily 'D' (days since 1970-01-01), Weekly 'W' (ISO week Monday to Sunday), Monthly 'M' (months since 1970-01), Yearly 'AS' (years since 1970),
+# WaterYear (year starting the 'waterYearStartMonth', named by calendarPeriodNames) and Seasonal (seasons as defined in 'seasonTable')
+def defineCalendarBins(dateTimeValues, timeStep):
+
+    dateTimeValues = np.asarray(dateTimeValues, dtype='datetime64[ns]')
+    calendar = timeStep.lower()
+
+    if calendar == 'daily':
+        return dateTimeValues.astype('datetime64[D]').astype('int64')
+    elif calendar == 'weekly':
+        # 1970-01-01 is a Thursday - shift three days so weeks start on Monday
+        return (dateTimeValues.astype('datetime64[D]').astype('int64') + 3) // 7
+    elif calendar == 'monthly':
+        return dateTimeValues.astype('datetime64[M]').astype('int64')
+    elif calendar == 'yearly':
+        return dateTimeValues.astype('datetime64[Y]').astype('int64')
+    elif calendar == 'wateryear':
+        monthOrdinal = dateTimeValues.astype('datetime64[M]').astype('int64')
+        return (monthOrdinal + 13 - waterYearStartMonth) // 12
+    elif calendar == 'seasonal':
+        seasonStartMonths = seasonStartMonthIndex()
+        monthOrdinal = dateTimeValues.astype('datetime64[M]').astype('int64')
+        # Months before the first season start month are in the last season of the previous year
+        seasonPosition = np.searchsorted(seasonStartMonths, monthOrdinal % 12, side='right') - 1
+        return (monthOrdinal // 12) * len(seasonStartMonths) + seasonPosition
+    else:
+        raise ValueError("No calendar defined for timeStep - " + str(timeStep))
+
+
+# Define the bin label (DateTime) for the calendar bin ordinals - Daily (day), Weekly (Sunday ending the week), Monthly (last day of month),
+# Yearly (January 1st), WaterYear (first day of the water year) and Seasonal (first day of the season)
+def calendarBinLabels(binOrdinals, timeStep):
+
+    binOrdinals = np.asarray(binOrdinals, dtype='int64')
+    calendar = timeStep.lower()
+
+    if calendar == 'daily':
+        binLabels = binOrdinals.astype('datetime64[D]')
+    elif calendar == 'weekly':
+        binLabels = (binOrdinals * 7 + 3).astype('datetime64[D]')
+    elif calendar == 'monthly':
+        binLabels = (binOrdinals + 1).astype('datetime64[M]').astype('datetime64[D]') - np.timedelta64(1, 'D')
+    elif calendar == 'yearly':
+        binLabels = binOrdinals.astype('datetime64[Y]')
+    elif calendar == 'wateryear':
+        binLabels = (binOrdinals * 12 - 13 + waterYearStartMonth).astype('datetime64[M]')
+    elif calendar == 'seasonal':
+        seasonStartMonths = seasonStartMonthIndex()
+        seasonCount = len(seasonStartMonths)
+        binLabels = ((binOrdinals // seasonCount) * 12 + seasonStartMonths[binOrdinals % seasonCount]).astype('datetime64[M]')
+    else:
+        raise ValueError("No calendar defined for timeStep - " + str(timeStep))
+
+    return binLabels.astype('datetime64[ns]')
+
+
+# Define the start (int64 nanoseconds) of the calendar bin ordinals - the bin ends at the start of the next ordinal
+def calendarBinStarts(binOrdinals, timeStep):
+
+    binOrdinals = np.asarray(binOrdinals, dtype='int64')
+    calendar = timeStep.lower()
+
+    if calendar == 'daily':
+        binStarts = binOrdinals.astype('datetime64[D]')
+    elif calendar == 'weekly':
+        binStarts = (binOrdinals * 7 - 3).astype('datetime64[D]')
+    elif calendar == 'monthly':
+        binStarts = binOrdinals.astype('datetime64[M]')
+    elif calendar in ['yearly', 'wateryear', 'seasonal']:
+        # Bin labels are the first day of the bin
+        binStarts = calendarBinLabels(binOrdinals, timeStep)
+    else:
+        raise ValueError("No calendar defined for timeStep - " + str(timeStep))
+
+    return binStarts.astype('datetime64[ns]').view('int64')
+
+
+# Define the period name for the WaterYear (i.e. 'WY2022') and Seasonal (i.e. 'Winter 2021') calendar bin ordinals - a water year is named by the
+# year of its last month (i.e. October 2021 to September 2022 - 'WY2022', 'waterYearStartMonth' 1 - the calendar year)
+def calendarPeriodNames(binOrdinals, timeStep):
+
+    binOrdinals = np.asarray(binOrdinals, dtype='int64')
+
+    if timeStep.lower() == 'wateryear':
+        lastMonthOrdinals = binOrdinals * 12 - 2 + waterYearStartMonth
+        return ['WY' + str(1970 + lastMonth // 12) for lastMonth in lastMonthOrdinals]
+    elif timeStep.lower() == 'seasonal':
+        seasonNames = [name for month, name in sorted((month, name) for name, month in seasonTable.items())]
+        seasonCount = len(seasonNames)
+        return [seasonNames[ordinal % seasonCount] + " " + str(1970 + ordinal // seasonCount) for ordinal in binOrdinals]
+    else:
+        return calendarBinLabels(binOrdinals, timeStep).astype('datetime64[D]').astype(str)
+
+
+# Sorted season start month index (0 = January) defined in the 'seasonTable'
+def seasonStartMonthIndex():
+
+    return np.array(sorted(month - 1 for month in seasonTable.values()), dtype='int64')
+
+
+# Define the aggregate state (Count, Mean, M2, Min, Max) for each calendar bin via bincount reductions over the bin ordinals. M2 (sum of squared
+# deviations from the bin mean) is derived in a second pass over the bin means so the variance does not cancel for large, low variance values.
+# When 'incrementalSummary' is True the state is persisted by site, time series and time step in the 'stateDirectory'. On the next run
+# a hash of the raw DateTime/Value points in each bin is compared to the persisted hash and only the new/changed bins are recomputed,
+# the state for unchanged bins is reused. The completeness and gap fields ('gapStatistics') are derived from all points on each run (gaps span bins)
+# and are not persisted.
+# Output: dataframe with the aggregate state for all bins between the first and last bin (empty bins have a Count of 0)
+def aggregateBinState(rawArrays, site, timeSeries, timeStep, binOrdinals):
+    try:
+
+        values = rawArrays['Value']
+        firstOrdinal = int(binOrdinals.min())
+        binId = binOrdinals - firstOrdinal
+        binCount = int(binId.max()) + 1
+        binOrdinalRange = np.arange(firstOrdinal, firstOrdinal + binCount)
+        rowsPerBin = np.bincount(binId, minlength=binCount)
+
+        # Order independent hash of the raw points in each bin - sum of the row hashes (int64 wrap around)
+        rowHash = rawArrays['RowHash']
+        binHash = np.zeros(binCount, dtype='int64')
+        np.add.at(binHash, binId, rowHash)
+
+        stateCount = np.zeros(binCount, dtype='int64')
+        stateMean = np.full(binCount, np.nan)
+        stateM2 = np.zeros(binCount)
+        stateMin = np.full(binCount, np.nan)
+        stateMax = np.full(binCount, np.nan)
+        changedMask = np.ones(binCount, dtype=bool)
+
+        # Load the persisted state from the previous run - reuse the state of bins with an unchanged hash. A state without the M2 field
+        # (Sum and Sum of Squares state of earlier versions) is not reused
+        stateFile = os.path.join(stateDirectory, str(site) + "_" + str(timeSeries) + "_" + str(timeStep) + "_State.csv")
+        dfPrevState = pd.read_csv(stateFile, parse_dates=['DateTime'], float_precision='round_trip') if incrementalSummary and os.path.exists(stateFile) else None
+        if dfPrevState is not None and 'M2' in dfPrevState.columns:
+            prevBinId = defineCalendarBins(dfPrevState['DateTime'].values, timeStep) - firstOrdinal
+            inRange = (prevBinId >= 0) & (prevBinId < binCount)
+            dfPrevState = dfPrevState[inRange]
+            prevBinId = prevBinId[inRange]
+
+            unchanged = dfPrevState['BinHash'].values == binHash[prevBinId]
+            unchangedId = prevBinId[unchanged]
+            dfUnchanged = dfPrevState[unchanged]
+            stateCount[unchangedId] = dfUnchanged['Count'].values
+            stateMean[unchangedId] = dfUnchanged['Mean'].values
+            stateM2[unchangedId] = dfUnchanged['M2'].values
+            stateMin[unchangedId] = dfUnchanged['Min'].values
+            stateMax[unchangedId] = dfUnchanged['Max'].values
+            changedMask[unchangedId] = False
+
+        # Recompute the aggregates for the new/changed bins only
+        rowMask = changedMask[binId] & ~np.isnan(values)
+        changedId = binId[rowMask]
+        changedValues = values[rowMask]
+
+        stateCount[changedMask] = np.bincount(changedId, minlength=binCount)[changedMask]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            changedMean = np.bincount(changedId, weights=changedValues, minlength=binCount) / stateCount
+        stateMean[changedMask] = changedMean[changedMask]
+        changedDeviations = changedValues - changedMean[changedId]
+        stateM2[changedMask] = np.bincount(changedId, weights=changedDeviations * changedDeviations, minlength=binCount)[changedMask]
+
+        changedMin = np.full(binCount, np.inf)
+        np.minimum.at(changedMin, changedId, changedValues)
+        changedMax = np.full(binCount, -np.inf)
+        np.maximum.at(changedMax, changedId, changedValues)
+        hasValues = changedMask & (stateCount > 0)
+        stateMin[hasValues] = changedMin[hasValues]
+        stateMax[hasValues] = changedMax[hasValues]
+
+        dfState = pd.DataFrame({'BinOrdinal': binOrdinalRange,
+                                'Count': stateCount,
+                                'Mean': stateMean,
+                                'M2': stateM2,
+                                'Min': stateMin,
+                                'Max': stateMax,
+                                'BinHash': binHash},
+                               index=pd.DatetimeIndex(calendarBinLabels(binOrdinalRange, timeStep), name='DateTime'))
+
+        # Completeness and gap fields by bin
+        gapFields = []
+        if gapStatistics:
+            gapState = binGapState(rawArrays, timeStep, firstOrdinal, binCount, stateCount)
+            for field, fieldValues in gapState.items():
+                dfState[field] = fieldValues
+            gapFields = list(gapState)
+
+        if incrementalSummary:
+            if not os.path.exists(stateDirectory):
+                os.makedirs(stateDirectory)
+            # Persist the bins with raw points
+            dfState[rowsPerBin > 0].drop(columns=['BinOrdinal'] + gapFields).to_csv(stateFile)
+
+            messageTime = timeFun()
+            scriptMsg = "Aggregate State " + str(site) + " - " + str(timeSeries) + " - " + str(timeStep) + " - Recomputed " + str(int((changedMask & (rowsPerBin > 0)).sum())) + " of " + str(int((rowsPerBin > 0).sum())) + " bins - " + messageTime
+            print(scriptMsg)
+            logFile = open(logFileName, "a")
+            logFile.write(scriptMsg + "\n")
+            logFile.close()
+
+        return "success function", dfState
+
+    except:
+
+        messageTime = timeFun()
+        print("Error on aggregateBinState Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'aggregateBinState'"
+
+
+# Sampling interval of a series - most common interval (nanoseconds) between consecutive time stamps (int64 nanoseconds, sorted). None with fewer than two time stamps
+def nominalInterval(timeNanoseconds):
+
+    intervals = np.diff(timeNanoseconds)
+    intervals = intervals[intervals > 0]
+    if len(intervals) == 0:
+        return None
+    distinctIntervals, intervalCounts = np.unique(intervals, return_counts=True)
+    return int(distinctIntervals[np.argmax(intervalCounts)])
+
+
+# Completeness and gap fields by calendar bin from the points with values and the sampling interval of the series ('nominalInterval'):
+# ExpectedCount - points expected in the part of the bin within the series period (first point to one interval after the last point),
+# PercentComplete - Count / ExpectedCount (max 100), GapCount - gaps (more than 1.5 intervals between consecutive values) in the bin and
+# LongestGapHours - longest missing time in the bin (one interval after the value before the gap to the value after the gap). A gap spanning bins
+# is split by bin (diff, repeat and bincount - no reindexing of the series)
+# Output: dictionary with the ExpectedCount, PercentComplete, LongestGapHours and GapCount arrays of the 'binCount' bins from 'firstOrdinal'
+def binGapState(rawArrays, timeStep, firstOrdinal, binCount, valueCount):
+
+    validTimes = np.sort(np.asarray(rawArrays['DateTime'], dtype='datetime64[ns]')[~np.isnan(rawArrays['Value'])].view('int64'))
+    interval = nominalInterval(validTimes)
+    if interval is None:
+        return {'ExpectedCount': pd.array(np.full(binCount, None), dtype='Int64'), 'PercentComplete': np.full(binCount, np.nan),
+                'LongestGapHours': np.zeros(binCount), 'GapCount': np.zeros(binCount, dtype='int64')}
+
+    binStarts = calendarBinStarts(np.arange(firstOrdinal, firstOrdinal + binCount + 1), timeStep)
+
+    # Expected points in the part of each bin within the series period
+    periodStart = np.maximum(binStarts[:-1], validTimes[0])
+    periodEnd = np.minimum(binStarts[1:], validTimes[-1] + interval)
+    expectedCount = np.round(np.clip(periodEnd - periodStart, 0, None) / float(interval)).astype('int64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentComplete = np.where(expectedCount > 0, np.round(np.minimum(100.0, 100.0 * valueCount / expectedCount), 2), np.nan)
+
+    # Gaps - missing time from one interval after the value before the gap to the value after the gap
+    gapIndex = np.flatnonzero(np.diff(validTimes) > 1.5 * interval)
+    gapStart = validTimes[gapIndex] + interval
+    gapEnd = validTimes[gapIndex + 1]
+
+    # Split the gaps by bin - one row per gap and bin spanned
+    gapFirstBin = defineCalendarBins(gapStart.view('datetime64[ns]'), timeStep) - firstOrdinal
+    gapLastBin = defineCalendarBins((gapEnd - 1).view('datetime64[ns]'), timeStep) - firstOrdinal
+    binsSpanned = gapLastBin - gapFirstBin + 1
+    gapRow = np.repeat(np.arange(len(gapIndex)), binsSpanned)
+    gapBin = gapFirstBin[gapRow] + np.arange(len(gapRow)) - np.repeat(np.cumsum(binsSpanned) - binsSpanned, binsSpanned)
+    gapTime = np.minimum(gapEnd[gapRow], binStarts[gapBin + 1]) - np.maximum(gapStart[gapRow], binStarts[gapBin])
+
+    gapCount = np.bincount(gapBin, minlength=binCount)
+    longestGap = np.zeros(binCount, dtype='int64')
+    np.maximum.at(longestGap, gapBin, gapTime)
+
+    return {'ExpectedCount': expectedCount, 'PercentComplete': percentComplete,
+            'LongestGapHours': np.round(longestGap / 3600e9, 4), 'GapCount': gapCount}
+
+
+# Build the Daily Quantile Sketch - the values in each day are sorted and compacted to at most 'quantileSketchSize' weighted values
+# (the midpoint of each of 'quantileSketchSize' equal weight buckets). Days with fewer values retain all values (i.e. exact).
+# Output: dataframe with BinLabel (daily bin ordinal), Value, Weight
+def buildDailySketch(rawArrays):
+    try:
+
+        dfSketch = pd.DataFrame({'BinLabel': defineCalendarBins(rawArrays['DateTime'], 'Daily'),
+                                 'Value': rawArrays['Value'],
+                                 'Weight': 1.0})
+        dfSketch = dfSketch[dfSketch['Value'].notna()]
+
+        return "success function", compactSketch(dfSketch, quantileSketchSize)
+
+    except:
+
+        messageTime = timeFun()
+        print("Error on buildDailySketch Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'buildDailySketch'"
+
+
+# Compact the weighted values in each sketch bin to at most 'sketchSize' values. Values are sorted by bin and each equal weight bucket is
+# represented by the midpoint of its first and last value with the total weight of the bucket (the first value would bias the quantiles low)
+# - the rank error added by a compaction is at most 1/sketchSize of the bin weight.
+def compactSketch(dfSketch, sketchSize):
+
+    dfSketch = dfSketch.sort_values(['BinLabel', 'Value'], kind='mergesort').reset_index(drop=True)
+    if dfSketch.shape[0] == 0:
+        return dfSketch
+
+    binGroups = dfSketch.groupby('BinLabel', sort=False)['Weight']
+    weight = dfSketch['Weight'].values
+    totalWeight = binGroups.transform('sum').values
+    pointCount = binGroups.transform('size').values
+    cumWeightBefore = binGroups.cumsum().values - weight
+    bucket = np.floor(cumWeightBefore * sketchSize / totalWeight).astype('int64')
+    binCode = binGroups.ngroup().values
+
+    # One value by bin/bucket - all values when the bin has no more than 'sketchSize' values
+    keepMask = np.ones(dfSketch.shape[0], dtype=bool)
+    keepMask[1:] = (binCode[1:] != binCode[:-1]) | (bucket[1:] != bucket[:-1])
+    keepMask |= pointCount <= sketchSize
+    keepIndex = np.flatnonzero(keepMask)
+    lastIndex = np.append(keepIndex[1:], dfSketch.shape[0]) - 1
+
+    values = dfSketch['Value'].values
+    dfCompact = dfSketch.iloc[keepIndex].reset_index(drop=True)
+    dfCompact['Value'] = (values[keepIndex] + values[lastIndex]) / 2.0
+    dfCompact['Weight'] = np.add.reduceat(weight, keepIndex)
+    return dfCompact
+
+
+# Derive the quantile fields by calendar bin. 'Sketch' - the daily sketch is relabeled to the calendar bin and compacted (merged),
+# 'Exact' - the raw values of the bin with unit weights (same plotting position as the sketch - equal to 'Sketch' for bins with no more
+# than 'quantileSketchSize' values), 'None' - no quantile fields.
+# Output: dataframe with DateTime and the quantile fields (i.e. DailyP10, DailyMedian, DailyP90)
+def quantileSummary(rawArrays, dfDailySketch, timeStep, prefix, calendarBins):
+    try:
+
+        quantileFields = [prefix + quantileFieldName(quantile) for quantile in quantileList]
+
+        if quantileMode.lower() == 'sketch':
+
+            if timeStep.lower() == 'daily':
+                dfSketch = dfDailySketch
+            else:
+                # Merge the daily sketches upward to the calendar bin
+                dayLabels = calendarBinLabels(dfDailySketch['BinLabel'].values, 'Daily')
+                dfSketch = dfDailySketch.assign(BinLabel=defineCalendarBins(dayLabels, timeStep))
+                dfSketch = compactSketch(dfSketch, quantileSketchSize)
+
+        elif quantileMode.lower() == 'exact':
+
+            # Each raw value with a unit weight - sorted by bin and value (as the sketch)
+            dfSketch = pd.DataFrame({'BinLabel': calendarBins[timeStep.lower()], 'Value': rawArrays['Value'], 'Weight': 1.0})
+            dfSketch = dfSketch[dfSketch['Value'].notna()].sort_values(['BinLabel', 'Value'], kind='mergesort').reset_index(drop=True)
+
+        else:
+            return "success function", pd.DataFrame(columns=['DateTime'])
+
+        # Each value (bucket midpoint) is placed at the centre of its weight in the bin - the quantile is interpolated between the
+        # values either side of quantile * bin weight (the first/last value below/above the first/last centre)
+        binGroups = dfSketch.groupby('BinLabel', sort=False)['Weight']
+        centreFraction = (binGroups.cumsum().values - dfSketch['Weight'].values / 2.0) / binGroups.transform('sum').values
+        binCode = binGroups.ngroup().values
+        binStart = np.flatnonzero(np.concatenate([[True], binCode[1:] != binCode[:-1]]))
+        binEnd = np.append(binStart[1:], len(binCode)) - 1
+        values = dfSketch['Value'].values
+
+        # Values are sorted by bin and value - bin code plus centre is increasing across the bins
+        centreKey = binCode + centreFraction
+        dfQuantile = pd.DataFrame(index=pd.Index(dfSketch['BinLabel'].unique()))
+        for quantile, field in zip(quantileList, quantileFields):
+            # First centre >= quantile in each bin (the last value of the bin when none) and the value before it in the bin
+            upperIndex = np.minimum(np.searchsorted(centreKey, np.arange(len(binStart)) + quantile), binEnd)
+            lowerIndex = np.where((upperIndex == binStart) | (centreFraction[upperIndex] <= quantile), upperIndex, upperIndex - 1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                position = np.where(upperIndex == lowerIndex, 0.0, (quantile - centreFraction[lowerIndex]) / (centreFraction[upperIndex] - centreFraction[lowerIndex]))
+            dfQuantile[field] = values[lowerIndex] + (values[upperIndex] - values[lowerIndex]) * position
+
+        # Bin ordinals to DateTime bin labels
+        dfQuantile.index = pd.DatetimeIndex(calendarBinLabels(dfQuantile.index.values, timeStep), name='DateTime')
+
+        return "success function", dfQuantile.reset_index()
+
+    except:
+
+        messageTime = timeFun()
+        print("Error on quantileSummary Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'quantileSummary'"
+
+
+# Quantile field name suffix - 0.5 is the Median, otherwise P{percent} (i.e. 0.1 - P10)
+def quantileFieldName(quantile):
+
+    if quantile == 0.5:
+        return "Median"
+    return "P" + ('%g' % (quantile * 100))
+
+
+# Export the quantile method and error bound metadata for the time steps processed
+# Sketch rank error bound: one compaction for the Daily sketch plus one for the merge to the Weekly, Monthly, Yearly, WaterYear and Seasonal bins
+def quantileMetadata(timeStepList):
+    try:
+
+        metadataRows = []
+        for timeStep in timeStepList:
+            if timeStep.lower() not in calendarTimeSteps:
+                continue
+
+            if quantileMode.lower() == 'sketch':
+                compactions = 1 if timeStep.lower() == 'daily' else 2
+                metadataRows.append([timeStep, 'Sketch', str(quantileList), quantileSketchSize, compactions,
+                                     compactions / float(quantileSketchSize), 'Interpolated between the bucket midpoints placed at the centre of their cumulative weight'])
+            elif quantileMode.lower() == 'exact':
+                metadataRows.append([timeStep, 'Exact', str(quantileList), '', 0, 0.0, 'Interpolated between the raw values placed at the centre of their cumulative weight (unit weights)'])
+
+        if len(metadataRows) == 0:
+            return "success function"
+
+        dfMetadata = pd.DataFrame(metadataRows, columns=['TimeStep', 'QuantileMode', 'Quantiles', 'SketchSize', 'Compactions',
+                                                         'RankErrorBound', 'QuantileDefinition'])
+
+        outFull = allSitesFile("QuantileMetadata")
+        metadataText = dfMetadata.to_csv(index=False)
+
+        # Export - not rewritten when unchanged
+        if os.path.exists(outFull):
+            existingFile = open(outFull, "r")
+            existingText = existingFile.read()
+            existingFile.close()
+            if existingText == metadataText:
+                return "success function"
+
+        outFile = open(outFull, "w")
+        outFile.write(metadataText)
+        outFile.close()
+
+        return "success function"
+
+    except:
+
+        messageTime = timeFun()
+        print("Error on quantileMetadata Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'quantileMetadata'"
+
+
+# Derive the Mean, Standard Deviation (sample i.e. n-1) and Count fields from the aggregate state - with the completeness and gap fields when in the state ('gapStatistics')
+# Output: dataframe with DateTime, {prefix}Mean, {prefix}StandardDev, {prefix}Count ({prefix}ExpectedCount, {prefix}PercentComplete, {prefix}LongestGapHours, {prefix}GapCount) fields
+def summaryFromState(dfState, prefix):
+
+    count = dfState['Count'].values.astype('float64')
+    mean = np.where(count > 0, dfState['Mean'].values, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = dfState['M2'].values / (count - 1)
+    standardDev = np.where(count > 1, np.sqrt(variance), np.nan)
+
+    dfSummary = pd.DataFrame({'DateTime': dfState.index.values,
+                              prefix + 'Mean': mean,
+                              prefix + 'StandardDev': standardDev,
+                              prefix + 'Count': dfState['Count'].values})
+    for field in ['ExpectedCount', 'PercentComplete', 'LongestGapHours', 'GapCount']:
+        if field in dfState.columns:
+            dfSummary[prefix + field] = dfState[field].values
+    return dfSummary
+
+
+# Process Rolling Summaries - Daily Max, Min and Mean with the rolling 'rollingWindowDays' metrics used for stream temperature:
+# MWAT (Maximum Weekly Average Temperature - max of the 7-day rolling mean of the daily means) and
+# 7DADM (7-Day Average of the Daily Maximums). Daily values are derived in one pass via bincount and the rolling windows via cumulative sums - O(n).
+# Output: daily file with the rolling metrics and an annual file with the MWAT and Max 7DADM (and date of occurrence) by year.
+def processRolling(rawArrays, outDirBySite, site, timeSeries, outFileName, timeStep, rollingList, rollingAnnualList, protocol):
+    try:
+
+        # Define the day index of each raw value - days since the first day in the series
+        dateTimeDay = rawArrays['DateTime'].astype('datetime64[D]')
+        firstDay = dateTimeDay.min()
+        dayId = (dateTimeDay - firstDay).astype('int64')
+        dayCount = int(dayId.max()) + 1
+
+        # Only use the numeric values
+        values = rawArrays['Value']
+        validMask = ~np.isnan(values)
+        dayIdValid = dayId[validMask]
+        valuesValid = values[validMask]
+
+        # Daily Count, Mean, Max and Min - single pass reductions by day
+        dailyCount = np.bincount(dayIdValid, minlength=dayCount)
+        dailySum = np.bincount(dayIdValid, weights=valuesValid, minlength=dayCount)
+        dailyMax = np.full(dayCount, -np.inf)
+        np.maximum.at(dailyMax, dayIdValid, valuesValid)
+        dailyMin = np.full(dayCount, np.inf)
+        np.minimum.at(dailyMin, dayIdValid, valuesValid)
+
+        hasData = dailyCount > 0
+        dailyMean = np.full(dayCount, np.nan)
+        dailyMean[hasData] = dailySum[hasData] / dailyCount[hasData]
+        dailyMax[~hasData] = np.nan
+        dailyMin[~hasData] = np.nan
+
+        # Rolling Window Mean of the Daily Mean and Daily Max - only defined when every day in the window has data
+        rollingMean = rollingWindowMean(dailyMean, rollingWindowDays)
+        rollingMaxMean = rollingWindowMean(dailyMax, rollingWindowDays)
+
+        rollingMeanField = "Rolling" + str(rollingWindowDays) + "DayMean"
+        rollingMaxField = "Rolling" + str(rollingWindowDays) + "DayAvgDailyMax"
+
+        dfRollingFinal = pd.DataFrame({'DateTime': firstDay + np.arange(dayCount).astype('timedelta64[D]'),
+                                       'DailyMean': dailyMean,
+                                       'DailyMax': dailyMax,
+                                       'DailyMin': dailyMin,
+                                       'DailyCount': dailyCount,
+                                       rollingMeanField: rollingMean,
+                                       rollingMaxField: rollingMaxMean})
+        dfRollingFinal['DateTime'] = dfRollingFinal['DateTime'].astype('datetime64[ns]')
+
+        ###################
+        # Annual MWAT and Max 7DADM with the date (i.e. last day of the window) of occurrence
+        yearSeries = dfRollingFinal['DateTime'].dt.year
+        dfAnnualMax = dfRollingFinal.groupby(yearSeries)[[rollingMeanField, rollingMaxField]].max()
+
+        # First date in each year the annual maximum occurs
+        mwatDate = dfRollingFinal['DateTime'].where(dfRollingFinal[rollingMeanField] == dfRollingFinal.groupby(yearSeries)[rollingMeanField].transform('max'))
+        max7DADMDate = dfRollingFinal['DateTime'].where(dfRollingFinal[rollingMaxField] == dfRollingFinal.groupby(yearSeries)[rollingMaxField].transform('max'))
+
+        dfRollingAnnual = pd.DataFrame({'DateTime': pd.to_datetime(dfAnnualMax.index.astype(str) + '-01-01'),
+                                        'MWAT': dfAnnualMax[rollingMeanField].values,
+                                        'MWATDate': mwatDate.groupby(yearSeries).min().values,
+                                        'Max7DADM': dfAnnualMax[rollingMaxField].values,
+                                        'Max7DADMDate': max7DADMDate.groupby(yearSeries).min().values,
+                                        'DaysWithData': dfRollingFinal['DailyCount'].gt(0).groupby(yearSeries).sum().values})
+
+        # Add Park, Summit, Plot and SiteName fields
+        addSiteFields(dfRollingFinal, site, protocol)
+        addSiteFields(dfRollingAnnual, site, protocol)
+
+        outFull = outDirBySite + "\\" + outFileName + "_" + str(site) + "_" + str(timeSeries) + "_" + str(timeStep) + outputSuffix()
+        outFullAnnual = outDirBySite + "\\" + outFileName + "_" + str(site) + "_" + str(timeSeries) + "_" + str(timeStep) + "Annual" + outputSuffix()
+
+        # Export - queued to the background writer
+        writeOutput(dfRollingFinal, outFull)
+        writeOutput(dfRollingAnnual, outFullAnnual)
+
+        rollingList.append(outFull)
+        rollingAnnualList.append(outFullAnnual)
 
         messageTime = timeFun()
         scriptMsg = "Successfully Exported " + timeStep + "- " + outFull + " - " + messageTime
@@ -1027,129 +2169,584 @@ def processMonthly(dfRawFinal, outDirBySite, site, timeSeries, outFileName, time
         logFile.write(scriptMsg + "\n")
         logFile.close()
 
-        return "success function", monthlyList
+        return "success function", rollingList, rollingAnnualList
+
+    except:
+
+        messageTime = timeFun()
+        print("Error on processRolling Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'processRolling'"
+
+
+# Process the Wide export - all time series at the site pulled in one getTimeSeriesData call (points are aligned by the service) and exported
+# in one file with a Value and GradeCode field by time series. Local time stamps by offset arithmetic at 'utcOffset' (nanoseconds, None - time series offset in the 'Utc' field).
+# 'Exact' - all time stamps of all series, 'Nearest' - time stamps of the first series with the nearest value of the other series within 'wideTolerance'
+# (as-of merge) for loggers with different intervals.
+def processWide(timeseries, siteSeriesIds, outDirBySite, site, outFileName, timeStep, wideList, protocol, utcOffset=None):
+    try:
+
+        timeseriesData = timedCall('getTimeSeriesData', "Wide", timeseries.getTimeSeriesData, timeSeriesIds=[seriesId for timeSeries, seriesId in siteSeriesIds], **queryWindow())
+        countPoints('getTimeSeriesData', "Wide", len(timeseriesData['Points']))
+        dfPoints = pd.DataFrame.from_dict(timeseriesData['Points'])
+        if dfPoints.shape[0] == 0:
+            print("WARNING - No points for the Wide export - " + str(site))
+            return "success function", wideList
+
+        # Local date time and UTC offset parsed from the time stamp text (i.e. '2021-06-01T00:00:00.0000000-07:00', 'Z' or '+/-HHMM' designators)
+        utcNanoseconds, offsetNanoseconds = parseOffsetTimes(dfPoints['Timestamp'])
+        dfWide = pd.DataFrame({'DateTime': localTimes(utcNanoseconds, offsetNanoseconds if utcOffset is None else utcOffset, 's'),
+                               'Utc': offsetTexts(offsetNanoseconds) if utcOffset is None else offsetText(utcOffset)})
+
+        # Value and Grade Code by time series - field position in the response matches the requested order
+        seriesFields = []
+        for seriesNumber, (timeSeries, seriesId) in enumerate(siteSeriesIds, 1):
+            valueField = 'NumericValue' + str(seriesNumber)
+            gradeField = 'GradeCode' + str(seriesNumber)
+            dfWide[timeSeries] = pd.to_numeric(dfPoints[valueField], errors='coerce') if valueField in dfPoints else np.nan
+            dfWide[timeSeries + ' GradeCode'] = pd.to_numeric(dfPoints[gradeField], errors='coerce').astype('Int64') if gradeField in dfPoints else pd.NA
+            seriesFields.append([timeSeries, timeSeries + ' GradeCode'])
+
+        if wideAlignment.lower() == 'nearest' and len(seriesFields) > 1:
+
+            # Time line of the first series, other series matched by the nearest time stamp within the tolerance
+            firstFields = seriesFields[0]
+            dfAligned = dfWide.loc[dfWide[firstFields[0]].notna(), ['DateTime', 'Utc'] + firstFields].reset_index(drop=True)
+            for fields in seriesFields[1:]:
+                dfSeries = dfWide.loc[dfWide[fields[0]].notna(), ['DateTime'] + fields]
+                dfAligned = pd.merge_asof(dfAligned, dfSeries, on='DateTime', direction='nearest', tolerance=pd.Timedelta(wideTolerance))
+            dfWide = dfAligned
+
+        else:
+            # Exact - drop time stamps without a value for any series
+            dfWide = dfWide[dfWide[[fields[0] for fields in seriesFields]].notna().any(axis=1)].reset_index(drop=True)
+
+        dfWide = addSiteFields(dfWide, site, protocol)
+
+        outFull = outDirBySite + "\\" + outFileName + "_" + str(site) + "_" + str(timeStep) + outputSuffix()
+        writeOutput(dfWide, outFull)
+        wideList.append(outFull)
 
-        del dfMonthlyWork
-        del monthlyMeanSeries
-        del dfMonthlyMean
-        del dfMonthlyCount
+        messageTime = timeFun()
+        scriptMsg = "Successfully Exported Wide File for: " + str(site) + " - " + str(len(seriesFields)) + " Time Series - " + wideAlignment + " - " + messageTime
+        print(scriptMsg)
+        logFile = open(logFileName, "a")
+        logFile.write(scriptMsg + "\n")
+        logFile.close()
 
+        return "success function", wideList
 
     except:
 
         messageTime = timeFun()
-        print("Error on processDaily Function ")
+        print("Error on processWide Function ")
         traceback.print_exc(file=sys.stdout)
-        return "Failed function - 'processMonthly'"
+        return "Failed function - 'processWide'"
 
 
-# Process Yearly Summaries
-def processYearly(dfRawFinal, outDirBySite, site, timeSeries, outFileName, timeStep, yearlyList, protocol):
+# Rolling mean over 'windowDays' consecutive values via cumulative sums - O(n). Windows with a missing (NaN) value are set to NaN.
+# Value is assigned to the last day in the window.
+def rollingWindowMean(dailyValues, windowDays):
+
+    rollingValues = np.full(dailyValues.shape[0], np.nan)
+    if dailyValues.shape[0] < windowDays:
+        return rollingValues
+
+    hasValue = ~np.isnan(dailyValues)
+    cumulativeSum = np.concatenate(([0.0], np.cumsum(np.where(hasValue, dailyValues, 0.0))))
+    cumulativeCount = np.concatenate(([0], np.cumsum(hasValue)))
+
+    windowSum = cumulativeSum[windowDays:] - cumulativeSum[:-windowDays]
+    windowCount = cumulativeCount[windowDays:] - cumulativeCount[:-windowDays]
+
+    rollingValues[windowDays - 1:] = np.where(windowCount == windowDays, windowSum / windowDays, np.nan)
+    return rollingValues
+
+
+# Insert the Park, (Summit, Plot - AVCSS) and SiteName fields at the start of a summary dataframe
+def addSiteFields(dfSummary, site, protocol):
+
+    siteSplit = site.split("_")
+    park = siteSplit[0]
+
+    if protocol.lower() == 'avcss':
+
+        summit = siteSplit[3]
+        plot = siteSplit[4]
+
+        dfSummary.insert(0, "Park", park)
+        dfSummary.insert(1, "Summit", summit)
+        dfSummary.insert(2, "Plot", plot)
+        dfSummary.insert(3, "SiteName", site)
+
+    else:  # SEI or WEI
+        dfSummary.insert(0, "Park", park)
+        dfSummary.insert(1, "SiteName", site)
+
+    return dfSummary
+
+
+# Grade, Approval and Note fields in the Raw dataframe
+labelFields = ['GradeCode', 'GradeName', 'ApprovalCode', 'ApprovalName', 'NoteText']
+
+
+# Encode the Grade, Approval and Note fields as integer coded categoricals (one copy of each distinct label)
+def encodeLabelFields(dfRaw):
+
+    for field in labelFields:
+        if field in dfRaw.columns and not isinstance(dfRaw[field].dtype, pd.CategoricalDtype):
+            if pd.api.types.is_extension_array_dtype(dfRaw[field].dtype):
+                # Integer codes of the 'Compact' frame - categories of the code text (blank when missing) ordered as the Standard text codes
+                dfRaw[field] = dfRaw[field].astype(str).where(dfRaw[field].notna(), '').astype('category')
+            else:
+                dfRaw[field] = dfRaw[field].astype('category')
+    return dfRaw
+
+
+# Raw frame points and bytes (Standard and Compact dtypes) of the run - 'frameMemoryMode' 'Compact'
+frameBytes = {'Points': 0, 'Standard': 0, 'Compact': 0}
+
+
+# Compact dtypes of the Raw frame fields ('frameMemoryMode' 'Compact') - integer codes (GradeCode, ApprovalCode) as the smallest nullable integer
+# (Int8/Int16/...) holding the codes, other text fields as categoricals. Fields not in the frame are ignored. Codes are only converted when the integer
+# is written the same as the code text (blank codes are missing values) - else categorical
+def compactFrameFields(dfRaw, fields):
+
+    for field in fields:
+        if field not in dfRaw.columns or isinstance(dfRaw[field].dtype, pd.CategoricalDtype) or pd.api.types.is_extension_array_dtype(dfRaw[field].dtype):
+            continue
+
+        values = dfRaw[field]
+        if field in ['GradeCode', 'ApprovalCode']:
+            blank = values.isna().values | (values.astype(str).values == '')
+            codes = pd.to_numeric(values.where(~blank), errors='coerce')
+            if not codes[~blank].isna().any() and (codes[~blank] % 1 == 0).all():
+                codes = codes.astype('Int64')
+                if (codes[~blank].astype(str).values == values[~blank].astype(str).values).all():
+                    minCode, maxCode = (int(codes.min()), int(codes.max())) if (~blank).any() else (0, 0)
+                    for dtype in ['Int8', 'Int16', 'Int32', 'Int64']:
+                        typeRange = np.iinfo(dtype.lower())
+                        if typeRange.min <= minCode and maxCode <= typeRange.max:
+                            dfRaw[field] = codes.astype(dtype)
+                            break
+                    continue
+
+        dfRaw[field] = values.astype('category')
+    return dfRaw
+
+
+# Bytes of the Raw frame in the Standard dtypes (object text fields, float64 values) as pandas memory_usage(deep=True) - derived by distinct value
+# from the Compact frame rather than by converting the frame back
+def standardFrameBytes(dfRaw):
+
+    standardBytes = int(dfRaw.index.memory_usage())
+    for field in dfRaw.columns:
+        values = dfRaw[field]
+        if isinstance(values.dtype, pd.CategoricalDtype) or pd.api.types.is_extension_array_dtype(values.dtype):
+            # Object pointer and text of each value - missing codes are blank text in the Standard frame (factorize code -1 - last value)
+            codes, distinctValues = pd.factorize(values)
+            textBytes = np.array([sys.getsizeof(str(value)) for value in distinctValues] + [sys.getsizeof('')], dtype='int64')
+            standardBytes += 8 * len(values) + int(textBytes[codes].sum())
+        elif values.dtype == np.float32:
+            standardBytes += 8 * len(values)
+        else:
+            standardBytes += int(values.memory_usage(index=False, deep=True))
+    return standardBytes
+
+
+# Compact Raw Frame ('frameMemoryMode' 'Compact') - remaining text fields as categoricals and the values as float32 ('compactValueType') when every
+# value is written the same at float32. Called once the float64 DateTime/Value arrays of the summaries are defined. Bytes per point in the Standard
+# and Compact dtypes are logged and added to the run totals ('frameBytes')
+# Output: compact Raw dataframe
+def compactRawFrame(dfRaw, site, timeSeries):
     try:
 
-        # Create workDataFrame
-        dfYearlyWork = dfRawFinal[['SiteName', 'DateTime', 'Value']]
+        textFields = [field for field in dfRaw.columns if dfRaw[field].dtype == object]
+        dfRaw = compactFrameFields(dfRaw, textFields)
 
-        # Set the Row Inde value to 'DataTime' to allow for Time Series calculation, must set inplace=True so copy of 'DateTime is retained for use
-        dfYearlyWork.set_index(dfYearlyWork['DateTime'], inplace=True)
+        valueType = "float64"
+        if compactValueType.lower() == 'float32' and dfRaw['Value'].dtype == np.float64:
+            values32 = dfRaw['Value'].values.astype('float32')
+            # Shortest text of the float32 value read back as float64 is the float64 value - the value is written the same
+            if np.array_equal(values32.astype(str).astype('float64'), dfRaw['Value'].values, equal_nan=True):
+                dfRaw['Value'] = values32
+                valueType = "float32"
 
-        # Calculate the Daily Mean - output is a series
-        yearlyMeanSeries = dfYearlyWork['Value'].resample(rule='AS').mean()
+        pointCount = dfRaw.shape[0]
+        standardBytes = standardFrameBytes(dfRaw)
+        compactBytes = int(dfRaw.memory_usage(index=True, deep=True).sum())
+        frameBytes['Points'] += pointCount
+        frameBytes['Standard'] += standardBytes
+        frameBytes['Compact'] += compactBytes
 
-        # Export dataseries to a dataframe - reset_index so both columns are retained
-        dfYearlyMean = yearlyMeanSeries.to_frame().reset_index()
+        messageTime = timeFun()
+        scriptMsg = "Frame Memory (Bytes/Point) - " + str(site) + " - " + str(timeSeries) + " - Standard: " + str(round(standardBytes / max(pointCount, 1), 1)) + " - Compact: " + str(round(compactBytes / max(pointCount, 1), 1)) + " - Value: " + valueType + " - " + messageTime
+        print(scriptMsg)
+        logFile = open(logFileName, "a")
+        logFile.write(scriptMsg + "\n")
+        logFile.close()
 
-        dfYearlyMean.rename(columns={"Value": "YearlyMean", "DateTime": "DateTime"}, inplace=True)
+        return "success function", dfRaw
 
-        # Calculate the Standard Deviation - output is a series
-        yearlySTDSeries = dfYearlyWork['Value'].resample(rule='AS').std()
+    except:
 
-        # Export dataseries to a dataframe - reset_index so both columns are retained
-        dfYearlySTD = yearlySTDSeries.to_frame().reset_index()
+        messageTime = timeFun()
+        print("Error on compactRawFrame Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'compactRawFrame'"
 
-        # Rename Columns
-        dfYearlySTD.rename(columns={"Value": "YearlyStandardDev", "DateTime": "DateTimeDropSTD"}, inplace=True)
 
-        # Concatenate (i.e. join) the dfDailyMean, and dfDailySTD dataframes
-        dfYearlyMeanStd = pd.concat([dfYearlyMean, dfYearlySTD], axis=1, join='inner')
+# Export the Raw dataframe (queued to the background writer) - Grade, Approval and Note fields as defined in 'labelEncoding'
+# 'Full' - label text on every point
+# 'Dictionary' - points file with the integer codes, labels by Field and Code in the '{points file}_LabelDictionary.csv' file
+# 'RunLength' - points file with a 'LabelRun' integer code, labels by run of consecutive points with the same labels (StartDateTime, EndDateTime, PointCount)
+#  in the '{points file}_LabelRuns.csv' file
+def exportRawPoints(dfRaw, outFull):
+    try:
 
-        # Drop duplicate 'DateTime' field
-        dfYearlyMeanStd.drop(['DateTimeDropSTD'], axis=1, inplace=True)
+        encoding = labelEncoding.lower()
+        if encoding == 'full':
+            writeOutput(dfRaw, outFull)
+            return "success function"
+
+        dfRaw = encodeLabelFields(dfRaw.copy())
+        fields = [field for field in labelFields if field in dfRaw.columns]
+        outBase, suffix = splitOutputFile(outFull)
+
+        if encoding == 'dictionary':
+
+            dictionaryList = []
+            for field in fields:
+                categories = dfRaw[field].cat.categories
+                dictionaryList.append(pd.DataFrame({'Field': field, 'Code': np.arange(len(categories)), 'Label': categories.astype(str)}))
+                dfRaw[field] = dfRaw[field].cat.codes
+
+            dfDictionary = pd.concat(dictionaryList, ignore_index=True)
+            writeOutput(dfRaw, outFull)
+            writeOutput(dfDictionary, outBase + "_LabelDictionary" + suffix)
+
+        elif encoding == 'runlength':
+
+            # A new run starts when the site or any label code differs from the previous point
+            codeMatrix = np.column_stack([dfRaw[field].cat.codes.values for field in fields] + [pd.factorize(dfRaw['SiteName'])[0]])
+            runStart = np.ones(dfRaw.shape[0], dtype=bool)
+            runStart[1:] = (codeMatrix[1:] != codeMatrix[:-1]).any(axis=1)
+            labelRun = np.cumsum(runStart) - 1
+
+            runGroups = dfRaw.groupby(labelRun, sort=False)
+            dfRuns = pd.DataFrame({'LabelRun': np.arange(int(runStart.sum())),
+                                   'SiteName': dfRaw['SiteName'].values[runStart],
+                                   'StartDateTime': runGroups['DateTime'].min().values,
+                                   'EndDateTime': runGroups['DateTime'].max().values,
+                                   'PointCount': runGroups.size().values})
+            for field in fields:
+                dfRuns[field] = dfRaw[field].values[runStart]
+
+            dfPoints = dfRaw.drop(columns=fields)
+            dfPoints['LabelRun'] = labelRun
+            writeOutput(dfPoints, outFull)
+            writeOutput(dfRuns, outBase + "_LabelRuns" + suffix)
 
-        # Calculate the Count - output is a series
-        yearlyCountSeries = dfYearlyWork['Value'].resample(rule='AS').count()
+        else:
+            print("WARNING - labelEncoding " + str(labelEncoding) + " - Not Defined")
+            return "Failed function - 'exportRawPoints'"
 
-        # Export dataseries to a dataframe - reset_index so both columns are retained
-        dfYearlyCount = yearlyCountSeries.to_frame().reset_index()
+        return "success function"
 
-        # Rename Columns
-        dfYearlyCount.rename(columns={"Value": "YearlyCount", "DateTime": "DateTimeDrop"}, inplace=True)
+    except:
 
-        # Concatenate (i.e. join) the dfYearlyMeanStd, and defYearlyCount dataframes
-        dfYearlyFinal = pd.concat([dfYearlyMeanStd, dfYearlyCount], axis=1, join='inner')
+        messageTime = timeFun()
+        print("Error on exportRawPoints Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'exportRawPoints'"
 
-        # Drop duplicate 'DateTime' field
-        dfYearlyFinal.drop(['DateTimeDrop'], axis=1, inplace=True)
 
-        # Add Park, Summit, and Plot Fields
-        siteSplit = site.split("_")
-        park = siteSplit[0]
+# Load a Raw export and rehydrate the Grade, Approval and Note fields from the '_LabelDictionary' or '_LabelRuns' file when present
+# (i.e. 'Dictionary' or 'RunLength' labelEncoding) - label fields are returned as categoricals.
+# Output: dataframe with the full Raw fields
+def loadRawExport(pointsFile):
+    try:
 
+        outBase, suffix = splitOutputFile(pointsFile)
+        dfRaw = readOutputFile(pointsFile, parse_dates=['DateTime'])
 
-        if protocol.lower() == 'avcss':
+        if os.path.exists(outBase + "_LabelDictionary" + suffix):
 
-            summit = siteSplit[3]
-            plot = siteSplit[4]
+            # Code -1 is a blank label - a field with only blank labels (i.e. NoteText of a series without notes) has no dictionary rows
+            dfDictionary = readOutputFile(outBase + "_LabelDictionary" + suffix, dtype={'Label': str}, keep_default_na=False)
+            for field in labelFields:
+                if field in dfRaw.columns:
+                    dfField = dfDictionary[dfDictionary['Field'] == field].sort_values('Code')
+                    dfRaw[field] = pd.Categorical.from_codes(dfRaw[field].values, categories=dfField['Label'].values)
 
-            #Add Park, Summit, Plot and SiteName fields
-            dfYearlyFinal.insert(0, "Park", park)
-            dfYearlyFinal.insert(1, "Summit", summit)
-            dfYearlyFinal.insert(2, "Plot", plot)
-            dfYearlyFinal.insert(3, "SiteName", site)
+        elif os.path.exists(outBase + "_LabelRuns" + suffix):
 
-        else:#SEI or WEI
+            dfRuns = readOutputFile(outBase + "_LabelRuns" + suffix, dtype=str, keep_default_na=False)
+            runIndex = dfRaw['LabelRun'].values
+            for field in labelFields:
+                if field in dfRuns.columns:
+                    runCodes = dfRuns[field].astype('category')
+                    dfRaw[field] = pd.Categorical.from_codes(runCodes.cat.codes.values[runIndex], categories=runCodes.cat.categories)
+            dfRaw.drop(columns=['LabelRun'], inplace=True)
 
-            # Add Park, Summit, Plot and SiteName fields
-            dfYearlyFinal.insert(0, "Park", park)
-            dfYearlyFinal.insert(1, "SiteName", site)
+        return "success function", dfRaw
 
-        outFull = outDirBySite + "\\" + outFileName + "_" + str(site) + "_" + str(timeSeries) + "_" + str(timeStep) + ".csv"
+    except:
 
-        # Export
-        dfYearlyFinal.to_csv(outFull, index=False)
+        messageTime = timeFun()
+        print("Error on loadRawExport Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'loadRawExport'"
 
-        yearlyList.append(outFull)
+
+# Define the database file for the protocol (i.e. 'TemperatureLogger_SEI.sqlite') - one database per protocol so the site fields
+# (Park, Summit, Plot) are consistent within a database
+def databaseFile():
+
+    suffix = ".duckdb" if exportDatabase.lower() == 'duckdb' else ".sqlite"
+    return os.path.join(outDirectory, outFileName + "_" + protocol + suffix)
+
+
+# Connect to the protocol database ('exportDatabase') - DuckDB is only imported when used
+def databaseConnect():
+
+    if exportDatabase.lower() == 'duckdb':
+        import duckdb
+        return duckdb.connect(databaseFile())
+    else:
+        # Timeout - sharded workers wait on the write lock
+        return sqlite3.connect(databaseFile(), timeout=300)
+
+
+# Database date time parameter - SQLite date times are stored as ISO text ('YYYY-MM-DD HH:MM:SS' sorts by date time), DuckDB as TIMESTAMP
+def databaseDateTime(dateTimeValue):
+
+    if exportDatabase.lower() == 'duckdb':
+        return pd.Timestamp(dateTimeValue).to_pydatetime()
+    else:
+        return pd.Timestamp(dateTimeValue).strftime('%Y-%m-%d %H:%M:%S')
+
+
+# Check if a table exists in the database
+def databaseTableExists(connection, tableName):
+
+    if exportDatabase.lower() == 'duckdb':
+        result = connection.execute("SELECT table_name FROM information_schema.tables WHERE table_name = ?", [tableName]).fetchall()
+    else:
+        result = connection.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", [tableName]).fetchall()
+    return len(result) > 0
+
+
+# Add the dataframe fields not in the database table - numeric fields as DOUBLE/BIGINT (SQLite REAL/INTEGER), other fields as text.
+# Records loaded before the field was added are null
+def databaseAddColumns(connection, tableName, dfLoad):
+
+    tableColumns = [row[1] for row in connection.execute('PRAGMA table_info("' + tableName + '")').fetchall()]
+    for field in dfLoad.columns:
+        if field in tableColumns:
+            continue
+        if pd.api.types.is_float_dtype(dfLoad[field].dtype):
+            fieldType = 'DOUBLE' if exportDatabase.lower() == 'duckdb' else 'REAL'
+        elif pd.api.types.is_integer_dtype(dfLoad[field].dtype):
+            fieldType = 'BIGINT' if exportDatabase.lower() == 'duckdb' else 'INTEGER'
+        else:
+            fieldType = 'VARCHAR' if exportDatabase.lower() == 'duckdb' else 'TEXT'
+        connection.execute('ALTER TABLE "' + tableName + '" ADD COLUMN "' + field + '" ' + fieldType)
+
+
+# Load the Raw and calendar summary outputs for a site and time series to the protocol database - one table by time step (i.e. 'Raw', 'Daily')
+# with a 'TimeSeries' field and indexes on (SiteName, DateTime) and (DateTime). Loads are append only and incremental: Raw records after the last
+# loaded DateTime for the site and time series are appended. For the summaries the last loaded bin (possibly partial when loaded) is replaced
+# and the newer bins appended. Corrections to previously loaded records are not reloaded - delete the database to force a full reload.
+def loadDatabase(dfRawFinal, outDirBySite, site, timeSeries):
+    try:
+
+        connection = databaseConnect()
+        loadCounts = []
+
+        for timeStep in timeStepList:
+            if timeStep.lower() == 'raw':
+                dfLoad = dfRawFinal.copy()
+            elif timeStep.lower() in calendarTimeSteps:
+                outFull = outDirBySite + "\\" + outFileName + "_" + str(site) + "_" + str(timeSeries) + "_" + str(timeStep) + outputSuffix()
+                if not os.path.exists(outFull):
+                    continue
+                dfLoad = readOutputFile(outFull)
+            else:
+                continue
+
+            tableName = str(timeStep)
+
+            # Label fields are loaded as text, values as float64 (the 'Compact' frame integer codes and float32 values as in the Standard frame)
+            for field in dfLoad.columns:
+                if isinstance(dfLoad[field].dtype, pd.CategoricalDtype):
+                    dfLoad[field] = dfLoad[field].astype(object)
+                elif pd.api.types.is_extension_array_dtype(dfLoad[field].dtype):
+                    dfLoad[field] = dfLoad[field].astype(str).where(dfLoad[field].notna(), '')
+                elif dfLoad[field].dtype == np.float32:
+                    dfLoad[field] = dfLoad[field].values.astype(str).astype('float64')
+
+            dfLoad.insert(int(dfLoad.columns.get_loc('SiteName')) + 1, 'TimeSeries', str(timeSeries))
+            dfLoad['DateTime'] = pd.to_datetime(dfLoad['DateTime'])
+
+            if databaseTableExists(connection, tableName):
+                lastDateTime = connection.execute('SELECT MAX(DateTime) FROM "' + tableName + '" WHERE SiteName = ? AND TimeSeries = ?',
+                                                  [str(site), str(timeSeries)]).fetchone()[0]
+                if lastDateTime is not None:
+                    lastDateTime = pd.Timestamp(lastDateTime)
+                    if timeStep.lower() == 'raw':
+                        dfLoad = dfLoad[dfLoad['DateTime'] > lastDateTime]
+                    else:
+                        connection.execute('DELETE FROM "' + tableName + '" WHERE SiteName = ? AND TimeSeries = ? AND DateTime >= ?',
+                                           [str(site), str(timeSeries), databaseDateTime(lastDateTime)])
+                        dfLoad = dfLoad[dfLoad['DateTime'] >= lastDateTime]
+
+            # Fields added to the outputs since the table was created (i.e. 'gapStatistics') are added to the table
+            if databaseTableExists(connection, tableName):
+                databaseAddColumns(connection, tableName, dfLoad)
+
+            if exportDatabase.lower() == 'duckdb':
+                connection.register('dfLoad', dfLoad)
+                connection.execute('CREATE TABLE IF NOT EXISTS "' + tableName + '" AS SELECT * FROM dfLoad LIMIT 0')
+                fieldList = ", ".join('"' + field + '"' for field in dfLoad.columns)
+                connection.execute('INSERT INTO "' + tableName + '" (' + fieldList + ') SELECT ' + fieldList + ' FROM dfLoad')
+                connection.unregister('dfLoad')
+            else:
+                dfLoad['DateTime'] = dfLoad['DateTime'].dt.strftime('%Y-%m-%d %H:%M:%S')
+                dfLoad.to_sql(tableName, connection, if_exists='append', index=False)
+
+            connection.execute('CREATE INDEX IF NOT EXISTS "ix_' + tableName + '_SiteDateTime" ON "' + tableName + '" (SiteName, DateTime)')
+            connection.execute('CREATE INDEX IF NOT EXISTS "ix_' + tableName + '_DateTime" ON "' + tableName + '" (DateTime)')
+            connection.commit()
+
+            loadCounts.append(tableName + ": " + str(dfLoad.shape[0]))
+
+        connection.close()
 
         messageTime = timeFun()
-        scriptMsg = "Successfully Exported " + timeStep + "- " + outFull + " - " + messageTime
+        scriptMsg = "Database Load - " + str(site) + " - " + str(timeSeries) + " - Records Appended " + ", ".join(loadCounts) + " - " + databaseFile() + " - " + messageTime
         print(scriptMsg)
         logFile = open(logFileName, "a")
         logFile.write(scriptMsg + "\n")
         logFile.close()
 
-        return "success function", yearlyList
+        return "success function"
 
-        del dfYearlyWork
-        del yearlyMeanSeries
-        del dfYearlyMean
-        del dfYearlyCount
+    except:
 
+        messageTime = timeFun()
+        print("Error on loadDatabase Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'loadDatabase'"
+
+
+# Benchmark the common query patterns against the protocol database and the equivalent scan of the '_AllSites_' .csv files (when present).
+# Query parameters (site, month, year, grade) are defined from the loaded data. Each query is run 'benchmarkRepeats' times and the minimum time reported.
+# Output: '_AllSites_DatabaseBenchmark.csv' with Query, Source, Records, Seconds
+def benchmarkDatabase():
+    try:
+
+        if not os.path.exists(databaseFile()):
+            print("WARNING - Database " + databaseFile() + " not found - run the export with 'exportDatabase' defined")
+            return "Failed function - 'benchmarkDatabase'"
+
+        connection = databaseConnect()
+
+        # Query parameters from the loaded Raw data - first site, the middle month of the record and the most frequent grade
+        site, firstDateTime, lastDateTime = connection.execute('SELECT SiteName, MIN(DateTime), MAX(DateTime) FROM "Raw" GROUP BY SiteName ORDER BY SiteName LIMIT 1').fetchone()
+        middleDateTime = pd.Timestamp(firstDateTime) + (pd.Timestamp(lastDateTime) - pd.Timestamp(firstDateTime)) / 2
+        monthStart = middleDateTime.to_period('M').start_time
+        monthEnd = monthStart + pd.DateOffset(months=1)
+        yearStart = middleDateTime.to_period('Y').start_time
+        yearEnd = yearStart + pd.DateOffset(years=1)
+        gradeName = connection.execute('SELECT GradeName FROM "Raw" GROUP BY GradeName ORDER BY COUNT(*) DESC LIMIT 1').fetchone()[0]
+
+        # Query Name, Table (time step), SQL where clause, parameters, equivalent dataframe filter
+        queryList = [["Site Month Raw", "Raw", "SiteName = ? AND DateTime >= ? AND DateTime < ?", [site, monthStart, monthEnd],
+                      lambda df: (df['SiteName'] == site) & (df['DateTime'] >= monthStart) & (df['DateTime'] < monthEnd)],
+                     ["All Sites Month Grade Raw", "Raw", "DateTime >= ? AND DateTime < ? AND GradeName = ?", [monthStart, monthEnd, gradeName],
+                      lambda df: (df['DateTime'] >= monthStart) & (df['DateTime'] < monthEnd) & (df['GradeName'] == gradeName)],
+                     ["Site Daily", "Daily", "SiteName = ?", [site],
+                      lambda df: df['SiteName'] == site],
+                     ["All Sites Year Monthly", "Monthly", "DateTime >= ? AND DateTime < ?", [yearStart, yearEnd],
+                      lambda df: (df['DateTime'] >= yearStart) & (df['DateTime'] < yearEnd)]]
+
+        benchmarkRows = []
+        for queryName, tableName, whereClause, parameters, dfFilter in queryList:
+
+            matchTimeStep = [timeStep for timeStep in timeStepList if timeStep.lower() == tableName.lower()]
+            if len(matchTimeStep) == 0 or not databaseTableExists(connection, matchTimeStep[0]):
+                continue
+            tableName = matchTimeStep[0]
+
+            # Database query
+            queryParameters = [databaseDateTime(value) if isinstance(value, pd.Timestamp) else value for value in parameters]
+            seconds = []
+            for repeat in range(benchmarkRepeats):
+                startTime = time.perf_counter()
+                dfResult = pd.read_sql_query('SELECT * FROM "' + tableName + '" WHERE ' + whereClause, connection, params=queryParameters) if exportDatabase.lower() != 'duckdb' \
+                    else connection.execute('SELECT * FROM "' + tableName + '" WHERE ' + whereClause, queryParameters).df()
+                seconds.append(time.perf_counter() - startTime)
+            benchmarkRows.append([queryName, exportDatabase, dfResult.shape[0], min(seconds)])
+
+            # Equivalent scan of the '_AllSites_' .csv file
+            csvFile = allSitesFile(tableName)
+            if os.path.exists(csvFile):
+                seconds = []
+                for repeat in range(benchmarkRepeats):
+                    startTime = time.perf_counter()
+                    dfScan = loadRawExport(csvFile)[1] if tableName.lower() == 'raw' else pd.read_csv(csvFile)
+                    dfScan['DateTime'] = pd.to_datetime(dfScan['DateTime'])
+                    dfResult = dfScan[dfFilter(dfScan)]
+                    seconds.append(time.perf_counter() - startTime)
+                benchmarkRows.append([queryName, 'CSV', dfResult.shape[0], min(seconds)])
+
+        connection.close()
+
+        dfBenchmark = pd.DataFrame(benchmarkRows, columns=['Query', 'Source', 'Records', 'Seconds'])
+        outFull = allSitesFile("DatabaseBenchmark")
+        dfBenchmark.to_csv(outFull, index=False)
+
+        messageTime = timeFun()
+        scriptMsg = "Database Benchmark - " + databaseFile() + "\n" + dfBenchmark.to_string(index=False) + "\n" + messageTime
+        print(scriptMsg)
+        logFile = open(logFileName, "a")
+        logFile.write(scriptMsg + "\n")
+        logFile.close()
+
+        return "success function"
 
     except:
 
         messageTime = timeFun()
-        print("Error on processDaily Function ")
+        print("Error on benchmarkDatabase Function ")
         traceback.print_exc(file=sys.stdout)
-        return "Failed function - 'processYearly'"
+        return "Failed function - 'benchmarkDatabase'"
 
 
 # Append Files in list to .csv file
-def appendFiles(appendList, timeStep):
+def appendFiles(appendList, timeStep, manifest=None):
     try:
 
+        # Skip when the per site files (size and modified time) and code version are unchanged since the '_AllSites_' file was written
+        if manifest is not None:
+            manifestKey = "AllSites|" + str(timeStep)
+            inputHash = filesHash(appendList)
+            if skipUnchanged and manifestUnchanged(manifest, manifestKey, inputHash, codeVersionHash()):
+                print("Skipped Unchanged - " + allSitesFile(timeStep))
+                return "Success function"
+
         for count, file in enumerate(appendList):
 
-            dfLoop = pd.read_csv(file)
+            # Rehydrate the encoded Raw exports - re-encoded across all sites on export
+            if timeStep.lower() == 'raw' and labelEncoding.lower() != 'full':
+                outVal = loadRawExport(file)
+                if outVal[0].lower() != "success function":
+                    return "Failed function - 'appendFiles'"
+                dfLoop = outVal[1]
+            else:
+                dfLoop = readOutputFile(file)
+
             if count == 0:  # Make new dfallFiles
 
                 dfallFiles = dfLoop
@@ -1162,10 +2759,19 @@ def appendFiles(appendList, timeStep):
             del dfLoop
 
         # Define Export .csv file
-        outFull = outDirectory + "\\" + outFileName + "_AllSites_" + str(timeStep) + ".csv"
+        outFull = allSitesFile(timeStep)
 
         # Export
-        dfallFiles.to_csv(outFull, index=False)
+        if timeStep.lower() == 'raw':
+            outVal = exportRawPoints(dfallFiles, outFull)
+            if outVal.lower() != "success function":
+                return "Failed function - 'appendFiles'"
+        else:
+            dfallFiles.to_csv(outFull, index=False)
+
+        # Manifest entry saved once the '_AllSites_' Raw export queued to the background writer is written
+        if manifest is not None:
+            queueManifest(manifest, manifestKey, {'InputHash': inputHash, 'CodeHash': codeVersionHash(), 'OutputFiles': {str(timeStep): outFull}})
 
         return "Success function"
 
@@ -1178,7 +2784,1128 @@ def appendFiles(appendList, timeStep):
 
 
 
+# Change report fields - one row by window of consecutive days with the same change ('Added', 'Removed', 'Changed')
+changeReportFields = ['SiteName', 'TimeSeries', 'Change', 'WindowStart', 'WindowEnd', 'Days', 'PointsBefore', 'PointsAfter']
+
+
+# Change detection file for a site and time series (i.e. 'Fingerprint.csv', 'Points.json.gz', 'FetchState.json') in the 'changeDirectory'
+def changeFile(site, timeSeries, suffix):
+
+    if not os.path.exists(changeDirectory):
+        os.makedirs(changeDirectory)
+    return os.path.join(changeDirectory, str(site) + "_" + str(timeSeries) + "_" + suffix)
+
+
+# Block hash fingerprint of the series - one block per day (local DateTime) with the point count and an order independent hash
+# (sum of the row hashes) of the DateTime, Value, GradeCode and ApprovalCode of the points in the day
+# Output: dataframe with Day, PointCount, BlockHash
+def blockFingerprint(dfRawFinal):
+
+    fields = [field for field in ['DateTime', 'Value', 'GradeCode', 'ApprovalCode'] if field in dfRawFinal.columns]
+    dfFields = dfRawFinal[fields].astype(str)
+    # Blank codes (missing values of the 'Compact' integer codes) hashed as the blank text of the Standard codes
+    for field in ['GradeCode', 'ApprovalCode']:
+        if field in fields:
+            dfFields.loc[dfRawFinal[field].isna().values, field] = ''
+    rowHash = pd.util.hash_pandas_object(dfFields, index=False).values.view('int64')
+    dayValues = dfRawFinal['DateTime'].values.astype('datetime64[D]')
+
+    dfFingerprint = pd.DataFrame({'Day': dayValues, 'RowHash': rowHash}).groupby('Day').agg(PointCount=('RowHash', 'size'), BlockHash=('RowHash', 'sum'))
+    return dfFingerprint.reset_index()
+
+
+# Compare the block hash fingerprint of the series to the fingerprint from the last run and stage the new fingerprint (saved when the unit is committed).
+# Days are 'Added' (no block in the last run), 'Removed' (no block in this run) or 'Changed' (block hash differs) - consecutive days
+# (with data in either run) with the same change are reported as one window. No rows on the first run.
+# Output: list of change report rows, list of the staged change detection files (see commitChangeFiles)
+def changeReport(dfRawFinal, site, timeSeries):
+    try:
+
+        dfFingerprint = blockFingerprint(dfRawFinal)
+        fingerprintFile = changeFile(site, timeSeries, "Fingerprint.csv")
+
+        reportRows = []
+        if os.path.exists(fingerprintFile):
+            dfPrevFingerprint = pd.read_csv(fingerprintFile, parse_dates=['Day'])
+            dfCompare = dfPrevFingerprint.merge(dfFingerprint, on='Day', how='outer', suffixes=('Before', 'After'), indicator=True).sort_values('Day')
+
+            change = np.where(dfCompare['_merge'] == 'right_only', 'Added',
+                              np.where(dfCompare['_merge'] == 'left_only', 'Removed',
+                                       np.where(dfCompare['BlockHashBefore'] != dfCompare['BlockHashAfter'], 'Changed', '')))
+            dfCompare['Change'] = change
+
+            # Window - run of consecutive days with the same change
+            windowId = np.cumsum(np.concatenate([[True], change[1:] != change[:-1]]))
+            dfChanged = dfCompare[change != '']
+            for windowNumber, dfWindow in dfChanged.groupby(windowId[change != ''], sort=True):
+                reportRows.append([site, timeSeries, dfWindow['Change'].iloc[0],
+                                   dfWindow['Day'].min().strftime('%Y-%m-%d'), dfWindow['Day'].max().strftime('%Y-%m-%d'), dfWindow.shape[0],
+                                   int(dfWindow['PointCountBefore'].fillna(0).sum()), int(dfWindow['PointCountAfter'].fillna(0).sum())])
+
+        dfFingerprint.to_csv(fingerprintFile + ".pending", index=False)
+
+        if len(reportRows) > 0:
+            messageTime = timeFun()
+            scriptMsg = "Changed Windows - " + str(site) + " - " + str(timeSeries) + " - " + "; ".join(row[2] + " " + row[3] + " to " + row[4] for row in reportRows) + " - " + messageTime
+            print(scriptMsg)
+            logFile = open(logFileName, "a")
+            logFile.write(scriptMsg + "\n")
+            logFile.close()
+
+        return "success function", reportRows, [fingerprintFile]
+
+    except:
+
+        messageTime = timeFun()
+        print("Error on changeReport Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'changeReport'"
+
+
+# Fetch the series re-fetching only the points in the changed windows. The metadata (grades, approvals, notes) is fetched in full
+# ('MetadataOnly'), the points are fetched ('PointsOnly' with queryFrom/queryTo) for the windows of corrections applied since the last fetch
+# (Publish 'GetCorrectionList') and the window from the last point on (new points). Points outside the windows are reused from the
+# last fetch. A full fetch is made on the first run and every 'windowedFetchFullDays' days. The points and fetch state are staged (saved when the unit is committed).
+# Output: dictionary as returned by getTimeSeriesCorrectedData (all points), list of the staged change detection files (see commitChangeFiles)
+def fetchChangedWindows(timeseries, timeSeriesId, site, timeSeries):
+    try:
+
+        pointsFile = changeFile(site, timeSeries, "Points.json.gz")
+        stateFile = changeFile(site, timeSeries, "FetchState.json")
+        fetchTimeUtc = pd.Timestamp.now(tz='UTC')
+
+        # Points from the last fetch - not used when the last full fetch is more than 'windowedFetchFullDays' days old
+        fetchState = None
+        points = []
+        if os.path.exists(stateFile) and os.path.exists(pointsFile):
+            stateJson = open(stateFile, "r")
+            fetchState = json.load(stateJson)
+            stateJson.close()
+            if fetchTimeUtc - pd.Timestamp(fetchState['FullFetchTimeUtc']) <= pd.Timedelta(days=windowedFetchFullDays):
+                pointsZip = gzip.open(pointsFile, "rt")
+                points = json.load(pointsZip)
+                pointsZip.close()
+
+        if len(points) == 0:
+            # Full fetch
+            timeseriesData = timedCall('getTimeSeriesCorrectedData', timeSeries, timeseries.getTimeSeriesCorrectedData, timeSeriesId)
+            countPoints('getTimeSeriesCorrectedData', timeSeries, len(timeseriesData['Points']))
+            fetchState = {'FullFetchTimeUtc': fetchTimeUtc.isoformat()}
+            pointsChanged = True
+            windowText = "Full Fetch"
+
+        else:
+            lastFetchTimeUtc = pd.Timestamp(fetchState['FetchTimeUtc'])
+            timeseriesData = timedCall('getTimeSeriesCorrectedData', timeSeries, timeseries.getTimeSeriesCorrectedData, timeSeriesId, getParts='MetadataOnly')
+
+            # Windows - corrections applied since the last fetch and the last point on
+            windows = []
+            corrections = timedCall('GetCorrectionList', timeSeries, timeseries.publish.get, '/GetCorrectionList', params={'TimeSeriesUniqueId': timeSeriesId}).json().get('Corrections', [])
+            for correction in corrections:
+                if pd.Timestamp(correction['AppliedTimeUtc']) >= lastFetchTimeUtc:
+                    windows.append([pd.Timestamp(correction['StartTime']), pd.Timestamp(correction['EndTime'])])
+            pointTimes = pd.to_datetime(pd.Series([point['Timestamp'] for point in points], dtype=object), utc=True)
+            windows.append([pointTimes.max(), None])
+
+            # Merge the overlapping windows
+            windows.sort(key=lambda window: window[0])
+            mergedWindows = []
+            for windowStart, windowEnd in windows:
+                if len(mergedWindows) > 0 and (mergedWindows[-1][1] is None or windowStart <= mergedWindows[-1][1]):
+                    if mergedWindows[-1][1] is not None:
+                        mergedWindows[-1][1] = None if windowEnd is None else max(mergedWindows[-1][1], windowEnd)
+                else:
+                    mergedWindows.append([windowStart, windowEnd])
+
+            # Replace the points in the windows with the fetched points (window start and end inclusive)
+            keepMask = np.ones(len(points), dtype=bool)
+            windowPoints = []
+            for windowStart, windowEnd in mergedWindows:
+                inWindow = (pointTimes >= windowStart).values
+                if windowEnd is not None:
+                    inWindow &= (pointTimes <= windowEnd).values
+                keepMask &= ~inWindow
+                windowData = timedCall('getTimeSeriesCorrectedData', timeSeries, timeseries.getTimeSeriesCorrectedData, timeSeriesId, queryFrom=windowStart.isoformat(),
+                                       getParts='PointsOnly', queryTo=None if windowEnd is None else windowEnd.isoformat())
+                countPoints('getTimeSeriesCorrectedData', timeSeries, len(windowData['Points']))
+                windowPoints.extend(windowData['Points'])
+
+            pointsChanged = len(windowPoints) != int((~keepMask).sum()) or json.dumps(windowPoints, sort_keys=True) != \
+                json.dumps([point for point, keep in zip(points, keepMask) if not keep], sort_keys=True)
+            mergedPoints = [point for point, keep in zip(points, keepMask) if keep] + windowPoints
+            mergedTimes = pd.to_datetime(pd.Series([point['Timestamp'] for point in mergedPoints], dtype=object), utc=True)
+            timeseriesData['Points'] = [mergedPoints[index] for index in np.argsort(mergedTimes.values, kind='mergesort')]
+            windowText = str(len(mergedWindows)) + " Windows (" + ", ".join(str(windowStart) + " to " + str(windowEnd) for windowStart, windowEnd in mergedWindows) + \
+                         ") - " + str(len(windowPoints)) + " of " + str(len(timeseriesData['Points'])) + " Points Fetched"
+
+        # Stage the points (when changed) and the fetch time
+        stagedFiles = [stateFile]
+        if pointsChanged:
+            pointsZip = gzip.open(pointsFile + ".pending", "wt")
+            json.dump(timeseriesData['Points'], pointsZip)
+            pointsZip.close()
+            stagedFiles.append(pointsFile)
+        fetchState['FetchTimeUtc'] = fetchTimeUtc.isoformat()
+        stateJson = open(stateFile + ".pending", "w")
+        json.dump(fetchState, stateJson)
+        stateJson.close()
+
+        messageTime = timeFun()
+        scriptMsg = "Windowed Fetch - " + str(site) + " - " + str(timeSeries) + " - " + windowText + " - " + messageTime
+        print(scriptMsg)
+        logFile = open(logFileName, "a")
+        logFile.write(scriptMsg + "\n")
+        logFile.close()
+
+        return "success function", timeseriesData, stagedFiles
+
+    except:
+
+        messageTime = timeFun()
+        print("Error on fetchChangedWindows Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'fetchChangedWindows'"
+
+
+# Save the change detection files staged by a unit ('.pending' files written by changeReport and fetchChangedWindows) - called when the unit is committed
+# so a failed or interrupted unit is compared to the files of the last committed run on the retry or resume
+def commitChangeFiles(changeFiles):
+
+    for stagedFile in changeFiles:
+        if os.path.exists(stagedFile + ".pending"):
+            os.replace(stagedFile + ".pending", stagedFile)
+
+
+# Remove the change detection files staged by a failed unit
+def discardChangeFiles(changeFiles):
+
+    for stagedFile in changeFiles:
+        if os.path.exists(stagedFile + ".pending"):
+            os.remove(stagedFile + ".pending")
+
+
+# Export date window of a service job (ISO-8601 time stamps i.e. '2021-06-01T00:00:00-07:00') - None fetches all points
+queryFrom = None
+queryTo = None
+
+
+# Date window ('queryFrom'/'queryTo') as getTimeSeriesCorrectedData/getTimeSeriesData keyword arguments - none when not defined
+def queryWindow():
+
+    return {name: value for name, value in [('queryFrom', queryFrom), ('queryTo', queryTo)] if value is not None}
+
+
+# Fetch the corrected points and metadata of a series in the date window ('queryWindow'). Service jobs (session) reuse the series fetched by the worker
+# in the last 'serviceCacheSeconds' - the most recently used 'serviceCacheSeries' series are kept
+def fetchSeriesData(timeseries, timeSeriesId, timeSeries, session=None):
+
+    cacheKey = json.dumps([timeSeriesId, queryWindow()], sort_keys=True)
+    if session is not None:
+        cacheEntry = session['SeriesCache'].get(cacheKey)
+        if cacheEntry is not None and time.time() - cacheEntry[0] <= serviceCacheSeconds:
+            session['SeriesCache'].move_to_end(cacheKey)
+            session['SeriesCacheHits'] += 1
+            return cacheEntry[1]
+
+    timeseriesData = timedCall('getTimeSeriesCorrectedData', timeSeries, timeseries.getTimeSeriesCorrectedData, timeSeriesId, **queryWindow())
+    countPoints('getTimeSeriesCorrectedData', timeSeries, len(timeseriesData['Points']))
+
+    if session is not None:
+        session['SeriesCache'][cacheKey] = [time.time(), timeseriesData]
+        session['SeriesCache'].move_to_end(cacheKey)
+        while len(session['SeriesCache']) > serviceCacheSeries:
+            session['SeriesCache'].popitem(last=False)
+    return timeseriesData
+
+
+# Define the export manifest file - by shard for sharded runs so concurrent workers don't share a manifest
+def manifestFile():
+
+    shardSuffix = "_Shard" + str(shardIndex) + "of" + str(shardCount) if shardCount > 1 else ""
+    return os.path.join(workspace, outFileName + "_ExportManifest" + shardSuffix + ".csv")
+
+
+# Load the export manifest - output: dictionary by manifest key ('Site|Time Series' or 'AllSites|Time Step') with the InputHash, CodeHash and OutputFiles
+def loadManifest():
+
+    manifest = {}
+    if os.path.exists(manifestFile()):
+        dfManifest = pd.read_csv(manifestFile(), dtype=str, keep_default_na=False)
+        for row in dfManifest.itertuples(index=False):
+            manifest[row.ManifestKey] = {'InputHash': row.InputHash, 'CodeHash': row.CodeHash, 'OutputFiles': json.loads(row.OutputFiles)}
+    return manifest
+
+
+# Export the manifest
+def saveManifest(manifest):
+
+    dfManifest = pd.DataFrame([[key, value['InputHash'], value['CodeHash'], json.dumps(value['OutputFiles'])] for key, value in manifest.items()],
+                              columns=['ManifestKey', 'InputHash', 'CodeHash', 'OutputFiles'])
+    dfManifest.to_csv(manifestFile(), index=False)
+
+
+# Check if the manifest entry has the same input and code hash and all the output files exist
+def manifestUnchanged(manifest, manifestKey, inputHash, codeHash):
+
+    entry = manifest.get(manifestKey)
+    if entry is None or entry['InputHash'] != inputHash or entry['CodeHash'] != codeHash:
+        return False
+    return all(os.path.exists(outputFile) for outputFile in entry['OutputFiles'].values())
+
+
+# Add the output files of a unit (manifest 'OutputFiles' by time step) to the output file lists appended to the '_AllSites_' files
+def addOutputFiles(outputFiles, outputLists, calendarLists):
+
+    for timeStep, outputFile in outputFiles.items():
+        if timeStep.lower() in outputLists:
+            outputLists[timeStep.lower()].append(outputFile)
+        else:
+            calendarLists.setdefault(timeStep, []).append(outputFile)
+
+
+# Failed stage of a unit (site and time series) in 'main' - the unit outputs are rolled back and the unit retried (see 'unitRetries')
+class UnitFailedError(Exception):
+    pass
+
+
+# Run checkpoint - units completed in the run ('Site|Time Series': time series unique id, 'Site|Wide': output file), failed units, the change report rows
+# of the completed units (reported again when resuming) and the code version hash
+runCheckpoint = None
+
+
+# Define the run checkpoint file - by shard for sharded runs
+def checkpointFile():
+
+    shardSuffix = "_Shard" + str(shardIndex) + "of" + str(shardCount) if shardCount > 1 else ""
+    return os.path.join(workspace, outFileName + "_Checkpoint" + shardSuffix + ".json")
+
+
+# Start the run checkpoint - with 'resumeRun' ('--resume') the checkpoint of the interrupted run is continued when the code version is unchanged
+# Output: units completed in the interrupted run (empty when not resuming)
+def startCheckpoint(codeHash):
+
+    global runCheckpoint
+    completedUnits = {}
+    completedChangeRows = {}
+    if resumeRun:
+        if os.path.exists(checkpointFile()):
+            checkpointJson = open(checkpointFile(), "r")
+            lastCheckpoint = json.load(checkpointJson)
+            checkpointJson.close()
+            if lastCheckpoint['CodeHash'] == codeHash:
+                completedUnits = lastCheckpoint['Completed']
+                completedChangeRows = {unitKey: rows for unitKey, rows in lastCheckpoint.get('ChangeRows', {}).items() if unitKey in completedUnits}
+                resumeText = str(len(completedUnits)) + " Completed Units - " + str(len(lastCheckpoint['Failed'])) + " Failed Units Retried"
+            else:
+                resumeText = "Code version changed since the checkpoint - all units processed"
+        else:
+            resumeText = "No checkpoint - all units processed"
+
+        messageTime = timeFun()
+        scriptMsg = "Resume - " + checkpointFile() + " - " + resumeText + " - " + messageTime
+        print(scriptMsg)
+        logFile = open(logFileName, "a")
+        logFile.write(scriptMsg + "\n")
+        logFile.close()
+
+    runCheckpoint = {'CodeHash': codeHash, 'StartTime': timeFun(), 'Completed': dict(completedUnits), 'Failed': {}, 'ChangeRows': completedChangeRows}
+    saveCheckpoint()
+    return completedUnits
+
+
+# Mark a unit completed (value - time series unique id or Wide output file, 'changeRows' - change report rows of the unit) or failed ('error')
+# in the run checkpoint and save the checkpoint
+def markCheckpoint(unitKey, value=None, error=None, changeRows=None):
+
+    if runCheckpoint is None:
+        return
+    if error is None:
+        runCheckpoint['Completed'][unitKey] = value
+        runCheckpoint['Failed'].pop(unitKey, None)
+        if changeRows:
+            runCheckpoint['ChangeRows'][unitKey] = changeRows
+    else:
+        runCheckpoint['Completed'].pop(unitKey, None)
+        runCheckpoint['ChangeRows'].pop(unitKey, None)
+        runCheckpoint['Failed'][unitKey] = error
+    saveCheckpoint()
+
+
+# Export the run checkpoint - written to a temporary file and renamed so an interrupted run never leaves a partial checkpoint
+def saveCheckpoint():
+
+    if not os.path.exists(workspace):
+        os.makedirs(workspace)
+    tempFile = checkpointFile() + ".tmp"
+    checkpointJson = open(tempFile, "w")
+    json.dump(runCheckpoint, checkpointJson, indent=1)
+    checkpointJson.close()
+    os.replace(tempFile, checkpointFile())
+
+
+# Remove the run checkpoint - all units completed
+def removeCheckpoint():
+
+    global runCheckpoint
+    runCheckpoint = None
+    if os.path.exists(checkpointFile()):
+        os.remove(checkpointFile())
+
+
+# Fields of the getTimeSeriesCorrectedData response hashed for the export manifest - the response envelope (ResponseTime, ResponseVersion) differs on every request
+seriesHashFields = ['Points', 'Grades', 'Approvals', 'Notes', 'Qualifiers', 'Methods', 'GapTolerances', 'InterpolationTypes',
+                    'UniqueId', 'Parameter', 'Label', 'LocationIdentifier', 'Unit', 'UtcOffset', 'UtcOffsetIsoDuration']
+
+
+# Hash of the fetched time series points and metadata ('seriesHashFields') and the site UTC offset
+def seriesInputHash(timeseriesData, utcOffset=None):
+
+    hashData = {field: timeseriesData.get(field) for field in seriesHashFields}
+    return hashlib.sha256(json.dumps([hashData, utcOffset], sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+# Hash of the files (path, size and modified time) appended to an '_AllSites_' file
+def filesHash(fileList):
+
+    fileStats = [[file, os.path.getsize(file), os.stat(file).st_mtime_ns] if os.path.exists(file) else [file] for file in fileList]
+    return hashlib.sha256(json.dumps(fileStats).encode('utf-8')).hexdigest()
+
+
+# Code version hash - this script and the parameters defining the outputs. A change in either reprocesses all series.
+def codeVersionHash():
+
+    scriptFile = open(os.path.abspath(__file__), 'rb')
+    scriptBytes = scriptFile.read()
+    scriptFile.close()
+    parameters = [siteUtcOffsetField, gapStatistics, timeStepList, waterYearStartMonth, seasonTable, rollingWindowDays, wideAlignment, wideTolerance, labelEncoding, quantileMode,
+                  quantileList, quantileSketchSize, exportDatabase, outputCompression, protocol, outFileName, outDirectory]
+    return hashlib.sha256(scriptBytes + json.dumps(parameters, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+# Per site output file suffix as defined in 'outputCompression'
+def outputSuffix():
+
+    return {'gzip': '.csv.gz', 'zstd': '.csv.zst'}.get(outputCompression.lower(), '.csv')
+
+
+# Split an output file into the base name and suffix (i.e. '.csv', '.csv.gz') - the label files of a Raw export use the suffix of the points file
+def splitOutputFile(outFull):
+
+    for suffix in ['.csv.gz', '.csv.zst', '.csv']:
+        if outFull.lower().endswith(suffix):
+            return outFull[:-len(suffix)], outFull[-len(suffix):]
+    return os.path.splitext(outFull)
+
+
+# Background output writer - output files queued by 'writeOutput' are compressed and written on 'writerThreads' threads
+writerPool = None
+writerSlots = None
+writerFutures = []
+writtenFiles = []   # Output files queued or written in the run - [output file, writer future (None - written in the main loop)]
+manifestQueue = []   # Manifest entries waiting on queued output files - [manifestKey, entry, futures, checkpointValue, unit change files and rows]
+failedWrites = set()   # Failed writer futures - the unit is failed with the first queued manifest entry waiting on the future
+failedEntries = []   # Manifest entries of the units failed on a write - [manifestKey, entry, checkpointValue, unit change files and rows], see rollbackFailedWrites
+writerWaits = 0   # Number of times processing waited on a full writer queue
+
+
+# Start the background output writer - no threads when 'writerThreads' is 0
+def startOutputWriter():
+
+    global writerPool, writerSlots, writerFutures, writtenFiles, manifestQueue, failedWrites, failedEntries, writerWaits
+    writerPool = concurrent.futures.ThreadPoolExecutor(max_workers=writerThreads, thread_name_prefix="OutputWriter") if writerThreads > 0 else None
+    writerSlots = threading.BoundedSemaphore(max(writerQueueSize, 1))
+    writerFutures = []
+    writtenFiles = []
+    manifestQueue = []
+    failedWrites = set()
+    failedEntries = []
+    writerWaits = 0
+
+
+# Queue a dataframe to be written to the output file - waits when 'writerQueueSize' files are queued (backpressure).
+# Written in the main loop when the writer is not started or 'writerThreads' is 0. The frame must not be modified once queued.
+def writeOutput(dfOutput, outFull):
+
+    global writerWaits
+    if writerPool is None:
+        writtenFiles.append([outFull, None])
+        writeOutputFile(dfOutput, outFull)
+        return
+
+    if not writerSlots.acquire(blocking=False):
+        writerWaits += 1
+        writerSlots.acquire()
+    future = writerPool.submit(writeOutputFile, dfOutput, outFull)
+    future.add_done_callback(lambda doneFuture: writerSlots.release())
+    writerFutures.append(future)
+    writtenFiles.append([outFull, future])
+
+
+# Discard the outputs of a failed unit attempt - the writes queued since 'writtenMark' (length of 'writtenFiles' at the start of the attempt) are
+# cancelled or waited on and the files removed, the queued manifest entries of the unit are removed
+def discardOutputs(writtenMark, manifestKey):
+
+    attemptFiles = writtenFiles[writtenMark:]
+    attemptFutures = [future for outFull, future in attemptFiles if future is not None]
+    for future in attemptFutures:
+        future.cancel()
+    concurrent.futures.wait(attemptFutures)
+    writerFutures[:] = [future for future in writerFutures if future not in attemptFutures]
+    for outFull, future in attemptFiles:
+        if os.path.exists(outFull):
+            os.remove(outFull)
+    del writtenFiles[writtenMark:]
+    manifestQueue[:] = [queued for queued in manifestQueue if queued[0] != manifestKey]
+
+
+# Check the writes queued since 'writtenMark' (length of 'writtenFiles' at the start of a unit attempt) for a failed output file - once written
+def attemptWritesFailed(writtenMark):
+
+    return any(future is not None and future.done() and future.exception() is not None for outFull, future in writtenFiles[writtenMark:])
+
+
+# Roll back the units failed on a write once their attempt completed (see commitManifest) - the unit output files are removed (the manifest entry of the
+# last run no longer matches) and dropped from the output file lists ('outputLists', 'calendarLists', 'wideList'), the unit change report rows dropped
+# Output: unit keys of the failed units
+def rollbackFailedWrites(outputLists, calendarLists, wideList, changeRows):
+
+    failedKeys = []
+    while len(failedEntries) > 0:
+        manifestKey, entry, checkpointValue, unitChange = failedEntries.pop(0)
+        if manifestKey.startswith("AllSites|"):
+            continue
+        unitFiles = set(entry['OutputFiles'].values()) if entry is not None else {checkpointValue}
+        for outputList in list(outputLists.values()) + list(calendarLists.values()) + [wideList]:
+            outputList[:] = [outFull for outFull in outputList if outFull not in unitFiles]
+        for outFull in unitFiles:
+            if os.path.exists(outFull):
+                os.remove(outFull)
+        unitRows = [id(row) for row in unitChange['Rows']]
+        changeRows[:] = [row for row in changeRows if id(row) not in unitRows]
+        failedKeys.append(manifestKey)
+    return failedKeys
+
+
+# Write the dataframe to a temporary file and rename to the output file - a partial file is never left in place of the output file.
+# Compression is defined by the output file suffix ('.gz' - gzip via pandas, '.zst' - zstd stream of the zstandard package)
+def writeOutputFile(dfOutput, outFull):
+
+    tempFile = outFull + ".tmp"
+    try:
+        if outFull.lower().endswith('.zst'):
+            import zstandard
+            with open(tempFile, 'wb') as compressedFile:
+                textFile = io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(compressedFile), encoding='utf-8', newline='')
+                dfOutput.to_csv(textFile, index=False)
+                textFile.close()
+        else:
+            dfOutput.to_csv(tempFile, index=False, compression='gzip' if outFull.lower().endswith('.gz') else None)
+        os.replace(tempFile, outFull)
+    finally:
+        if os.path.exists(tempFile):
+            os.remove(tempFile)
+
+
+# Read a per site output file ('.csv', '.csv.gz' or '.csv.zst' - see writeOutputFile) - 'readOptions' as pandas read_csv
+def readOutputFile(outFull, **readOptions):
+
+    if outFull.lower().endswith('.zst'):
+        import zstandard
+        with open(outFull, 'rb') as compressedFile:
+            return pd.read_csv(io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(compressedFile), encoding='utf-8'), **readOptions)
+    return pd.read_csv(outFull, **readOptions)
+
+
+# Queue the manifest entry of a series - saved once the output files queued up to now are written. The unit ('Site|Time Series' or 'Site|Wide') is then
+# marked completed in the run checkpoint with the 'checkpointValue' (time series unique id or Wide output file) and the change detection files staged
+# by the unit are saved ('unitChange' - {'Files': staged files, 'Rows': change report rows}). Entry None - checkpoint only
+def queueManifest(manifest, manifestKey, entry, checkpointValue=None, unitChange=None):
+
+    manifestQueue.append([manifestKey, entry, list(writerFutures), checkpointValue, unitChange])
+    commitManifest(manifest)
+
+
+# Save the queued manifest entries whose output files are written (in queue order). An entry waiting on a failed write (not failed with an earlier
+# entry) is removed - the unit is marked failed in the run checkpoint and its staged change detection files are removed
+def commitManifest(manifest):
+
+    committed = False
+    while len(manifestQueue) > 0 and all(future.done() for future in manifestQueue[0][2]):
+        manifestKey, entry, futures, checkpointValue, unitChange = manifestQueue.pop(0)
+        unitChange = {'Files': [], 'Rows': []} if unitChange is None else unitChange
+
+        entryWrites = [future for future in futures if future.exception() is not None and future not in failedWrites]
+        if len(entryWrites) > 0:
+            failedWrites.update(entryWrites)
+            failedEntries.append([manifestKey, entry, checkpointValue, unitChange])
+            discardChangeFiles(unitChange['Files'])
+            if not manifestKey.startswith("AllSites|"):
+                markCheckpoint(manifestKey, error=str(len(entryWrites)) + " Output Files Failed to Write")
+            messageTime = timeFun()
+            scriptMsg = "WARNING - " + manifestKey + " - " + str(len(entryWrites)) + " Output Files Failed to Write - Not Saved to the Manifest - " + messageTime
+            print(scriptMsg)
+            logFile = open(logFileName, "a")
+            logFile.write(scriptMsg + "\n")
+            logFile.close()
+            continue
+
+        commitChangeFiles(unitChange['Files'])
+        if entry is not None:
+            manifest[manifestKey] = entry
+            committed = True
+        if not manifestKey.startswith("AllSites|"):
+            markCheckpoint(manifestKey, checkpointValue, changeRows=unitChange['Rows'])
+    if committed:
+        saveManifest(manifest)
+
+
+# Wait for the queued output files and save the queued manifest entries - called before the per site files are read (database load, append)
+def flushOutputWriter(manifest):
+    try:
+
+        concurrent.futures.wait(writerFutures)
+        failedFutures = [future for future in writerFutures if future.exception() is not None]
+        for future in failedFutures:
+            traceback.print_exception(type(future.exception()), future.exception(), future.exception().__traceback__, file=sys.stdout)
+        del writerFutures[:]
+
+        commitManifest(manifest)
+
+        if len(failedFutures) > 0:
+            messageTime = timeFun()
+            scriptMsg = "WARNING - " + str(len(failedFutures)) + " Output Files Failed to Write - " + messageTime
+            print(scriptMsg)
+            logFile = open(logFileName, "a")
+            logFile.write(scriptMsg + "\n")
+            logFile.close()
+            return "Failed function - 'flushOutputWriter'"
+
+        return "success function"
+
+    except:
+
+        messageTime = timeFun()
+        print("Error on flushOutputWriter Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'flushOutputWriter'"
+
+
+# Stop the background output writer threads
+def stopOutputWriter():
+
+    global writerPool
+    if writerPool is not None:
+        writerPool.shutdown(wait=True)
+        writerPool = None
+
+
+# Output files by time step for a site and time series - 'Rolling' includes the 'RollingAnnual' file, 'Wide' is by site (not included)
+def seriesOutputFiles(outDirBySite, site, timeSeries):
+
+    outputFiles = {}
+    for timeStep in timeStepList:
+        if timeStep.lower() == 'wide':
+            continue
+        outputFiles[timeStep] = outDirBySite + "\\" + outFileName + "_" + str(site) + "_" + str(timeSeries) + "_" + str(timeStep) + outputSuffix()
+        if timeStep.lower() == 'rolling':
+            outputFiles[timeStep + "Annual"] = outDirBySite + "\\" + outFileName + "_" + str(site) + "_" + str(timeSeries) + "_" + str(timeStep) + "Annual" + outputSuffix()
+    return outputFiles
+
+
+# Define the '_AllSites_' output file for the time step - sharded runs include the shard (i.e. '_AllSites_Shard2of4_Daily.csv')
+def allSitesFile(timeStep):
+
+    if shardCount > 1:
+        return os.path.join(outDirectory, outFileName + "_AllSites_Shard" + str(shardIndex) + "of" + str(shardCount) + "_" + str(timeStep) + ".csv")
+    return os.path.join(outDirectory, outFileName + "_AllSites_" + str(timeStep) + ".csv")
+
+
+# Merge the per shard '_AllSites_' files (i.e. '_AllSites_Shard1of4_Daily.csv') into the '_AllSites_' file by time step
+# Shards are checked as complete via the shard complete file (i.e. '_AllSites_Shard1of4_Complete.txt') exported at the end of each sharded run - the
+# merge fails (no '_AllSites_' files exported) unless all N shards are complete and each shard with sites has its file for every time step.
+def mergeShards():
+    try:
+
+        # Define the shard count and the completed shards (sites by shard from the shard complete file)
+        completeShards = {}
+        for file in glob.glob(os.path.join(outDirectory, outFileName + "_AllSites_Shard*of*_Complete.txt")):
+            match = re.search(r'_AllSites_Shard(\d+)of(\d+)_Complete\.txt$', file)
+            if match is not None:
+                with open(file) as shardFile:
+                    siteText = shardFile.readline().strip().split(" - Sites: ", 1)
+                shardSites = [site for site in siteText[1].split(",") if site != ""] if len(siteText) == 2 else []
+                completeShards.setdefault(int(match.group(2)), {})[int(match.group(1))] = shardSites
+
+        if len(completeShards) == 0:
+            print("WARNING - No completed shards found in " + str(outDirectory))
+            return "Failed function - 'mergeShards'"
+
+        # Shard complete files from runs with a different shard count - the shard count to merge is ambiguous
+        if len(completeShards) > 1:
+            messageTime = timeFun()
+            scriptMsg = "WARNING - Merge Failed - Shard complete files for " + " and ".join(str(count) for count in sorted(completeShards)) + " Shards found in " + str(outDirectory) + " - remove the files of the previous run - " + messageTime
+            print(scriptMsg)
+            logFile = open(logFileName, "a")
+            logFile.write(scriptMsg + "\n")
+            logFile.close()
+            return "Failed function - 'mergeShards'"
+
+        mergeShardCount = max(completeShards)
+        missingShards = sorted(set(range(1, mergeShardCount + 1)) - set(completeShards[mergeShardCount]))
+        if len(missingShards) > 0:
+            messageTime = timeFun()
+            scriptMsg = "WARNING - Merge Failed - " + str(mergeShardCount) + " Shards - Shards " + str(missingShards) + " are not complete - " + messageTime
+            print(scriptMsg)
+            logFile = open(logFileName, "a")
+            logFile.write(scriptMsg + "\n")
+            logFile.close()
+            return "Failed function - 'mergeShards'"
+
+        # Export manifest - merged '_AllSites_' files are skipped when the shard files are unchanged
+        manifest = loadManifest()
+
+        mergeTimeSteps = []
+        for timeStep in timeStepList:
+            mergeTimeSteps.append(timeStep)
+            if timeStep.lower() == 'rolling':
+                mergeTimeSteps.append(timeStep + "Annual")
+        if changeDetection:
+            mergeTimeSteps.append("ChangeReport")
+
+        # Shard files by time step ordered by shard - checked for all time steps before any '_AllSites_' file is exported
+        mergeFiles = {}
+        for timeStep in mergeTimeSteps:
+
+            # Shards without sites don't have a file
+            shardFiles = []
+            for shardNumber in range(1, mergeShardCount + 1):
+                shardFile = os.path.join(outDirectory, outFileName + "_AllSites_Shard" + str(shardNumber) + "of" + str(mergeShardCount) + "_" + str(timeStep) + ".csv")
+                if os.path.exists(shardFile):
+                    shardFiles.append(shardFile)
+                elif len(completeShards[mergeShardCount][shardNumber]) > 0:
+                    messageTime = timeFun()
+                    scriptMsg = "WARNING - Merge Failed - Shard " + str(shardNumber) + " of " + str(mergeShardCount) + " file not found - " + shardFile + " - " + messageTime
+                    print(scriptMsg)
+                    logFile = open(logFileName, "a")
+                    logFile.write(scriptMsg + "\n")
+                    logFile.close()
+                    return "Failed function - 'mergeShards'"
+            mergeFiles[timeStep] = shardFiles
+
+        for timeStep in mergeTimeSteps:
+
+            shardFiles = mergeFiles[timeStep]
+            if len(shardFiles) == 0:
+                print("WARNING - No shard files found for timeStep " + str(timeStep))
+                continue
+
+            outVal = appendFiles(shardFiles, timeStep, manifest)
+            if outVal.lower() != "success function":
+                print("WARNING - Function appendFiles for " + str(timeStep) + " shards failed")
+                return "Failed function - 'mergeShards'"
+
+            messageTime = timeFun()
+            scriptMsg = "Successfully Merged " + str(len(shardFiles)) + " Shard Files - " + str(timeStep) + " - " + messageTime
+            print(scriptMsg)
+            logFile = open(logFileName, "a")
+            logFile.write(scriptMsg + "\n")
+            logFile.close()
+
+        # Export the quantile method and error bound metadata
+        return quantileMetadata(timeStepList)
+
+    except:
+
+        messageTime = timeFun()
+        print("Error on mergeShards Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'mergeShards'"
+
+
+# Service worker state ('serve' command) - Aquarius session, time series id cache, site list and recently fetched series of the worker process
+serviceSession = None
+
+# Parameters set by a service job - restored to the worker values before each job
+serviceJobParameters = ['timeSeriesList', 'timeStepList', 'protocol', 'outDirectory', 'workspace', 'logFileName', 'stateDirectory',
+                        'changeDirectory', 'metricsFile', 'skipUnchanged', 'changeDetection', 'windowedFetch', 'incrementalSummary', 'exportDatabase',
+                        'shardIndex', 'shardCount', 'queryFrom', 'queryTo']
+
+# Time steps accepted in a service job
+serviceTimeSteps = ['raw', 'daily', 'weekly', 'monthly', 'yearly', 'wateryear', 'seasonal', 'rolling', 'wide']
+
+
+# Start a service worker process - parameters (as parsed from the command line 'argumentList'), Aquarius session and site list set up once for the
+# life of the worker. A failed connection is retried on the next job.
+def startServiceWorker(argumentList):
+
+    global serviceSession
+    parseArguments(argumentList)
+    serviceSession = {'Timeseries': None, 'IdCache': {}, 'SiteList': None, 'JobSites': None, 'SeriesCache': collections.OrderedDict(), 'SeriesCacheHits': 0,
+                      'Parameters': {name: globals()[name] for name in serviceJobParameters}}
+    try:
+        serviceSession['Timeseries'] = connectAquarius()
+        serviceSession['SiteList'] = readSiteList()
+    except:
+        print("Error on startServiceWorker Function ")
+        traceback.print_exc(file=sys.stdout)
+
+
+# Run an export job on a service worker - sites, time series, time steps and date window of the 'job' exported to the job folder with the worker session.
+# Job outputs are not incremental - 'skipUnchanged', 'changeDetection', 'windowedFetch', 'incrementalSummary' and 'exportDatabase' are off for the job.
+# The session is reconnected on the next job after a failed job.
+# Output: job result dictionary (Status, OutputFiles, StartTime, RunSeconds, Worker, SeriesCacheHits)
+def runServiceJob(job):
+
+    global timeSeriesList, timeStepList, protocol, outDirectory, workspace, logFileName, stateDirectory, changeDirectory, metricsFile, skipUnchanged, changeDetection, windowedFetch, incrementalSummary, exportDatabase, queryFrom, queryTo
+    startTime = time.time()
+    runStart = time.perf_counter()
+    try:
+
+        # Worker parameters overridden by the job
+        globals().update(serviceSession['Parameters'])
+        if job['TimeSeriesList'] is not None:
+            timeSeriesList = job['TimeSeriesList']
+        if job['TimeStepList'] is not None:
+            timeStepList = job['TimeStepList']
+        if job['Protocol'] is not None:
+            protocol = job['Protocol']
+        queryFrom = job['QueryFrom']
+        queryTo = job['QueryTo']
+        skipUnchanged = changeDetection = windowedFetch = incrementalSummary = False
+        exportDatabase = "None"
+
+        # Job folder - outputs and the job workspace (log, metrics)
+        outDirectory = job['JobDirectory']
+        workspace = os.path.join(outDirectory, "workspace")
+        if not os.path.exists(workspace):
+            os.makedirs(workspace)
+        logFileName = workspace + "\\" + outLogFileName + ".LogFile.txt"
+        stateDirectory = workspace + "\\SummaryState"
+        changeDirectory = workspace + "\\ChangeDetection"
+        metricsFile = workspace + "\\" + outLogFileName + "_Metrics.prom"
+
+        if serviceSession['Timeseries'] is None:
+            serviceSession['Timeseries'] = connectAquarius()
+        if serviceSession['SiteList'] is None:
+            serviceSession['SiteList'] = readSiteList()
+
+        # Sites of the job with the site list fields (i.e. UTC offset) - sites not in the site list only have the identifier
+        siteListDf = serviceSession['SiteList']
+        jobSites = job['Sites'] if job['Sites'] is not None else list(siteListDf[siteListIdentifier])
+        dfJobSites = siteListDf.drop_duplicates(siteListIdentifier).set_index(siteListIdentifier, drop=False).reindex(jobSites)
+        dfJobSites[siteListIdentifier] = jobSites
+        serviceSession['JobSites'] = dfJobSites.reset_index(drop=True)
+
+        cacheHits = serviceSession['SeriesCacheHits']
+        outVal = main(serviceSession)
+        stopOutputWriter()
+        if outVal.lower() != "success function" and serviceSession['Timeseries'] is not None:
+            try:
+                serviceSession['Timeseries'].disconnect()
+            except:
+                pass
+            serviceSession['Timeseries'] = None
+
+        # Output files of the job (not the job workspace)
+        outputFiles = []
+        for directory, subDirectories, files in os.walk(outDirectory):
+            outputFiles.extend(os.path.join(directory, file) for file in files)
+        outputFiles = sorted(file for file in outputFiles if not file.startswith(workspace))
+
+        return "success function", {'Status': "Complete" if outVal.lower() == "success function" else "Failed", 'OutputFiles': outputFiles,
+                                    'StartTime': startTime, 'RunSeconds': round(time.perf_counter() - runStart, 3), 'Worker': os.getpid(),
+                                    'SeriesCacheHits': serviceSession['SeriesCacheHits'] - cacheHits}
+
+    except:
+
+        messageTime = timeFun()
+        print("Error on runServiceJob Function ")
+        traceback.print_exc(file=sys.stdout)
+        stopOutputWriter()
+        return "Failed function - 'runServiceJob'"
+
+
+# Define a service job from the request body (JSON) - Sites, TimeSeriesList, TimeStepList (None - the service parameters), QueryFrom, QueryTo (ISO-8601, None - all points)
+# and Protocol. Raises ValueError on an invalid request
+def serviceJob(requestBody):
+
+    job = {}
+    for field in ['Sites', 'TimeSeriesList', 'TimeStepList']:
+        value = requestBody.get(field)
+        if isinstance(value, str):
+            value = [value]
+        if value is not None and (not isinstance(value, list) or len(value) == 0 or not all(isinstance(item, str) for item in value)):
+            raise ValueError(field + " must be a list of names")
+        job[field] = value
+    for timeStep in job['TimeStepList'] or []:
+        if timeStep.lower() not in serviceTimeSteps:
+            raise ValueError("TimeStepList - time step not defined - " + timeStep)
+    for field in ['QueryFrom', 'QueryTo']:
+        value = requestBody.get(field)
+        if value is not None:
+            pd.Timestamp(value)
+        job[field] = value
+    job['Protocol'] = requestBody.get('Protocol')
+    if job['Protocol'] is not None and job['Protocol'] not in ['SEI', 'WEI', 'AVCSS']:
+        raise ValueError("Protocol must be 'SEI', 'WEI' or 'AVCSS'")
+    return job
+
+
+# Export service ('serve' command) - long running local job API (HTTP on 127.0.0.1:'servicePort') with 'serviceWorkers' warm worker processes.
+# POST /jobs - queue an export job (JSON - see 'serviceJob', 'Wait': true responds once the job is finished), GET /jobs/<id> - job status, output files and
+# latency, GET /jobs - all jobs, GET /status - job counts and latency percentiles, POST /shutdown - stop once the queued jobs are finished.
+# Jobs are run in the order queued - per job latency (queued and run seconds) logged and exported to 'ServiceJobs.csv'. Runs until shut down or interrupted (Ctrl+C)
+def runExportService(argumentList=None):
+    try:
+
+        if not os.path.exists(serviceDirectory):
+            os.makedirs(serviceDirectory)
+        serviceStamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        serviceStart = time.time()
+        jobLogFile = os.path.join(serviceDirectory, "ServiceJobs.csv")
+        jobLogFields = ['JobId', 'SubmitTime', 'Status', 'Sites', 'TimeSeriesList', 'TimeStepList', 'QueryFrom', 'QueryTo', 'Worker', 'QueuedSeconds',
+                        'RunSeconds', 'LatencySeconds', 'SeriesCacheHits', 'OutputFiles', 'JobDirectory']
+
+        jobs = {}
+        jobEvents = {}
+        jobLock = threading.Lock()
+
+        # Worker processes - session and site list set up at start (warm for the first job)
+        workerPool = multiprocessing.Pool(serviceWorkers, initializer=startServiceWorker, initargs=(sys.argv[1:] if argumentList is None else argumentList,))
+
+        def finishJob(jobId, outVal, submitTime, submitStart):
+            try:
+                recordJob(jobId, outVal, submitTime, submitStart)
+            except:
+                traceback.print_exc(file=sys.stdout)
+            finally:
+                jobEvents[jobId].set()
+
+        # Job result, latency and job log row
+        def recordJob(jobId, outVal, submitTime, submitStart):
+            with jobLock:
+                jobRecord = jobs[jobId]
+                if isinstance(outVal, tuple) and outVal[0].lower() == "success function":
+                    jobResult = dict(outVal[1])
+                    jobRecord['QueuedSeconds'] = round(max(jobResult.pop('StartTime') - submitTime, 0.0), 3)
+                    jobRecord.update(jobResult)
+                else:
+                    jobRecord['Status'] = "Failed"
+                jobRecord['LatencySeconds'] = round(time.perf_counter() - submitStart, 3)
+
+                scriptMsg = "Service Job " + str(jobId) + " - " + jobRecord['Status'] + " - Latency: " + str(jobRecord['LatencySeconds']) + " Seconds (Queued: " + str(jobRecord['QueuedSeconds']) + \
+                            ", Run: " + str(jobRecord['RunSeconds']) + ") - " + str(len(jobRecord['OutputFiles'])) + " Output Files - Series Cache Hits: " + str(jobRecord['SeriesCacheHits']) + \
+                            " - " + jobRecord['JobDirectory'] + " - " + timeFun()
+                print(scriptMsg)
+                logFile = open(logFileName, "a")
+                logFile.write(scriptMsg + "\n")
+                logFile.close()
+
+                newLog = not os.path.exists(jobLogFile)
+                jobLog = open(jobLogFile, "a", newline='')
+                jobLogWriter = csv.writer(jobLog)
+                if newLog:
+                    jobLogWriter.writerow(jobLogFields)
+                jobLogWriter.writerow([json.dumps(jobRecord[field]) if isinstance(jobRecord[field], list) else ('' if jobRecord[field] is None else jobRecord[field])
+                                       for field in jobLogFields[:-2]] + [len(jobRecord['OutputFiles']), jobRecord['JobDirectory']])
+                jobLog.close()
+
+        def submitJob(job):
+            with jobLock:
+                jobId = len(jobs) + 1
+                submitTime = time.time()
+                job['JobId'] = jobId
+                job['JobDirectory'] = os.path.join(serviceDirectory, "Job_" + serviceStamp + "_" + str(jobId))
+                jobs[jobId] = dict(job, Status="Pending", SubmitTime=timeFun(), Worker=None, QueuedSeconds=None, RunSeconds=None, LatencySeconds=None,
+                                   SeriesCacheHits=0, OutputFiles=[])
+                jobEvents[jobId] = threading.Event()
+            submitStart = time.perf_counter()
+            workerPool.apply_async(runServiceJob, (job,), callback=lambda outVal: finishJob(jobId, outVal, submitTime, submitStart),
+                                   error_callback=lambda error: finishJob(jobId, "Failed function - 'runServiceJob' - " + str(error), submitTime, submitStart))
+            return jobId
+
+        def serviceStatus():
+            with jobLock:
+                latencies = sorted(jobRecord['LatencySeconds'] for jobRecord in jobs.values() if jobRecord['LatencySeconds'] is not None)
+                statusCounts = collections.Counter(jobRecord['Status'] for jobRecord in jobs.values())
+            return {'Workers': serviceWorkers, 'UptimeSeconds': round(time.time() - serviceStart, 1), 'Jobs': dict(statusCounts),
+                    'LatencySeconds': {'P50': latencyPercentile(latencies, 0.5), 'P95': latencyPercentile(latencies, 0.95), 'Max': latencies[-1] if latencies else 0.0}}
+
+        class ServiceRequestHandler(http.server.BaseHTTPRequestHandler):
+
+            def sendJson(self, status, body):
+                payload = json.dumps(body, default=str).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                path = self.path.rstrip('/')
+                if path == '/status':
+                    self.sendJson(200, serviceStatus())
+                elif path == '/jobs':
+                    with jobLock:
+                        self.sendJson(200, [dict(jobRecord) for jobRecord in jobs.values()])
+                elif re.match(r'^/jobs/\d+$', path) and int(path.split('/')[-1]) in jobs:
+                    with jobLock:
+                        self.sendJson(200, dict(jobs[int(path.split('/')[-1])]))
+                else:
+                    self.sendJson(404, {'Error': "Not found - " + self.path})
+
+            def do_POST(self):
+                path = self.path.rstrip('/')
+                if path == '/shutdown':
+                    self.sendJson(200, {'Status': "Shutting down"})
+                    threading.Thread(target=httpServer.shutdown, daemon=True).start()
+                    return
+                if path != '/jobs':
+                    self.sendJson(404, {'Error': "Not found - " + self.path})
+                    return
+                try:
+                    requestBody = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                    job = serviceJob(requestBody)
+                except Exception as error:
+                    self.sendJson(400, {'Error': str(error)})
+                    return
+                jobId = submitJob(job)
+                if requestBody.get('Wait'):
+                    jobEvents[jobId].wait()
+                    with jobLock:
+                        self.sendJson(200, dict(jobs[jobId]))
+                else:
+                    with jobLock:
+                        self.sendJson(202, dict(jobs[jobId]))
+
+            def log_message(self, format, *args):
+                pass
+
+        httpServer = http.server.ThreadingHTTPServer(('127.0.0.1', servicePort), ServiceRequestHandler)
+
+        messageTime = timeFun()
+        scriptMsg = "Export Service - http://127.0.0.1:" + str(servicePort) + " - " + str(serviceWorkers) + " Workers - " + serviceDirectory + " - " + messageTime
+        print(scriptMsg)
+        logFile = open(logFileName, "a")
+        logFile.write(scriptMsg + "\n")
+        logFile.close()
+
+        try:
+            httpServer.serve_forever()
+            # Shut down - finish the queued jobs
+            workerPool.close()
+            workerPool.join()
+            stopMessage = "Export Service Finished"
+        except KeyboardInterrupt:
+            workerPool.terminate()
+            stopMessage = "Export Service Stopped"
+        httpServer.server_close()
+
+        status = serviceStatus()
+        messageTime = timeFun()
+        scriptMsg = stopMessage + " - " + str(len(jobs)) + " Jobs - Latency (Seconds) P50: " + str(status['LatencySeconds']['P50']) + " - P95: " + str(status['LatencySeconds']['P95']) + " - " + messageTime
+        print(scriptMsg)
+        logFile = open(logFileName, "a")
+        logFile.write(scriptMsg + "\n")
+        logFile.close()
+
+        return "success function", status
+
+    except:
+
+        messageTime = timeFun()
+        print("Error on runExportService Function ")
+        traceback.print_exc(file=sys.stdout)
+        return "Failed function - 'runExportService'"
+
+
+# Parse the command line options - options not defined default to the parameters defined at the start of the script
+def parseArguments(argumentList=None):
+
+    global siteListFile, timeSeriesList, timeStepList, protocol, outFileName, outDirectory, workspace, logFileName, stateDirectory, changeDirectory, metricsFile, shardIndex, shardCount, exportDatabase, profileMode, frameMemoryMode, servicePort, serviceWorkers, serviceDirectory, resumeRun
+
+    parser = argparse.ArgumentParser(description="Export and summarize Aquarius Time Series by site and time step.")
+    parser.add_argument('command', nargs='?', default='export', choices=['export', 'merge', 'benchmark', 'serve'],
+                        help="'export' - export the sites (in the shard), 'merge' - combine the per shard '_AllSites_' files, 'benchmark' - benchmark the database queries, 'serve' - run the export service (local job API)")
+    parser.add_argument('--siteListFile', help="Excel or CSV with the Sites/Locations to be processed")
+    parser.add_argument('--timeSeriesList', nargs='+', help="Time series to be processed")
+    parser.add_argument('--timeStepList', nargs='+', help="Time steps to be processed")
+    parser.add_argument('--protocol', choices=['SEI', 'WEI', 'AVCSS'])
+    parser.add_argument('--outFileName', help="Output dataset file name prefix")
+    parser.add_argument('--outDirectory', help="Output directory")
+    parser.add_argument('--workspace', help="Workspace for processing (log file and state)")
+    parser.add_argument('--exportDatabase', choices=['None', 'SQLite', 'DuckDB'], help="Load the outputs to an embedded database (one per protocol)")
+    parser.add_argument('--frameMemoryMode', choices=['Standard', 'Compact'], help="Dtypes of the Raw frame - 'Compact' categorical labels and small integer codes")
+
+    parser.add_argument('--shard', type=parseShard, help="Process shard i of N (i.e. 2/4) - sites are split across shards by a hash of the site name")
+    parser.add_argument('--resume', action='store_true', help="Resume the interrupted run from the run checkpoint - completed units are not fetched or reprocessed")
+    parser.add_argument('--servicePort', type=int, help="Local port of the export service job API ('serve')")
+    parser.add_argument('--serviceWorkers', type=int, help="Number of export service worker processes ('serve')")
+    parser.add_argument('--profile', action='store_true', help="Profile the export run - time by stage, flame graph and top allocations files in the workspace")
+    parser.add_argument('--profileMode', choices=['Sample', 'Deterministic'], help="'Sample' - stack sampling (flame graph files), 'Deterministic' - cProfile")
+    args = parser.parse_args(argumentList)
+
+    if args.siteListFile is not None:
+        siteListFile = args.siteListFile
+    if args.timeSeriesList is not None:
+        timeSeriesList = args.timeSeriesList
+    if args.timeStepList is not None:
+        timeStepList = args.timeStepList
+    if args.protocol is not None:
+        protocol = args.protocol
+    if args.outFileName is not None:
+        outFileName = args.outFileName
+    if args.outDirectory is not None:
+        outDirectory = args.outDirectory
+        serviceDirectory = outDirectory + "\\ServiceJobs"
+    if args.workspace is not None:
+        workspace = args.workspace
+        stateDirectory = workspace + "\\SummaryState"
+        changeDirectory = workspace + "\\ChangeDetection"
+        metricsFile = workspace + "\\" + outLogFileName + "_Metrics.prom"
+    if args.exportDatabase is not None:
+        exportDatabase = args.exportDatabase
+    if args.frameMemoryMode is not None:
+        frameMemoryMode = args.frameMemoryMode
+
+    if args.shard is not None:
+        shardIndex, shardCount = args.shard
+    if args.profileMode is not None:
+        profileMode = args.profileMode
+    if args.resume:
+        resumeRun = True
+    if args.servicePort is not None:
+        servicePort = args.servicePort
+    if args.serviceWorkers is not None:
+        serviceWorkers = args.serviceWorkers
+
+    # Log and metrics files by shard so concurrent workers don't share a log file
+    if shardCount > 1:
+        logFileName = workspace + "\\" + outLogFileName + "_Shard" + str(shardIndex) + "of" + str(shardCount) + ".LogFile.txt"
+        metricsFile = workspace + "\\" + outLogFileName + "_Shard" + str(shardIndex) + "of" + str(shardCount) + "_Metrics.prom"
+    elif args.workspace is not None:
+        logFileName = workspace + "\\" + outLogFileName + ".LogFile.txt"
+
+    return args
 
 
 if __name__ == '__main__':
-    main()
+    args = parseArguments()
+    if args.command == 'merge':
+        # Failed merge (i.e. shards not complete) - exit with an error status so the workflow running the shards doesn't continue
+        if mergeShards().lower() != "success function":
+            sys.exit(1)
+    elif args.command == 'benchmark':
+        benchmarkDatabase()
+
+    elif args.command == 'serve':
+        runExportService(sys.argv[1:])
+    elif args.profile:
+        # Profile the run - output files in the workspace (by shard)
+        outVal = profileRun(main, profileMode, logFileName.replace(".LogFile.txt", "_Profile"), traceMemory=profileMemory)
+        if outVal[0].lower() != "success function":
+            print("WARNING - Function profileRun Failed")
+        else:
+            print("Profile Exported - " + ", ".join(outVal[1]))
+    else:
+        main()
@@ -0,0 +1,149 @@
+# aquariusFixture.py
+# In-memory stand in for the Aquarius timeseries_client and a helper running the export 'main' on it in a temporary directory.
+# Used by the tests - no connection to Aquarius.
+
+import os, sys, math
+import datetime as dt
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ExportAquariusTimeSeries_Summarize_SEI_WEI_AVCSS as exportScript
+
+
+# Points, grades, approvals and notes of a series - hourly points at -07:00 from 2021-06-01 for 'days' days with a gap of 'gapHours' hours on day 10.
+# 'changedPoint' - index of a point with the value changed (i.e. a correction between two runs)
+def seriesData(site, timeSeries, days=40, gapHours=6, changedPoint=None):
+
+    startTime = dt.datetime(2021, 6, 1)
+    points = []
+    for index in range(days * 24):
+        if 240 <= index < 240 + gapHours:
+            continue
+        value = round(10 + 5 * math.sin(index / 24 * 2 * math.pi) + (index % 7) * 0.125 + (len(site) % 3), 3)
+        if index == changedPoint:
+            value += 1.0
+        pointTime = startTime + dt.timedelta(hours=index)
+        points.append({'Timestamp': pointTime.strftime('%Y-%m-%dT%H:%M:%S.0000000-07:00'), 'Value': {'Numeric': value}})
+
+    firstTime, lastTime = points[0]['Timestamp'], points[-1]['Timestamp']
+    midTime = (startTime + dt.timedelta(days=days // 2)).strftime('%Y-%m-%dT%H:%M:%S.0000000-07:00')
+    return {'Points': points,
+            'Grades': [{'StartTime': '0001-01-01T00:00:00.0000000+00:00', 'EndTime': firstTime, 'GradeCode': 0}, {'StartTime': firstTime, 'EndTime': midTime, 'GradeCode': 31},
+                       {'StartTime': midTime, 'EndTime': lastTime, 'GradeCode': 21}, {'StartTime': lastTime, 'EndTime': '9999-12-31T23:59:59.9999999+00:00', 'GradeCode': 0}],
+            'Approvals': [{'ApprovalLevel': 1200, 'LevelDescription': 'Approved', 'StartTime': '0001-01-01T00:00:00.0000000+00:00', 'EndTime': midTime},
+                          {'ApprovalLevel': 900, 'LevelDescription': 'Working', 'StartTime': midTime, 'EndTime': '9999-12-31T23:59:59.9999999+00:00'}],
+            'Notes': [{'StartTime': firstTime, 'EndTime': midTime, 'NoteText': 'Logger swapped'}],
+            'UniqueId': site + timeSeries, 'Parameter': timeSeries.split('.')[0], 'Unit': 'degC', 'LocationIdentifier': site}
+
+
+class FakeResponse:
+
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+class FakePublish:
+
+    def get(self, url, params=None, **kwargs):
+        if url == '/GetCorrectionList':
+            return FakeResponse({'Corrections': []})
+        raise NotImplementedError(url)
+
+
+# timeseries_client with the series of 'seriesData' - time series unique id is the time series name ('Parameter.Label@Location')
+class FakeTimeseriesClient:
+
+    def __init__(self, seriesOptions=None):
+        self.seriesOptions = seriesOptions or {}
+        self.publish = FakePublish()
+        self.fetchCount = 0
+
+    def getTimeSeriesUniqueId(self, timeSeriesNameFull):
+        return timeSeriesNameFull
+
+    def getTimeSeriesCorrectedData(self, timeSeriesId, queryFrom=None, queryTo=None, getParts=None, includeGapMarkers=None):
+        self.fetchCount += 1
+        timeSeries, site = timeSeriesId.split('@')
+        data = seriesData(site, timeSeries, **self.seriesOptions)
+        if getParts == 'MetadataOnly':
+            data['Points'] = []
+        if queryFrom is not None or queryTo is not None:
+            pointTimes = pd.to_datetime(pd.Series([point['Timestamp'] for point in data['Points']], dtype=object), utc=True)
+            keepMask = pd.Series(True, index=pointTimes.index)
+            if queryFrom is not None:
+                keepMask &= pointTimes >= pd.Timestamp(queryFrom)
+            if queryTo is not None:
+                keepMask &= pointTimes <= pd.Timestamp(queryTo)
+            data['Points'] = [point for point, keep in zip(data['Points'], keepMask) if keep]
+        if getParts == 'PointsOnly':
+            data = {'Points': data['Points']}
+        return data
+
+    def getTimeSeriesData(self, timeSeriesIds, queryFrom=None, queryTo=None, outputUnitIds=None, includeGapMarkers=None):
+        pointsByTime = {}
+        for number, timeSeriesId in enumerate(timeSeriesIds, 1):
+            timeSeries, site = timeSeriesId.split('@')
+            for point in seriesData(site, timeSeries, **self.seriesOptions)['Points']:
+                timePoint = pointsByTime.setdefault(point['Timestamp'], {'Timestamp': point['Timestamp']})
+                timePoint['NumericValue' + str(number)] = point['Value']['Numeric']
+                timePoint['GradeCode' + str(number)] = 31
+        return {'TimeSeries': [{'Identifier': timeSeriesId} for timeSeriesId in timeSeriesIds], 'Points': [pointsByTime[pointTime] for pointTime in sorted(pointsByTime)]}
+
+    def disconnect(self):
+        pass
+
+
+# Run the export 'main' in 'directory' (site list, outputs in 'directory/out', workspace in 'directory/workspace') with the 'parameters' (export
+# script globals) and the fake client - the script globals are restored after the run.
+# Output: main return value, fake client
+def runExport(directory, sites=('ROMO_001', 'GLAC_002'), seriesOptions=None, **parameters):
+
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    siteListFile = os.path.join(directory, "sites.csv")
+    pd.DataFrame({'LocationIdentifier': list(sites)}).to_csv(siteListFile, index=False)
+    workspace = os.path.join(directory, "workspace")
+    runParameters = {'siteListFile': siteListFile, 'outDirectory': os.path.join(directory, "out"), 'workspace': workspace,
+                     'logFileName': os.path.join(workspace, "Test.LogFile.txt"), 'stateDirectory': os.path.join(workspace, "SummaryState"),
+                     'changeDirectory': os.path.join(workspace, "ChangeDetection"),
+                     'metricsFile': os.path.join(workspace, "Test_Metrics.prom"), 'outLogFileName': "Test", 'unitRetrySeconds': 0}
+    runParameters.update(parameters)
+    for folder in [runParameters['outDirectory'], workspace]:
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+    client = FakeTimeseriesClient(seriesOptions)
+    savedParameters = {name: getattr(exportScript, name) for name in list(runParameters) + ['connectAquarius']}
+    try:
+        for name, value in runParameters.items():
+            setattr(exportScript, name, value)
+        exportScript.connectAquarius = lambda: client
+        return exportScript.main(), client
+    finally:
+        for name, value in savedParameters.items():
+            setattr(exportScript, name, value)
+
+
+# Output files of an export run in 'directory' by name relative to the directory - the per site files (Windows '\\' joins) and '_AllSites_' files,
+# workspace files excluded
+def outputFiles(directory):
+
+    files = {}
+    for folder, folderNames, fileNames in os.walk(directory):
+        for fileName in fileNames:
+            relativeName = os.path.relpath(os.path.join(folder, fileName), directory).replace(os.sep, "\\")
+            if not relativeName.startswith("workspace") and relativeName != "sites.csv":
+                files[relativeName] = os.path.join(folder, fileName)
+    return files
+
+
+# Text of the run log
+def logText(directory):
+
+    logFile = open(os.path.join(directory, "workspace", "Test.LogFile.txt"), "r")
+    text = logFile.read()
+    logFile.close()
+    return text
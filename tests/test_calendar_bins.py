@@ -0,0 +1,79 @@
+# test_calendar_bins.py
+# Calendar bins of the summary time steps - bin ordinals ('defineCalendarBins'), labels ('calendarBinLabels'), starts ('calendarBinStarts') and the
+# WaterYear and Seasonal period names ('calendarPeriodNames').
+# Run from the repository directory: python -m unittest discover -s tests
+
+import os, sys, unittest
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from aquariusFixture import exportScript
+
+
+def dateTimes(*values):
+
+    return pd.to_datetime(list(values)).values
+
+
+class CalendarBinsTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.savedParameters = {name: getattr(exportScript, name) for name in ['waterYearStartMonth', 'seasonTable']}
+
+    def tearDown(self):
+
+        for name, value in self.savedParameters.items():
+            setattr(exportScript, name, value)
+
+    def labels(self, values, timeStep):
+
+        binOrdinals = exportScript.defineCalendarBins(values, timeStep)
+        return binOrdinals, [str(label)[:10] for label in exportScript.calendarBinLabels(binOrdinals, timeStep)]
+
+    # Bins match the pandas resample rules the outputs were defined with
+    def test_resample_rules(self):
+
+        values = pd.date_range('2019-12-20', '2021-03-10 23:00', freq='7h').values
+        monthRule = 'ME' if tuple(int(part) for part in pd.__version__.split('.')[:2]) >= (2, 2) else 'M'
+        for timeStep, rule in [('Daily', 'D'), ('Weekly', 'W'), ('Monthly', monthRule), ('Yearly', 'AS' if monthRule == 'M' else 'YS')]:
+            binOrdinals, labels = self.labels(values, timeStep)
+            resampleLabels = pd.Series(1, index=values).resample(rule).sum().index
+            self.assertEqual(sorted(set(labels)), [str(label)[:10] for label in resampleLabels], timeStep)
+
+    # Weeks run Monday to Sunday, labelled with the Sunday ending the week
+    def test_weekly(self):
+
+        binOrdinals, labels = self.labels(dateTimes('2021-06-06 23:59', '2021-06-07 00:00', '2021-06-13 23:00', '2021-06-14 00:00'), 'Weekly')
+        self.assertEqual(labels, ['2021-06-06', '2021-06-13', '2021-06-13', '2021-06-20'])
+        binStarts = exportScript.calendarBinStarts(binOrdinals[1:2], 'Weekly')
+        self.assertEqual(str(binStarts.astype('datetime64[ns]')[0])[:10], '2021-06-07')
+
+    # Water years named by the year of their last month - October start (WY2022 - October 2021 to September 2022) and January start (calendar year)
+    def test_water_year(self):
+
+        values = dateTimes('2021-09-30 23:00', '2021-10-01 00:00', '2022-09-30 23:00', '2021-01-01 00:00', '2021-12-31 23:00')
+        exportScript.waterYearStartMonth = 10
+        binOrdinals, labels = self.labels(values, 'WaterYear')
+        self.assertEqual(labels, ['2020-10-01', '2021-10-01', '2021-10-01', '2020-10-01', '2021-10-01'])
+        self.assertEqual(exportScript.calendarPeriodNames(binOrdinals, 'WaterYear'), ['WY2021', 'WY2022', 'WY2022', 'WY2021', 'WY2022'])
+
+        exportScript.waterYearStartMonth = 1
+        binOrdinals, labels = self.labels(values, 'WaterYear')
+        self.assertEqual(labels, ['2021-01-01', '2021-01-01', '2022-01-01', '2021-01-01', '2021-01-01'])
+        self.assertEqual(exportScript.calendarPeriodNames(binOrdinals, 'WaterYear'), ['WY2021', 'WY2021', 'WY2022', 'WY2021', 'WY2021'])
+
+    # Seasons from the 'seasonTable' - January and February are in the Winter starting the December before
+    def test_seasonal(self):
+
+        exportScript.seasonTable = {"Winter": 12, "Spring": 3, "Summer": 6, "Fall": 9}
+        values = dateTimes('2020-12-01 00:00', '2021-02-28 23:00', '2021-03-01 00:00', '2021-08-31 23:00', '2021-11-30 23:00', '2021-12-01 00:00')
+        binOrdinals, labels = self.labels(values, 'Seasonal')
+        self.assertEqual(labels, ['2020-12-01', '2020-12-01', '2021-03-01', '2021-06-01', '2021-09-01', '2021-12-01'])
+        self.assertEqual(exportScript.calendarPeriodNames(binOrdinals, 'Seasonal'), ['Winter 2020', 'Winter 2020', 'Spring 2021', 'Summer 2021', 'Fall 2021', 'Winter 2021'])
+        self.assertTrue(np.all(np.diff(binOrdinals) >= 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+# test_change_detection.py
+# Change detection ('changeDetection') - per day block hash fingerprint of a series ('blockFingerprint') and the windows of days changed since the
+# last run in the '_AllSites_ChangeReport' file.
+# Run from the repository directory: python -m unittest discover -s tests
+
+import os, sys, tempfile, shutil, unittest
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from aquariusFixture import runExport, outputFiles, exportScript
+
+
+class ChangeDetectionTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        shutil.rmtree(self.directory)
+
+    # Change report of a run (full fetches - a point edited without a correction is not re-fetched by 'windowedFetch')
+    def changeRows(self, seriesOptions=None):
+
+        outVal = runExport(self.directory, seriesOptions=seriesOptions, timeStepList=["Raw", "Daily"], changeDetection=True, windowedFetch=False)
+        self.assertEqual(outVal[0], "success function")
+        return pd.read_csv(outputFiles(self.directory)["out\\TemperatureLogger_AllSites_ChangeReport.csv"], dtype={'WindowStart': str, 'WindowEnd': str})
+
+    # Hashes by day - a changed value or code changes only the block of its day, row order does not
+    def test_block_fingerprint(self):
+
+        dateTimes = pd.date_range('2021-06-01', periods=72, freq='h')
+        dfRaw = pd.DataFrame({'DateTime': dateTimes, 'Value': [float(hour % 24) for hour in range(72)], 'GradeCode': 31, 'ApprovalCode': 1200})
+        dfFingerprint = exportScript.blockFingerprint(dfRaw)
+        self.assertEqual(list(dfFingerprint['PointCount']), [24, 24, 24])
+
+        dfShuffled = dfRaw.sample(frac=1, random_state=1)
+        self.assertEqual(list(exportScript.blockFingerprint(dfShuffled)['BlockHash']), list(dfFingerprint['BlockHash']))
+
+        for field, value in [('Value', 99.0), ('GradeCode', 21)]:
+            dfChanged = dfRaw.copy()
+            dfChanged.loc[30, field] = value
+            changed = exportScript.blockFingerprint(dfChanged)['BlockHash'] != dfFingerprint['BlockHash']
+            self.assertEqual(list(changed), [False, True, False], field)
+
+    # No windows on the first and an unchanged run, the corrected day 'Changed' and the new days 'Added'
+    def test_change_report(self):
+
+        self.assertEqual(self.changeRows().shape[0], 0)
+        self.assertEqual(self.changeRows().shape[0], 0)
+
+        # Point 30 - 2021-06-02 06:00
+        dfReport = self.changeRows({'changedPoint': 30})
+        self.assertEqual(sorted(dfReport['SiteName']), ['GLAC_002', 'ROMO_001'])
+        for index, row in dfReport.iterrows():
+            self.assertEqual([row['Change'], row['WindowStart'], row['WindowEnd'], row['Days'], row['PointsBefore'], row['PointsAfter']],
+                             ['Changed', '2021-06-02', '2021-06-02', 1, 24, 24])
+
+        # Two new days - the grade and approval change at the middle of the series moves from 2021-06-21 to 2021-06-22 (codes of 2021-06-21 changed)
+        dfReport = self.changeRows({'changedPoint': 30, 'days': 42})
+        for site in ['ROMO_001', 'GLAC_002']:
+            dfSite = dfReport[dfReport['SiteName'] == site]
+            self.assertEqual(dfSite[['Change', 'WindowStart', 'WindowEnd', 'Days', 'PointsBefore', 'PointsAfter']].values.tolist(),
+                             [['Changed', '2021-06-21', '2021-06-21', 1, 24, 24], ['Added', '2021-07-11', '2021-07-12', 2, 0, 48]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+# test_export_manifest.py
+# Export manifest ('skipUnchanged') - series with unchanged fetched data, code version and outputs are not reprocessed or rewritten, the '_AllSites_'
+# files are only rewritten when a per site file changed.
+# Run from the repository directory: python -m unittest discover -s tests
+
+import os, sys, tempfile, shutil, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from aquariusFixture import runExport, outputFiles, logText
+
+timeSteps = ["Raw", "Daily", "Monthly"]
+
+
+class ExportManifestTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.logLength = 0
+
+    def tearDown(self):
+
+        shutil.rmtree(self.directory)
+
+    # Run the export (full fetches - a point edited without a correction is not re-fetched by 'windowedFetch') - output: output files by name
+    # (modified time, bytes), log of the run
+    def runManifest(self, seriesOptions=None, **parameters):
+
+        parameters.setdefault('timeStepList', timeSteps)
+        parameters.setdefault('windowedFetch', False)
+        outVal = runExport(self.directory, seriesOptions=seriesOptions, skipUnchanged=True, **parameters)
+        self.assertEqual(outVal[0], "success function")
+        files = {}
+        for name, path in outputFiles(self.directory).items():
+            outputFile = open(path, 'rb')
+            files[name] = (os.stat(path).st_mtime_ns, outputFile.read())
+            outputFile.close()
+        text = logText(self.directory)
+        runLog, self.logLength = text[self.logLength:], len(text)
+        return files, runLog
+
+    # Same bytes, the files other than the per run change report not rewritten
+    def assertNotRewritten(self, files, firstFiles):
+
+        self.assertEqual(sorted(files), sorted(firstFiles))
+        for name in firstFiles:
+            if name.endswith("_AllSites_ChangeReport.csv"):
+                self.assertEqual(files[name][1], firstFiles[name][1], name)
+            else:
+                self.assertEqual(files[name], firstFiles[name], name)
+
+    def skippedLine(self, runLog):
+
+        return [line for line in runLog.splitlines() if line.startswith("Skipped Unchanged - ") and "Time Series: " in line]
+
+    def test_skip_unchanged(self):
+
+        firstFiles, runLog = self.runManifest()
+        self.assertEqual(self.skippedLine(runLog), [])
+
+        # Unchanged - nothing reprocessed or rewritten
+        secondFiles, runLog = self.runManifest()
+        self.assertTrue(self.skippedLine(runLog)[0].startswith("Skipped Unchanged - 2 Time Series: "))
+        self.assertNotRewritten(secondFiles, firstFiles)
+
+        # Missing output file - only that series is reprocessed
+        glacDaily = [name for name in firstFiles if "GLAC_002" in name and name.endswith("_Daily.csv")][0]
+        os.remove(outputFiles(self.directory)[glacDaily])
+        thirdFiles, runLog = self.runManifest()
+        self.assertTrue(self.skippedLine(runLog)[0].startswith("Skipped Unchanged - 1 Time Series: ROMO_001|"))
+        self.assertEqual(thirdFiles[glacDaily][1], firstFiles[glacDaily][1])
+        for name in firstFiles:
+            if "ROMO_001" in name:
+                self.assertEqual(thirdFiles[name], firstFiles[name], name)
+
+        # Corrected point - the series are reprocessed and the outputs rewritten
+        changedFiles, runLog = self.runManifest({'changedPoint': 30})
+        self.assertEqual(self.skippedLine(runLog), [])
+        self.assertNotEqual(changedFiles[glacDaily][1], firstFiles[glacDaily][1])
+        allSitesDaily = [name for name in firstFiles if "_AllSites_Daily" in name][0]
+        self.assertNotEqual(changedFiles[allSitesDaily][1], firstFiles[allSitesDaily][1])
+
+        # Code version (output parameters) changed - reprocessed
+        codeFiles, runLog = self.runManifest({'changedPoint': 30}, timeStepList=timeSteps + ["Weekly"])
+        self.assertEqual(self.skippedLine(runLog), [])
+        self.assertTrue(any(name.endswith("_AllSites_Weekly.csv") for name in codeFiles))
+
+
+if __name__ == '__main__':
+    unittest.main()
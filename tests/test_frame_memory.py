@@ -0,0 +1,47 @@
+# test_frame_memory.py
+# 'Compact' frame memory mode ('frameMemoryMode') - outputs identical to the 'Standard' mode and the bytes per point report.
+# Run from the repository directory: python -m unittest discover -s tests
+
+import os, sys, tempfile, shutil, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from aquariusFixture import runExport, outputFiles, logText
+
+
+class FrameMemoryTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        shutil.rmtree(self.directory)
+
+    # Standard and Compact (float32 values) runs - same output files, bytes per point reported
+    def test_compact_outputs_and_report(self):
+
+        timeSteps = ["Raw", "Daily", "Weekly", "Monthly", "Yearly", "Rolling"]
+        runFiles = {}
+        for mode in ['Standard', 'Compact']:
+            runDirectory = os.path.join(self.directory, mode)
+            outVal = runExport(runDirectory, timeStepList=timeSteps, frameMemoryMode=mode, compactValueType="float32")
+            self.assertEqual(outVal[0], "success function")
+            runFiles[mode] = outputFiles(runDirectory)
+
+        self.assertEqual(sorted(runFiles['Standard']), sorted(runFiles['Compact']))
+        self.assertTrue(any("_AllSites_Daily" in name for name in runFiles['Standard']))
+        for name in runFiles['Standard']:
+            standardFile, compactFile = open(runFiles['Standard'][name], 'rb'), open(runFiles['Compact'][name], 'rb')
+            self.assertEqual(standardFile.read(), compactFile.read(), name)
+            standardFile.close()
+            compactFile.close()
+
+        compactLog = logText(os.path.join(self.directory, 'Compact'))
+        self.assertTrue("Frame Memory (Bytes/Point) - Standard: " in compactLog, "run bytes per point not reported")
+        self.assertTrue("Value: float32" in compactLog, "float32 values not applied")
+        self.assertNotIn("Frame Memory (Bytes/Point)", logText(os.path.join(self.directory, 'Standard')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+# test_incremental_state.py
+# Incremental summary state ('incrementalSummary') - the Count, Mean, M2, Min and Max of the bins reused from the persisted state plus the recomputed
+# changed bins equal a full recompute ('aggregateBinState').
+# Run from the repository directory: python -m unittest discover -s tests
+
+import os, sys, tempfile, shutil, unittest
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from aquariusFixture import exportScript
+
+stateFields = ['Count', 'Mean', 'M2', 'Min', 'Max', 'BinHash']
+
+
+class IncrementalStateTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.savedParameters = {name: getattr(exportScript, name) for name in ['logFileName', 'stateDirectory', 'incrementalSummary', 'gapStatistics']}
+        exportScript.logFileName = os.path.join(self.directory, "Test.LogFile.txt")
+        exportScript.stateDirectory = os.path.join(self.directory, "SummaryState")
+        exportScript.gapStatistics = False
+
+    def tearDown(self):
+
+        for name, value in self.savedParameters.items():
+            setattr(exportScript, name, value)
+        shutil.rmtree(self.directory)
+
+    # Raw arrays of an hourly series from 2021-06-01 - large values with a small variance (M2 must not cancel)
+    def rawArrays(self, days, changes=None):
+
+        dfRaw = pd.DataFrame({'DateTime': pd.date_range('2021-06-01', periods=days * 24, freq='h')})
+        dfRaw['Value'] = 1.0e6 + np.round(np.sin(np.arange(dfRaw.shape[0]) / 5.0), 3)
+        dfRaw.loc[[30, 31], 'Value'] = np.nan
+        for index, value in (changes or {}).items():
+            dfRaw.loc[index, 'Value'] = value
+        outVal = exportScript.rawSeriesArrays(dfRaw)
+        self.assertEqual(outVal[0], "success function")
+        return outVal[1]
+
+    def state(self, rawArrays, timeStep, incremental):
+
+        exportScript.incrementalSummary = incremental
+        binOrdinals = exportScript.defineCalendarBins(rawArrays['DateTime'], timeStep)
+        outVal = exportScript.aggregateBinState(rawArrays, "ROMO_001", "Water Temp", timeStep, binOrdinals)
+        self.assertEqual(outVal[0], "success function")
+        return outVal[1]
+
+    def recomputedBins(self):
+
+        logFile = open(exportScript.logFileName, "r")
+        lastLine = [line for line in logFile.read().splitlines() if line.startswith("Aggregate State")][-1]
+        logFile.close()
+        return lastLine.split(" - Recomputed ")[1].split(" bins")[0]
+
+    def test_incremental_equals_full(self):
+
+        for timeStep in ['Daily', 'Weekly', 'Monthly']:
+            self.state(self.rawArrays(40), timeStep, True)
+
+            # Next run - a corrected value on 2021-06-03, a removed value on 2021-06-20 and 5 new days
+            rawArrays = self.rawArrays(45, {50: 1.0e6 + 0.5, 460: np.nan})
+            dfIncremental = self.state(rawArrays, timeStep, True)
+            dfFull = self.state(rawArrays, timeStep, False)
+            pd.testing.assert_frame_equal(dfIncremental[stateFields], dfFull[stateFields], check_exact=False, rtol=1e-12)
+
+            if timeStep == 'Daily':
+                # Changed days (2021-06-03 and 2021-06-20) and the 5 new days
+                self.assertEqual(self.recomputedBins(), "7 of 45")
+
+            # Full recompute against pandas - sample variance from M2
+            dfValues = pd.DataFrame({'Bin': exportScript.defineCalendarBins(rawArrays['DateTime'], timeStep), 'Value': rawArrays['Value']})
+            binValues = dfValues.groupby('Bin')['Value']
+            np.testing.assert_array_equal(dfFull['Count'].values, binValues.count().values)
+            np.testing.assert_allclose(dfFull['Mean'].values, binValues.mean().values, rtol=1e-15)
+            np.testing.assert_allclose(dfFull['M2'].values / (dfFull['Count'].values - 1), binValues.var().values, rtol=1e-9)
+            np.testing.assert_array_equal(dfFull['Min'].values, binValues.min().values)
+            np.testing.assert_array_equal(dfFull['Max'].values, binValues.max().values)
+            shutil.rmtree(exportScript.stateDirectory)
+
+    # Unchanged input - every bin reused
+    def test_unchanged_reused(self):
+
+        rawArrays = self.rawArrays(20)
+        dfFirst = self.state(rawArrays, 'Daily', True)
+        dfSecond = self.state(rawArrays, 'Daily', True)
+        self.assertEqual(self.recomputedBins(), "0 of 20")
+        pd.testing.assert_frame_equal(dfFirst[stateFields], dfSecond[stateFields], check_exact=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
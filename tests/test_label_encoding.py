@@ -0,0 +1,70 @@
+# test_label_encoding.py
+# Round trip of the 'Dictionary' and 'RunLength' Raw label exports ('labelEncoding') through loadRawExport and the '_AllSites_' append.
+# Run from the repository directory: python -m unittest discover -s tests
+
+import os, sys, tempfile, shutil, unittest
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ExportAquariusTimeSeries_Summarize_SEI_WEI_AVCSS as exportScript
+
+
+# Raw frame of a site with grades and approvals and no notes (NoteText all blank)
+def rawFrame(site):
+
+    dateTimes = pd.date_range('2021-06-01', periods=8, freq='15min')
+    return pd.DataFrame({'SiteName': site,
+                         'DateTime': dateTimes,
+                         'Value': np.arange(8, dtype='float64'),
+                         'GradeCode': ['31'] * 4 + ['21'] * 4,
+                         'GradeName': ['Good'] * 4 + ['Fair'] * 4,
+                         'ApprovalCode': ['1200'] * 8,
+                         'ApprovalName': ['Approved'] * 8,
+                         'NoteText': np.nan})
+
+
+class LabelEncodingTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.outDirectory = tempfile.mkdtemp()
+        self.parameters = {name: getattr(exportScript, name) for name in ['labelEncoding', 'outDirectory', 'outFileName']}
+        exportScript.outFileName = "Test"
+
+    def tearDown(self):
+
+        for name, value in self.parameters.items():
+            setattr(exportScript, name, value)
+        shutil.rmtree(self.outDirectory)
+
+    # A series without notes - the blank NoteText is loaded and appended as blank (not the -1 code)
+    def test_series_without_notes(self):
+
+        for encoding in ['Dictionary', 'RunLength']:
+            exportScript.labelEncoding = encoding
+            exportScript.outDirectory = os.path.join(self.outDirectory, encoding)
+            os.makedirs(exportScript.outDirectory)
+            siteFiles = []
+            for site in ['ROMO_001', 'GLAC_002']:
+                siteFile = os.path.join(exportScript.outDirectory, site + "_Raw.csv")
+                self.assertEqual(exportScript.exportRawPoints(rawFrame(site), siteFile), "success function")
+                siteFiles.append(siteFile)
+
+                outVal = exportScript.loadRawExport(siteFile)
+                self.assertEqual(outVal[0], "success function")
+                dfRaw = outVal[1]
+                self.assertTrue((dfRaw['NoteText'].isna() | (dfRaw['NoteText'].astype(str) == '')).all(), encoding)
+                self.assertEqual(list(dfRaw['GradeName'].astype(str)), list(rawFrame(site)['GradeName']))
+
+            self.assertEqual(exportScript.appendFiles(siteFiles, 'Raw'), "Success function")
+            outVal = exportScript.loadRawExport(exportScript.allSitesFile('Raw'))
+            self.assertEqual(outVal[0], "success function")
+            dfAllSites = outVal[1]
+            self.assertEqual(dfAllSites.shape[0], 16)
+            self.assertFalse((dfAllSites['NoteText'].astype(str) == '-1').any(), encoding)
+            self.assertTrue((dfAllSites['NoteText'].isna() | (dfAllSites['NoteText'].astype(str) == '')).all(), encoding)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+# test_quantile_summary.py
+# Quantile fields ('quantileMode') - 'Exact' uses the plotting position of the 'Sketch' and equals it for bins with no more than 'quantileSketchSize' values.
+# Run from the repository directory: python -m unittest discover -s tests
+
+import os, sys, tempfile, shutil, unittest
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from aquariusFixture import exportScript
+
+
+class QuantileSummaryTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.savedParameters = {name: getattr(exportScript, name) for name in ['quantileMode', 'quantileSketchSize', 'quantileList']}
+        exportScript.quantileList = [0.1, 0.25, 0.5, 0.9]
+
+    def tearDown(self):
+
+        for name, value in self.savedParameters.items():
+            setattr(exportScript, name, value)
+
+    # Raw arrays of an hourly series with a few missing values and the calendar bins of the time steps
+    def rawArrays(self, days=45):
+
+        dateTimes = pd.date_range('2021-06-01', periods=days * 24, freq='h').values
+        values = np.round(10 + 5 * np.sin(np.arange(days * 24) / 24.0 * 2 * np.pi) + (np.arange(days * 24) % 7) * 0.125, 3)
+        values[[5, 100, 101, 500]] = np.nan
+        rawArrays = {'DateTime': dateTimes, 'Value': values}
+        outVal = exportScript.defineCalendarBinIndex(rawArrays, ['Daily', 'Weekly', 'Monthly'])
+        self.assertEqual(outVal[0], "success function")
+        return rawArrays, outVal[1]
+
+    def quantiles(self, mode, rawArrays, calendarBins, timeStep):
+
+        exportScript.quantileMode = mode
+        outVal = exportScript.buildDailySketch(rawArrays)
+        self.assertEqual(outVal[0], "success function")
+        outVal = exportScript.quantileSummary(rawArrays, outVal[1], timeStep, timeStep, calendarBins)
+        self.assertEqual(outVal[0], "success function")
+        return outVal[1]
+
+    # Bins with no more than 'quantileSketchSize' values - Sketch and Exact are equal
+    def test_sketch_equals_exact(self):
+
+        exportScript.quantileSketchSize = 1000
+        rawArrays, calendarBins = self.rawArrays()
+        for timeStep in ['Daily', 'Weekly', 'Monthly']:
+            dfSketch = self.quantiles('Sketch', rawArrays, calendarBins, timeStep)
+            dfExact = self.quantiles('Exact', rawArrays, calendarBins, timeStep)
+            self.assertGreater(dfExact.shape[0], 1)
+            pd.testing.assert_frame_equal(dfSketch, dfExact, check_exact=True)
+
+    # Exact plotting position - the value of rank i (1 based) of n is at (i - 0.5) / n
+    def test_exact_plotting_position(self):
+
+        rawArrays = {'DateTime': pd.date_range('2021-06-01', periods=4, freq='h').values, 'Value': np.array([4.0, 1.0, 3.0, 2.0])}
+        calendarBins = exportScript.defineCalendarBinIndex(rawArrays, ['Daily'])[1]
+        exportScript.quantileList = [0.1, 0.125, 0.5, 0.8, 0.9]
+        dfExact = self.quantiles('Exact', rawArrays, calendarBins, 'Daily')
+        self.assertEqual(list(dfExact.iloc[0, 1:]), [1.0, 1.0, 2.5, 3.7, 4.0])
+
+    # Compacted sketch (bins with more than 'quantileSketchSize' values) - within the rank error bound of the Exact quantiles
+    def test_sketch_rank_error(self):
+
+        exportScript.quantileSketchSize = 16
+        rawArrays, calendarBins = self.rawArrays()
+        dfSketch = self.quantiles('Sketch', rawArrays, calendarBins, 'Monthly')
+        dfExact = self.quantiles('Exact', rawArrays, calendarBins, 'Monthly')
+        monthValues = pd.Series(rawArrays['Value']).groupby(calendarBins['monthly']).apply(lambda values: np.sort(values.dropna().values))
+        for row, values in enumerate(monthValues):
+            for column in dfExact.columns[1:]:
+                sketchRank = np.searchsorted(values, dfSketch[column].iloc[row]) / float(len(values))
+                exactRank = np.searchsorted(values, dfExact[column].iloc[row]) / float(len(values))
+                self.assertLessEqual(abs(sketchRank - exactRank), 2.0 / 16 + 1.0 / len(values))
+
+
+if __name__ == '__main__':
+    unittest.main()
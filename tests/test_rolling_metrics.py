@@ -0,0 +1,88 @@
+# test_rolling_metrics.py
+# Rolling stream temperature metrics ('Rolling' time step) - daily values, the 7 day rolling MWAT and 7DADM and the annual maxima ('processRolling')
+# compared to a pandas resample/rolling recompute.
+# Run from the repository directory: python -m unittest discover -s tests
+
+import os, sys, tempfile, shutil, unittest
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from aquariusFixture import exportScript
+
+
+class RollingMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.savedParameters = {name: getattr(exportScript, name) for name in ['logFileName', 'rollingWindowDays', 'protocol', 'outputCompression']}
+        exportScript.logFileName = os.path.join(self.directory, "Test.LogFile.txt")
+        exportScript.protocol = "SEI"
+        exportScript.outputCompression = "None"
+
+    def tearDown(self):
+
+        for name, value in self.savedParameters.items():
+            setattr(exportScript, name, value)
+        shutil.rmtree(self.directory)
+
+    # Hourly values from 2020-12-15 for 40 days - no values on 2020-12-28 and 2020-12-29, missing hours on 2021-01-05
+    def rawArrays(self):
+
+        dateTimes = pd.date_range('2020-12-15', periods=40 * 24, freq='h')
+        values = 8 + 4 * np.sin(np.arange(dateTimes.shape[0]) / 24.0 * 2 * np.pi) + np.arange(dateTimes.shape[0]) % 11 * 0.25 + (dateTimes.dayofyear % 5)
+        keepMask = ~((dateTimes >= '2020-12-28') & (dateTimes < '2020-12-30'))
+        values = np.where((dateTimes >= '2021-01-05 03:00') & (dateTimes < '2021-01-05 09:00'), np.nan, values)
+        return {'DateTime': dateTimes.values[keepMask], 'Value': values[keepMask]}
+
+    def rolling(self, rawArrays):
+
+        outVal = exportScript.processRolling(rawArrays, os.path.join(self.directory, "out"), "ROMO_001", "Water Temp", "Test", "Rolling", [], [], "SEI")
+        self.assertEqual(outVal[0], "success function")
+        dfDaily = pd.read_csv(outVal[1][0], parse_dates=['DateTime'])
+        dfAnnual = pd.read_csv(outVal[2][0], parse_dates=['DateTime', 'MWATDate', 'Max7DADMDate'])
+        return dfDaily, dfAnnual
+
+    def test_rolling_recompute(self):
+
+        rawArrays = self.rawArrays()
+        dfDaily, dfAnnual = self.rolling(rawArrays)
+
+        # pandas recompute - the rolling window is defined only when all 7 days have values
+        rawSeries = pd.Series(rawArrays['Value'], index=pd.DatetimeIndex(rawArrays['DateTime'])).dropna()
+        daily = rawSeries.resample('D').agg(['mean', 'max', 'min', 'count'])
+        rollingMean = daily['mean'].rolling(7, min_periods=7).mean()
+        rollingMax = daily['max'].rolling(7, min_periods=7).mean()
+
+        self.assertEqual(list(dfDaily['DateTime']), list(daily.index))
+        np.testing.assert_allclose(dfDaily['DailyMean'], daily['mean'], rtol=1e-12)
+        np.testing.assert_allclose(dfDaily['DailyMax'], daily['max'], rtol=1e-12)
+        np.testing.assert_allclose(dfDaily['DailyMin'], daily['min'], rtol=1e-12)
+        self.assertEqual(list(dfDaily['DailyCount']), list(daily['count']))
+        np.testing.assert_allclose(dfDaily['Rolling7DayMean'], rollingMean, rtol=1e-12)
+        np.testing.assert_allclose(dfDaily['Rolling7DayAvgDailyMax'], rollingMax, rtol=1e-12)
+        self.assertTrue(dfDaily['Rolling7DayMean'].isna().sum() > 6, "windows with missing days not blank")
+
+        # Annual MWAT and Max 7DADM with the first date of occurrence
+        self.assertEqual(list(dfAnnual['DateTime'].dt.year), [2020, 2021])
+        for year, row in zip([2020, 2021], dfAnnual.itertuples()):
+            yearMean, yearMax = rollingMean[rollingMean.index.year == year], rollingMax[rollingMax.index.year == year]
+            self.assertAlmostEqual(row.MWAT, yearMean.max(), places=10)
+            self.assertEqual(row.MWATDate, yearMean.idxmax())
+            self.assertAlmostEqual(row.Max7DADM, yearMax.max(), places=10)
+            self.assertEqual(row.Max7DADMDate, yearMax.idxmax())
+            self.assertEqual(row.DaysWithData, int((daily['count'][daily.index.year == year] > 0).sum()))
+
+    # Fewer days than the window - daily values only
+    def test_short_series(self):
+
+        rawArrays = {'DateTime': pd.date_range('2021-07-01', periods=3 * 24, freq='h').values, 'Value': np.linspace(10.0, 14.0, 3 * 24)}
+        dfDaily, dfAnnual = self.rolling(rawArrays)
+        self.assertEqual(dfDaily.shape[0], 3)
+        self.assertTrue(dfDaily['Rolling7DayMean'].isna().all())
+        self.assertTrue(dfAnnual['MWAT'].isna().all())
+
+
+if __name__ == '__main__':
+    unittest.main()
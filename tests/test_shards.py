@@ -0,0 +1,88 @@
+# test_shards.py
+# Sharded export runs ('--shard i/N') - shard option parsing and key assignment (AquariusShard.py) and the merge of the per shard '_AllSites_'
+# files ('merge' command - 'mergeShards') equal to an unsharded run.
+# Run from the repository directory: python -m unittest discover -s tests
+
+import os, sys, zlib, argparse, tempfile, shutil, unittest
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from aquariusFixture import runExport, outputFiles, exportScript
+from AquariusShard import parseShard, keyShard, locationShard
+
+sites = ('ROMO_001', 'GLAC_002', 'ROMO_006', 'SCBL_009', 'YELL_005')
+timeSteps = ["Raw", "Daily", "Monthly", "Rolling"]
+
+
+class ShardTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        shutil.rmtree(self.directory)
+
+    def test_parse_shard(self):
+
+        self.assertEqual(parseShard("2/4"), (2, 4))
+        self.assertEqual(parseShard(" 1 / 1 "), (1, 1))
+        for shardText in ["0/4", "5/4", "2", "a/b", "-1/2"]:
+            self.assertRaises(argparse.ArgumentTypeError, parseShard, shardText)
+
+    # CRC32 of the key - the same shard in every worker and independent of the site order, all files of a Location in one shard
+    def test_key_shard(self):
+
+        for site in sites:
+            self.assertEqual(keyShard(site, 4), zlib.crc32(site.encode('utf-8')) % 4 + 1)
+            self.assertEqual(keyShard(site, 1), 1)
+        self.assertEqual(locationShard("flfo_705_FLFO_705_2020_1_Hourly_20220412.csv", 3), keyShard("flfo_705", 3))
+        self.assertEqual(locationShard("nolocation.csv", 3), 1)
+        self.assertEqual(sorted(set(keyShard(site, 2) for site in sites)), [1, 2])
+
+    # Merge sites run on 2 shards in one output directory
+    def merge(self, runDirectory):
+
+        savedParameters = {name: getattr(exportScript, name) for name in ['outDirectory', 'workspace', 'logFileName', 'timeStepList', 'shardIndex', 'shardCount']}
+        try:
+            exportScript.outDirectory = os.path.join(runDirectory, "out")
+            exportScript.workspace = os.path.join(runDirectory, "workspace")
+            exportScript.logFileName = os.path.join(runDirectory, "workspace", "Test.LogFile.txt")
+            exportScript.timeStepList = timeSteps
+            exportScript.shardIndex, exportScript.shardCount = 1, 1
+            return exportScript.mergeShards()
+        finally:
+            for name, value in savedParameters.items():
+                setattr(exportScript, name, value)
+
+    def allSites(self, runDirectory, timeStep):
+
+        allSitesFile = os.path.join(runDirectory, "out", "TemperatureLogger_AllSites_" + timeStep + ".csv")
+        return pd.read_csv(allSitesFile).sort_values(['SiteName', 'DateTime']).reset_index(drop=True)
+
+    def test_merge_equals_unsharded(self):
+
+        outVal = runExport(os.path.join(self.directory, "Unsharded"), sites, timeStepList=timeSteps)
+        self.assertEqual(outVal[0], "success function")
+
+        shardDirectory = os.path.join(self.directory, "Sharded")
+        outVal = runExport(shardDirectory, sites, timeStepList=timeSteps, shardIndex=1, shardCount=2)
+        self.assertEqual(outVal[0], "success function")
+
+        # Shard 2 not complete - no '_AllSites_' files
+        self.assertEqual(self.merge(shardDirectory), "Failed function - 'mergeShards'")
+        self.assertFalse(any("_AllSites_Daily" in name for name in outputFiles(shardDirectory)))
+
+        outVal = runExport(shardDirectory, sites, timeStepList=timeSteps, shardIndex=2, shardCount=2)
+        self.assertEqual(outVal[0], "success function")
+        shardOneSites = set(pd.read_csv(os.path.join(shardDirectory, "out", "TemperatureLogger_AllSites_Shard1of2_Daily.csv"))['SiteName'])
+        self.assertEqual(shardOneSites, set(site for site in sites if keyShard(site, 2) == 1))
+
+        self.assertEqual(self.merge(shardDirectory), "success function")
+        for timeStep in ["Raw", "Daily", "Monthly", "Rolling", "RollingAnnual"]:
+            pd.testing.assert_frame_equal(self.allSites(shardDirectory, timeStep), self.allSites(os.path.join(self.directory, "Unsharded"), timeStep), check_exact=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
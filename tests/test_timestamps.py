@@ -0,0 +1,88 @@
+# test_timestamps.py
+# Fixed UTC offset time stamps (AquariusTimestamps.py) - offset parsing, ISO-8601 parsing/formatting round trips and the local/UTC offset arithmetic.
+# Run from the repository directory: python -m unittest discover -s tests
+
+import os, sys, unittest
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from AquariusTimestamps import parseUtcOffset, offsetText, offsetTexts, parseOffsetTimes, localTimes, utcFromLocal, localTimesFromText, formatIsoTimes, natValue
+
+hour = 3600 * 1000000000
+
+
+# UTC nanoseconds of time stamps by pandas (reference)
+def pandasUtc(timeStrings):
+
+    return pd.to_datetime(pd.Series(timeStrings, dtype=object), utc=True, errors='coerce').values.view('int64')
+
+
+class TimestampsTest(unittest.TestCase):
+
+    # Hours (site list 'UtcOffset'), '+/-HH:MM', '+/-HHMM', 'UTC' prefix and 'Z' - None when not defined
+    def test_parse_utc_offset(self):
+
+        for utcOffset, hours in [(-7, -7), ('-7', -7), (-9.5, -9.5), (np.int64(5), 5), ('+05:30', 5.5), ('-0700', -7), ('0930', 9.5),
+                                 ('UTC-07:00', -7), ('utc+1', 1), ('Z', 0), ('UTC', 0), ('-00:30', -0.5)]:
+            self.assertEqual(parseUtcOffset(utcOffset), int(hours * hour), utcOffset)
+        for utcOffset in [None, float('nan'), '', ' ', 'NaN']:
+            self.assertIsNone(parseUtcOffset(utcOffset))
+        with self.assertRaises(ValueError):
+            parseUtcOffset('Mountain')
+
+    def test_offset_text(self):
+
+        for hours, text in [(-7, '-07:00'), (-9.5, '-09:30'), (5.75, '+05:45'), (0, '+00:00'), (-0.5, '-00:30')]:
+            self.assertEqual(offsetText(int(hours * hour)), text)
+            self.assertEqual(parseUtcOffset(text), int(hours * hour))
+        self.assertEqual(list(offsetTexts([-7 * hour, 0, -7 * hour, -6 * hour])), ['-07:00', '+00:00', '-07:00', '-06:00'])
+
+    # '+/-HH:MM' offsets (fast path) and mixed 'Z', '+/-HHMM', no offset and unparseable time stamps - same instants as pandas
+    def test_parse_offset_times(self):
+
+        timeStrings = ['2021-06-01T00:00:00.0000000-07:00', '2021-11-07T01:30:00.1234567-06:00', '2021-11-07T01:30:00.0000000-07:00']
+        utcNanoseconds, offsetNanoseconds = parseOffsetTimes(timeStrings)
+        self.assertEqual(list(utcNanoseconds), list(pandasUtc(timeStrings)))
+        self.assertEqual(list(offsetNanoseconds), [-7 * hour, -6 * hour, -7 * hour])
+
+        timeStrings = ['2021-06-01T07:00:00Z', '2021-06-01T12:30:00+0530', '2021-06-01 07:00:00', 'not a time', '2021-06-01T00:00:00-07:00']
+        utcNanoseconds, offsetNanoseconds = parseOffsetTimes(timeStrings)
+        self.assertEqual(list(utcNanoseconds), list(pandasUtc(timeStrings)))
+        self.assertEqual(utcNanoseconds[3], natValue)
+        self.assertEqual(list(offsetNanoseconds), [0, int(5.5 * hour), 0, 0, -7 * hour])
+
+    # Format and parse back - same instants and offsets, 0 offset as 'Z', NaT kept
+    def test_format_round_trip(self):
+
+        utcNanoseconds = np.array([pd.Timestamp('2021-06-01T07:00:00.123456789Z').value, pd.Timestamp('2021-12-31T23:59:59Z').value, natValue, 0], dtype='int64')
+        offsetNanoseconds = np.array([-7 * hour, int(5.75 * hour), -7 * hour, 0], dtype='int64')
+
+        isoText = formatIsoTimes(utcNanoseconds, offsetNanoseconds, fractionUnit='ns')
+        self.assertEqual(list(isoText), ['2021-06-01T00:00:00.123456789-07:00', '2022-01-01T05:44:59.000000000+05:45', 'NaT', '1970-01-01T00:00:00.000000000Z'])
+        parsedUtc, parsedOffsets = parseOffsetTimes(isoText)
+        self.assertEqual(list(parsedUtc), list(utcNanoseconds))
+        self.assertEqual(list(parsedOffsets[[0, 1, 3]]), list(offsetNanoseconds[[0, 1, 3]]))
+
+        self.assertEqual(list(formatIsoTimes(utcNanoseconds[:2], -7 * hour, fractionUnit='s')), ['2021-06-01T00:00:00-07:00', '2021-12-31T16:59:59-07:00'])
+        self.assertEqual(str(formatIsoTimes(utcNanoseconds[:1], 0)[0]), '2021-06-01T07:00:00.123456Z')
+
+    # Local (wall clock) times and back to UTC - NaT kept, 's' resolution floors to the second
+    def test_local_round_trip(self):
+
+        utcNanoseconds = np.array([pd.Timestamp('2021-06-01T07:00:00.75Z').value, natValue], dtype='int64')
+        localValues = localTimes(utcNanoseconds, -7 * hour)
+        self.assertEqual(localValues[0], np.datetime64('2021-06-01T00:00:00.750000000'))
+        self.assertTrue(np.isnat(localValues[1]))
+        self.assertEqual(list(utcFromLocal(localValues.view('int64'), -7 * hour)), list(utcNanoseconds))
+        self.assertEqual(localTimes(utcNanoseconds, -7 * hour, resolution='s')[0], np.datetime64('2021-06-01T00:00:00'))
+
+        # Offset of each time stamp or converted to the site offset
+        timeStrings = ['2021-06-01T00:00:00.5000000-07:00', '2021-06-01T02:00:00.0000000-05:00']
+        self.assertEqual(list(localTimesFromText(timeStrings)), [np.datetime64('2021-06-01T00:00:00'), np.datetime64('2021-06-01T02:00:00')])
+        self.assertEqual(list(localTimesFromText(timeStrings, parseUtcOffset(-7), resolution='ns')),
+                         [np.datetime64('2021-06-01T00:00:00.5'), np.datetime64('2021-06-01T00:00:00')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+# test_unit_rollback.py
+# Failed units (site and time series) - a failed stage or output write rolls back the unit outputs, the other units and the '_AllSites_' files complete
+# and the failed unit is processed when resuming ('resumeRun').
+# Run from the repository directory: python -m unittest discover -s tests
+
+import os, sys, json, tempfile, shutil, unittest
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from aquariusFixture import runExport, outputFiles, exportScript
+
+
+class UnitRollbackTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.savedFunctions = {name: getattr(exportScript, name) for name in ['processWeekly', 'writeOutputFile']}
+
+    def tearDown(self):
+
+        for name, function in self.savedFunctions.items():
+            setattr(exportScript, name, function)
+        shutil.rmtree(self.directory)
+
+    def checkpoint(self):
+
+        checkpointJson = open(os.path.join(self.directory, "workspace", "TemperatureLogger_Checkpoint.json"), "r")
+        checkpoint = json.load(checkpointJson)
+        checkpointJson.close()
+        return checkpoint
+
+    # Sites in the '_AllSites_' file of the time step
+    def allSitesNames(self, timeStep):
+
+        allSitesFile = [path for name, path in outputFiles(self.directory).items() if "_AllSites_" + timeStep in name][0]
+        return set(pd.read_csv(allSitesFile)['SiteName'])
+
+    # Weekly summary failing for one site on every attempt - the unit files are removed, the other site and the '_AllSites_' files complete
+    def test_failed_stage(self):
+
+        processWeekly = self.savedFunctions['processWeekly']
+
+        def failingWeekly(rawArrays, outDirBySite, site, *arguments):
+            if site == 'GLAC_002':
+                return "Failed function - 'processWeekly'"
+            return processWeekly(rawArrays, outDirBySite, site, *arguments)
+
+        exportScript.processWeekly = failingWeekly
+        outVal = runExport(self.directory, unitRetries=1)
+        self.assertEqual(outVal[0], "success function")
+
+        fileNames = list(outputFiles(self.directory))
+        self.assertFalse(any("GLAC_002" in name for name in fileNames), "failed unit files not removed")
+        self.assertTrue(any("ROMO_001" in name and name.endswith("_Weekly.csv") for name in fileNames))
+        self.assertEqual(self.allSitesNames("Daily"), {'ROMO_001'})
+
+        checkpoint = self.checkpoint()
+        self.assertEqual([unitKey.split("|")[0] for unitKey in checkpoint['Failed']], ['GLAC_002'])
+        self.assertEqual([unitKey.split("|")[0] for unitKey in checkpoint['Completed']], ['ROMO_001'])
+
+        # Resume - only the failed unit is fetched and processed
+        exportScript.processWeekly = processWeekly
+        outVal = runExport(self.directory, unitRetries=1, resumeRun=True)
+        self.assertEqual(outVal[0], "success function")
+        self.assertEqual(self.allSitesNames("Weekly"), {'ROMO_001', 'GLAC_002'})
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "workspace", "TemperatureLogger_Checkpoint.json")), "checkpoint kept after all units completed")
+
+    # Output file of one site failing to write on the background writer - the run completes the '_AllSites_' files from the other site
+    def test_failed_write(self):
+
+        writeOutputFile = self.savedFunctions['writeOutputFile']
+
+        def failingWrite(dfOutput, outFull):
+            if "GLAC_002" in outFull and outFull.endswith("_Monthly.csv"):
+                raise IOError("Disk full")
+            writeOutputFile(dfOutput, outFull)
+
+        exportScript.writeOutputFile = failingWrite
+        outVal = runExport(self.directory, writerThreads=2)
+        self.assertEqual(outVal[0], "success function")
+
+        self.assertFalse(any("GLAC_002" in name for name in outputFiles(self.directory)), "failed unit files not removed")
+        self.assertEqual(self.allSitesNames("Daily"), {'ROMO_001'})
+        self.assertEqual(self.allSitesNames("Monthly"), {'ROMO_001'})
+        self.assertEqual([unitKey.split("|")[0] for unitKey in self.checkpoint()['Failed']], ['GLAC_002'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+# test_validate_series.py
+# Upload validation of a series ('validateSeries' in AquariusAppendFunctions.py) - Status and message by check, the opt in 'SkipZeroSum' rule.
+# Run from the repository directory: python -m unittest discover -s tests
+
+import os, sys, tempfile, shutil, unittest
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from AquariusAppendFunctions import validateSeries, writeValidationReport
+from AquariusIngest import loggerRegistry
+
+
+# Hourly series as read from a logger file ('Time' and 'Value' strings)
+def loggerSeries(values, times=None):
+
+    if times is None:
+        times = [(pd.Timestamp('2022-04-12 00:00') + pd.Timedelta(hours=hour)).strftime('%Y-%m-%d %H:%M') for hour in range(len(values))]
+    return pd.DataFrame({'Time': times, 'Value': values})
+
+
+class ValidateSeriesTest(unittest.TestCase):
+
+    def validate(self, dfSeries, valueRange=(0, 100), **options):
+
+        outVal = validateSeries(dfSeries, "Snow Depth.Snow Depth (cm)", "test.csv", "GRKO_WX1", valueRange, **options)
+        self.assertEqual(outVal[0], "success function")
+        return outVal[1]
+
+    def test_pass(self):
+
+        reportRow = self.validate(loggerSeries(['1.5', '2.0', '2.5', '3.0']))
+        self.assertEqual(reportRow['Status'], 'Pass')
+        self.assertEqual(reportRow['UploadPoints'], 4)
+        self.assertEqual(reportRow['Interval'], str(pd.Timedelta(hours=1)))
+
+    def test_empty(self):
+
+        reportRow = self.validate(loggerSeries(['', 'NaN', None, '']))
+        self.assertEqual(reportRow['Status'], 'Empty')
+        self.assertEqual(reportRow['UploadPoints'], 0)
+
+    def test_blocked(self):
+
+        reportRow = self.validate(loggerSeries(['1', '2', '3'], ['2022-04-12 00:00', '2022-04-12 00:00', '2022-04-12 01:00']))
+        self.assertEqual(reportRow['Status'], 'Blocked')
+        self.assertIn("Duplicates: 1", reportRow['Message'])
+
+        reportRow = self.validate(loggerSeries(['1', '2', '3'], ['2022-04-12 01:00', '2022-04-12 00:00', '2022-04-12 02:00']))
+        self.assertEqual(reportRow['Status'], 'Blocked')
+        self.assertIn("NonMonotonic: 1", reportRow['Message'])
+
+        reportRow = self.validate(loggerSeries(['1', '250', '3']))
+        self.assertEqual(reportRow['Status'], 'Blocked')
+        self.assertEqual(reportRow['Message'], "OutOfRange: 1")
+
+        reportRow = self.validate(loggerSeries(['1', '2', '3'], ['2022-04-12 00:00', 'not a time', '2022-04-12 02:00']))
+        self.assertEqual(reportRow['Status'], 'Blocked')
+        self.assertIn("UnparsedTimes: 1", reportRow['Message'])
+
+    def test_warning(self):
+
+        reportRow = self.validate(loggerSeries(['1', 'err', '3', '4', '5'], ['2022-04-12 00:00', '2022-04-12 01:00', '2022-04-12 02:00', '2022-04-12 03:00', '2022-04-12 05:00']))
+        self.assertEqual(reportRow['Status'], 'Warning')
+        self.assertEqual(reportRow['NonNumericValues'], 1)
+        self.assertEqual(reportRow['IrregularIntervals'], 1)
+        self.assertEqual(reportRow['MaxGap'], str(pd.Timedelta(hours=2)))
+
+        reportRow = self.validate(loggerSeries(['1', '2', '3']), expectedInterval='15min')
+        self.assertEqual(reportRow['Status'], 'Warning')
+        self.assertEqual(reportRow['IrregularIntervals'], 2)
+
+    # Values summing to zero - valid data by default, 'Skipped' (reported) only with the opt in 'SkipZeroSum'
+    def test_zero_sum(self):
+
+        zeroSeries = loggerSeries(['0.0', '0', '0.0', ''])
+        self.assertEqual(self.validate(zeroSeries)['Status'], 'Pass')
+
+        reportRow = self.validate(zeroSeries, skipZeroSum=True)
+        self.assertEqual(reportRow['Status'], 'Skipped')
+        self.assertIn("SkipZeroSum", reportRow['Message'])
+        self.assertEqual(self.validate(loggerSeries(['0', '0.5']), skipZeroSum=True)['Status'], 'Pass')
+        self.assertEqual(self.validate(loggerSeries(['', 'NaN']), skipZeroSum=True)['Status'], 'Empty')
+
+        self.assertFalse(any(loggerEntry.get('SkipZeroSum', False) for loggerEntry in loggerRegistry.values()))
+
+    # Time stamps parsed once for the file ('timeValues') - same report as parsed by the function, no range check without a 'valueRange'
+    def test_parsed_times_and_range(self):
+
+        dfSeries = loggerSeries(['1', '250', '3', 'err'], ['2022-04-12 00:00', '2022-04-12 01:00', '2022-04-12 01:00', 'not a time'])
+        timeValues = pd.to_datetime(dfSeries['Time'], utc=True, errors='coerce')
+        self.assertEqual(self.validate(dfSeries, timeValues=timeValues), self.validate(dfSeries))
+
+        reportRow = self.validate(dfSeries, valueRange=None, timeValues=timeValues)
+        self.assertEqual(reportRow['OutOfRange'], 0)
+        self.assertEqual(reportRow['Message'], "UnparsedTimes: 1, Duplicates: 1, NonNumericValues: 1")
+
+    # Report of the files - rows appended across runs under one header
+    def test_report_file(self):
+
+        directory = tempfile.mkdtemp()
+        try:
+            reportFile = os.path.join(directory, "Test_ValidationReport.csv")
+            self.assertEqual(writeValidationReport([], reportFile), "success function")
+            self.assertFalse(os.path.exists(reportFile))
+
+            reportRows = [self.validate(loggerSeries(['1', '2'])), self.validate(loggerSeries(['1', '250']))]
+            for run in range(2):
+                self.assertEqual(writeValidationReport(reportRows, reportFile), "success function")
+            dfReport = pd.read_csv(reportFile)
+            self.assertEqual(list(dfReport['Status']), ['Pass', 'Blocked', 'Pass', 'Blocked'])
+            self.assertEqual(list(dfReport.columns), list(reportRows[0]))
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+# test_watch_files.py
+# Watch mode file tracking in AquariusIngest.py - incremental polling scan ('scanLoggerFiles') and the rows of a file at the start of the watch ('fileStartRows').
+# Run from the repository directory: python -m unittest discover -s tests
+
+import os, sys, tempfile, shutil, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from AquariusIngest import scanLoggerFiles, fileStartRows
+
+
+class WatchFilesTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.listedDirectories = []
+        self.scandir = os.scandir
+
+    def tearDown(self):
+
+        os.scandir = self.scandir
+        shutil.rmtree(self.directory)
+
+    def writeFile(self, relativeName, text, mode="w"):
+
+        file = os.path.join(self.directory, *relativeName.split("/"))
+        if not os.path.exists(os.path.dirname(file)):
+            os.makedirs(os.path.dirname(file))
+        loggerFile = open(file, mode)
+        loggerFile.write(text)
+        loggerFile.close()
+        return file
+
+    # Scan with the directories listed recorded
+    def scan(self, lastFiles=None, lastDirectories=None):
+
+        def recordedScandir(directory):
+            self.listedDirectories.append(directory)
+            return self.scandir(directory)
+
+        self.listedDirectories = []
+        os.scandir = recordedScandir
+        try:
+            return scanLoggerFiles(self.directory, ".csv", lastFiles, lastDirectories)
+        finally:
+            os.scandir = self.scandir
+
+    def test_incremental_scan(self):
+
+        oldFile = self.writeFile("2021/GLAC_101_a.csv", "DateTime,DTW\n")
+        self.writeFile("2021/notes.txt", "not a logger file")
+        otherFile = self.writeFile("2022/ROMO_001_a.csv", "DateTime,DTW\n")
+        knownFiles, knownDirectories = self.scan()
+        self.assertEqual(sorted(knownFiles), sorted([oldFile, otherFile]))
+        self.assertEqual(len(self.listedDirectories), 3)
+
+        # Nothing changed - no directory listed
+        scannedFiles, scannedDirectories = self.scan(knownFiles, knownDirectories)
+        self.assertEqual(scannedFiles, knownFiles)
+        self.assertEqual(self.listedDirectories, [])
+
+        # Grown file (directory unchanged) - found by its size, only the directories with a new file listed
+        self.writeFile("2021/GLAC_101_a.csv", "2021-06-01 00:00,1.5\n", mode="a")
+        newFile = self.writeFile("2022/new/ROMO_001_b.csv", "DateTime,DTW\n")
+        scannedFiles, scannedDirectories = self.scan(scannedFiles, scannedDirectories)
+        self.assertNotEqual(scannedFiles[oldFile], knownFiles[oldFile])
+        self.assertIn(newFile, scannedFiles)
+        self.assertEqual(sorted(self.listedDirectories), sorted([os.path.join(self.directory, "2022"), os.path.join(self.directory, "2022", "new")]))
+
+        # Removed file and directory
+        os.remove(otherFile)
+        shutil.rmtree(os.path.join(self.directory, "2022", "new"))
+        scannedFiles, scannedDirectories = self.scan(scannedFiles, scannedDirectories)
+        self.assertEqual(sorted(scannedFiles), [oldFile])
+        self.assertNotIn(os.path.join(self.directory, "2022", "new"), scannedDirectories)
+
+    # Rows in the file at the start of the watch - complete lines after the header, blank lines not counted
+    def test_start_rows(self):
+
+        file = self.writeFile("GLAC_101_a.csv", "DateTime,DTW\n2021-06-01 00:00,1.5\n\n2021-06-01 01:00,1.6\n")
+        startSize = os.path.getsize(file)
+        self.writeFile("GLAC_101_a.csv", "2021-06-01 02:00,1.7\n2021-06-01 03:00,1.8\n", mode="a")
+        self.assertEqual(fileStartRows(file, startSize), 2)
+        self.assertEqual(fileStartRows(file, startSize - 3), 1)
+        self.assertEqual(fileStartRows(file, 5), 0)
+        self.assertEqual(fileStartRows(file, os.path.getsize(file)), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()